@@ -0,0 +1,87 @@
+""" Import time benchmark for pyrasatest, based on 'python -X importtime'.
+
+Each statement is run in a new interpreter, and the total cumulative import
+time of the modules it imports is reported as the minimum over a number of
+runs. Fails if a statement imports modules which it should not, e.g. if
+importing MockModel also imports SQLAlchemy, or exceeds its time budget.
+
+Usage: python benchmarks/import_time.py [--repeat N] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (statement, modules which must not be imported, budget in ms)
+STATEMENTS = {
+    'package': ('import pyrasatest', ['sqlalchemy', 'pyramid'], 20),
+    'mock_model': ('from pyrasatest import MockModel',
+                   ['sqlalchemy', 'pyramid'], 30),
+    'mock_db_session': ('from pyrasatest import MockDbSession',
+                        ['pyramid'], None),
+    'mock_request': ('from pyrasatest import MockRequest', [], None),
+}
+
+
+def import_times(statement: str) -> list:
+    """ (module name, cumulative import time in microseconds, whether
+    imported at top level rather than by another module) tuples """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT_DIR, stderr=subprocess.PIPE, universal_newlines=True,
+        check=True
+    ).stderr
+    times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(cumulative),
+                      not name.startswith(' ' * 2)))
+    return times
+
+
+def measure(statement: str, repeat: int = 5) -> dict:
+    """ Modules imported at interpreter startup are excluded """
+    startup = {name for name, _, _ in import_times('pass')}
+    totals, modules = [], set()
+    for _ in range(repeat):
+        times = [t for t in import_times(statement) if t[0] not in startup]
+        totals.append(sum(cumulative for _, cumulative, top_level in times
+                          if top_level))
+        modules.update(name.split('.')[0] for name, _, _ in times)
+    return {'total_us': min(totals), 'modules': sorted(modules)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    args = parser.parse_args(argv)
+    results, failures = {}, []
+    for name, (statement, forbidden, budget_ms) in STATEMENTS.items():
+        result = measure(statement, args.repeat)
+        results[name] = result['total_us']
+        imported = [module for module in forbidden
+                    if module in result['modules']]
+        if imported:
+            failures.append('{!r} imports {}'.format(statement, imported))
+        if budget_ms is not None and result['total_us'] > budget_ms * 1000:
+            failures.append('{!r} took {:.1f}ms, budget {}ms'.format(
+                statement, result['total_us'] / 1000, budget_ms))
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for name, total_us in results.items():
+            print('{:<20} {:>10.1f}ms'.format(name, total_us / 1000))
+    for failure in failures:
+        print('FAILED:', failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+""" Micro-benchmarks of pyrasatest per-call hot paths.
+
+Each benchmark is timed with timeit, reporting the minimum time per call in
+nanoseconds over a number of repeats. Results can be written as JSON and
+compared against a stored baseline, failing if any benchmark is slower than
+the baseline by more than a tolerance factor. Baselines are machine specific,
+so save one on the machine which runs the comparison.
+
+Usage:
+    python benchmarks/micro.py [-k PATTERN] [--json PATH]
+    python benchmarks/micro.py --save-baseline
+    python benchmarks/micro.py --compare [--tolerance 1.5]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import Column, Integer, select  # noqa: E402
+from sqlalchemy.ext.declarative import declarative_base  # noqa: E402
+
+from pyrasatest import (  # noqa: E402
+    MockDbSession, MockModel, MockQuery, MockRequest, PartialMockDbSession,
+    generate_rows, to_dicts, to_json
+)
+from pyrasatest.query_keys import label_key  # noqa: E402
+
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+
+Base = declarative_base()
+
+# A model with enough columns to use as distinct query_return_values keys
+Wide = type('Wide', (Base, ), dict(
+    __tablename__='wide', id=Column(Integer, primary_key=True),
+    **{'col_{}'.format(i): Column(Integer) for i in range(200)}
+))
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """ Registers a function which does any setup and returns the callable
+    to be timed """
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def _query_keys(count: int) -> list:
+    columns = [getattr(Wide, 'col_{}'.format(i)) for i in range(200)]
+    return columns[:count] + ['key_{}'.format(i) for i in range(count - 200)]
+
+
+for _count in [10, 100, 1000]:
+    def _session_query_miss(count=_count):
+        session = MockDbSession(query_return_values={
+            key: ValueError for key in _query_keys(count)})
+        return lambda: session.query(Wide.id)
+
+    def _session_query_hit(count=_count):
+        keys = _query_keys(count)
+        session = MockDbSession(query_return_values={
+            key: MockQuery() for key in keys})
+        return lambda: session.query(keys[-1])
+
+    benchmark('session_query_miss_{}_keys'.format(_count))(
+        _session_query_miss)
+    benchmark('session_query_hit_{}_keys'.format(_count))(_session_query_hit)
+
+
+@benchmark('label_key_new_label')
+def _label_key_new_label():
+    return lambda: label_key(Wide.col_1.label('abc'))
+
+
+@benchmark('label_key_same_label')
+def _label_key_same_label():
+    label = Wide.col_1.label('abc')
+    return lambda: label_key(label)
+
+
+@benchmark('session_query_label')
+def _session_query_label():
+    session = MockDbSession(query_return_values={
+        Wide.col_1.label('abc'): MockModel(abc=1)})
+    return lambda: session.query(Wide.col_1.label('abc')).one()
+
+
+@benchmark('session_execute_select_in_loop')
+def _session_execute_select_in_loop():
+    session = MockDbSession(query_return_values={Wide.id: [1, 2, 3]})
+    return lambda: session.scalars(
+        select(Wide.id).where(Wide.col_1 == 1)).all()
+
+
+@benchmark('session_execute_partitions_1000')
+def _session_execute_partitions():
+    session = MockDbSession()
+    session.register_table(Wide, [MockModel(id=i, col_1=i % 10)
+                                  for i in range(1000)])
+    stmt = select(Wide).where(Wide.col_1 == 3)
+    return lambda: sum(len(rows) for rows in session.execute(
+        stmt).scalars().partitions(20))
+
+
+@benchmark('mock_query_chain')
+def _mock_query_chain():
+    query = MockQuery(first_=1)
+    return lambda: query.filter(Wide.id == 1).join('x').order_by(
+        Wide.col_1).first()
+
+
+@benchmark('mock_query_iterate_1000')
+def _mock_query_iterate():
+    query = MockQuery(all_=list(range(1000)))
+    return lambda: sum(1 for _ in query)
+
+
+@benchmark('mock_query_evaluate_filter_1000')
+def _mock_query_evaluate_filter():
+    query = MockQuery(all_=[MockModel(id=i, col_1=i % 10)
+                            for i in range(1000)], evaluate=True)
+    return lambda: query.filter(Wide.col_1 == 3).all()
+
+
+@benchmark('mock_query_indexed_filter_100000')
+def _mock_query_indexed_filter():
+    query = MockQuery(all_=[MockModel(id=i) for i in range(100000)],
+                      evaluate=True, indexes=['id'])
+    return lambda: query.filter(Wide.id == 500).one()
+
+
+@benchmark('mock_model_init')
+def _mock_model_init():
+    return lambda: MockModel(id=1, name='abc', number=2)
+
+
+@benchmark('mock_model_schema_init')
+def _mock_model_schema_init():
+    row_class = MockModel.schema('id', 'name', 'number')
+    return lambda: row_class(1, 'abc', 2)
+
+
+@benchmark('generate_rows_100_wide')
+def _generate_rows_100_wide():
+    return lambda: generate_rows(Wide, 100)
+
+
+def _serialize_rows() -> list:
+    return [MockModel(id=i, name='name {}'.format(i), number=i * 2,
+                      _private=None) for i in range(1000)]
+
+
+@benchmark('to_dict_per_row_1000')
+def _to_dict_per_row():
+    rows = _serialize_rows()
+    return lambda: [row.to_dict(['number']) for row in rows]
+
+
+@benchmark('to_dicts_1000')
+def _to_dicts():
+    rows = _serialize_rows()
+    return lambda: to_dicts(rows, ['number'])
+
+
+@benchmark('json_dumps_per_row_1000')
+def _json_dumps_per_row():
+    rows = _serialize_rows()
+    return lambda: ('[' + ','.join(json.dumps(row.to_dict())
+                                   for row in rows) + ']').encode()
+
+
+@benchmark('to_json_1000')
+def _to_json():
+    rows = _serialize_rows()
+    return lambda: to_json(rows)
+
+
+@benchmark('mock_model_getitem')
+def _mock_model_getitem():
+    mock_model = MockModel(**{'col_{}'.format(i): i for i in range(20)})
+    return lambda: mock_model[10]
+
+
+@benchmark('mock_model_schema_getitem')
+def _mock_model_schema_getitem():
+    fields = ['col_{}'.format(i) for i in range(20)]
+    row = MockModel.schema(*fields)(*range(20))
+    return lambda: row[10]
+
+
+@benchmark('mock_request_init')
+def _mock_request_init():
+    return MockRequest
+
+
+@benchmark('mock_request_reset')
+def _mock_request_reset():
+    request = MockRequest(params={'id': 1})
+
+    def use():
+        request.params['name'] = 'abc'
+        request.dbsession.add('record')
+        request.reset()
+    return use
+
+
+@benchmark('partial_session_fallthrough')
+def _partial_session_fallthrough():
+    class DbSession:
+        def query(self, *args):
+            return args
+
+    session = PartialMockDbSession(
+        query_return_values={key: MockQuery() for key in _query_keys(100)},
+        dbsession=DbSession()
+    )
+    return lambda: session.query(Wide.id)
+
+
+def time_per_call(func, repeat: int = 5) -> float:
+    """ Minimum seconds per call over 'repeat' runs of at least 0.2s """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(pattern: str = None, repeat: int = 5) -> dict:
+    """ Nanoseconds per call by benchmark name """
+    return {name: round(time_per_call(setup(), repeat) * 1e9, 1)
+            for name, setup in BENCHMARKS.items()
+            if not pattern or pattern in name}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """ Descriptions of benchmarks which are slower than the baseline by
+    more than a factor of 'tolerance' """
+    return ['{}: {:.1f}ns, baseline {:.1f}ns ({:.2f}x)'.format(
+        name, results[name], baseline[name], results[name] / baseline[name])
+        for name in sorted(set(results) & set(baseline))
+        if results[name] > baseline[name] * tolerance]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='pattern',
+                        help='only run benchmarks whose names contain this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write results as JSON to this path')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true',
+                        help='fail if slower than the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeat)
+    for name, ns in results.items():
+        print('{:<40} {:>14,.1f}ns'.format(name, ns))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION:', regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,92 @@
-from .mock_db_session import MockDbSession, PartialMockDbSession
-from .mock_model import MockModel, LazyAttrMockModel
-from .mock_pyramid_objects import (
-    DummyTmplContext, MockRequest, MockSession, MockResponse
-)
-from .mock_query import MockQuery
+import sys
+
+# Submodules are imported on first attribute access, so that e.g. importing
+# MockModel does not also import Pyramid and SQLAlchemy
+_submodules = {
+    'AsyncMockDbSession': 'async_mock_db_session',
+    'DummyTmplContext': 'mock_pyramid_objects',
+    'LazyAttrMockModel': 'mock_model',
+    'MemoryTracker': 'memory_report',
+    'MockDbSession': 'mock_db_session',
+    'MockModel': 'mock_model',
+    'MockRequest': 'mock_pyramid_objects',
+    'MockRequestPool': 'mock_pyramid_objects',
+    'MockResponse': 'mock_pyramid_objects',
+    'MockQuery': 'mock_query',
+    'MockResultSet': 'mock_result_set',
+    'MockSession': 'mock_pyramid_objects',
+    'PartialMockDbSession': 'mock_db_session',
+    'SharedDatabase': 'sqlite_database',
+    'ViewRunner': 'view_runner',
+    'generate_result_set': 'model_generator',
+    'generate_rows': 'model_generator',
+    'iter_dicts': 'serialize',
+    'iter_json': 'serialize',
+    'run_view': 'view_runner',
+    'shared_database': 'sqlite_database',
+    'to_dicts': 'serialize',
+    'to_json': 'serialize',
+    'track_memory': 'memory_report',
+}
 
 __all__ = [
-    DummyTmplContext,
-    LazyAttrMockModel,
-    MockDbSession,
-    MockModel,
-    MockRequest,
-    MockResponse,
-    MockQuery,
-    MockSession,
-    PartialMockDbSession
+    'AsyncMockDbSession',
+    'DummyTmplContext',
+    'LazyAttrMockModel',
+    'MemoryTracker',
+    'MockDbSession',
+    'MockModel',
+    'MockRequest',
+    'MockRequestPool',
+    'MockResponse',
+    'MockQuery',
+    'MockResultSet',
+    'MockSession',
+    'PartialMockDbSession',
+    'SharedDatabase',
+    'ViewRunner',
+    'generate_result_set',
+    'generate_rows',
+    'iter_dicts',
+    'iter_json',
+    'run_view',
+    'shared_database',
+    'to_dicts',
+    'to_json',
+    'track_memory'
 ]
+
+
+def __getattr__(name):
+    try:
+        submodule = _submodules[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
+    # Equivalent to 'from .submodule import name', unlike importlib this is
+    # included in the output of 'python -X importtime'
+    value = getattr(__import__(submodule, globals(), None, [name], 1), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is not supported before Python 3.7
+    from .async_mock_db_session import AsyncMockDbSession
+    from .memory_report import MemoryTracker, track_memory
+    from .mock_db_session import MockDbSession, PartialMockDbSession
+    from .mock_model import MockModel, LazyAttrMockModel
+    from .model_generator import generate_result_set, generate_rows
+    from .mock_pyramid_objects import (
+        DummyTmplContext, MockRequest, MockRequestPool, MockSession,
+        MockResponse
+    )
+    from .mock_query import MockQuery
+    from .mock_result_set import MockResultSet
+    from .serialize import iter_dicts, iter_json, to_dicts, to_json
+    from .sqlite_database import SharedDatabase, shared_database
+    from .view_runner import ViewRunner, run_view
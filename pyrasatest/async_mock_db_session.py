@@ -0,0 +1,201 @@
+import asyncio
+import itertools
+from typing import Iterable
+
+from .mock_db_session import MockDbSession
+from .mock_result import MockResult, MockScalarResult
+from .query_keys import statement_key
+
+
+class AsyncMockScalarResult:
+    """ Mock of sqlalchemy.ext.asyncio.AsyncScalarResult. 'on_fetch' is a
+    coroutine function called with the number of rows of each fetch, e.g. to
+    simulate latency per row """
+
+    def __init__(self, rows: Iterable = None, on_fetch=None) -> None:
+        self._rows = iter(rows or [])
+        self._on_fetch = on_fetch
+        self._yield_per = None
+
+    async def _fetch(self, size: int = None) -> list:
+        rows = list(self._rows if size is None
+                    else itertools.islice(self._rows, size))
+        if rows and self._on_fetch is not None:
+            await self._on_fetch(len(rows))
+        return rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while True:
+            rows = await self._fetch(self._yield_per or 1)
+            if not rows:
+                return
+            for row in rows:
+                yield row
+
+    def yield_per(self, num: int):
+        self._yield_per = num
+        return self
+
+    async def all(self) -> list:
+        return await self._fetch()
+
+    async def fetchall(self) -> list:
+        return await self._fetch()
+
+    async def fetchone(self):
+        return MockScalarResult(await self._fetch(1)).first()
+
+    async def fetchmany(self, size: int = None) -> list:
+        return await self._fetch(size or self._yield_per or 1)
+
+    async def partitions(self, size: int = None):
+        size = size or self._yield_per
+        while True:
+            partition = await self._fetch(size)
+            if not partition:
+                return
+            yield partition
+
+    async def first(self):
+        return MockScalarResult(await self._fetch(1)).first()
+
+    async def one_or_none(self):
+        return MockScalarResult(await self._fetch(2)).one_or_none()
+
+    async def one(self):
+        return MockScalarResult(await self._fetch(2)).one()
+
+
+class AsyncMockResult(AsyncMockScalarResult):
+    """ Mock of sqlalchemy.ext.asyncio.AsyncResult, as returned by
+    AsyncMockDbSession.stream """
+
+    def scalars(self, index: int = 0) -> AsyncMockScalarResult:
+        result = AsyncMockScalarResult((row[index] for row in self._rows),
+                                       self._on_fetch)
+        result._yield_per = self._yield_per
+        return result
+
+    async def scalar(self):
+        return MockResult(await self._fetch(1)).scalar()
+
+    async def scalar_one(self):
+        return MockResult(await self._fetch(2)).scalar_one()
+
+    async def scalar_one_or_none(self):
+        return MockResult(await self._fetch(2)).scalar_one_or_none()
+
+
+class AsyncMockDbSession(MockDbSession):
+    """ Mock of sqlalchemy.ext.asyncio.AsyncSession, with the same
+    'query_return_values' semantics as MockDbSession.execute.
+
+    Simulated latency, set with the 'latency' and 'default_latency' keyword
+    arguments as for MockDbSession, is awaited with asyncio.sleep, so that
+    queries made concurrently, e.g. with asyncio.gather, overlap in time.
+    Otherwise each query still yields to the event loop once. The number of
+    queries in progress at once is tracked in 'max_in_flight', and the
+    (key, start, end) loop times of each query in 'intervals'.
+    """
+
+    def __init__(self, query_return_values: dict = None, **kwargs) -> None:
+        # Blocking in time.sleep would stop queries from overlapping
+        super().__init__(query_return_values, **dict(kwargs, sleep=False))
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.intervals = []
+
+    def _reset_overlay(self) -> None:
+        super()._reset_overlay()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.intervals = []
+
+    async def _wait(self, key, model, rows: int) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            seconds = 0
+            if model is not None:
+                seconds = model.latency(rows)
+                self.clock.advance(seconds, key)
+            await asyncio.sleep(seconds)
+        finally:
+            self.in_flight -= 1
+        self.intervals.append((key, start, loop.time()))
+
+    def _recorded(self, result, statement, key):
+        if self.recorder is None:
+            return result
+        return self.recorder.record(lambda *args: result, (statement, ), key)
+
+    async def execute(self, statement, params=None, *args, **kwargs):
+        """ Rows are fetched before the simulated latency for them is
+        awaited, as for a buffered result """
+        if not getattr(statement, 'is_select', False):
+            return super().execute(statement, params)
+        key, num_columns = statement_key(statement)
+        query = self._query(key)
+        rows = list(self._statement_rows(statement, key, num_columns, query))
+        await self._wait(key, self._latency_model(key, query), len(rows))
+        return self._recorded(MockResult(rows), statement, key)
+
+    async def scalars(self, statement, params=None, *args, **kwargs):
+        return (await self.execute(statement, params)).scalars()
+
+    async def scalar(self, statement, params=None, *args, **kwargs):
+        return (await self.execute(statement, params)).scalar()
+
+    async def stream(self, statement, params=None, *args,
+                     **kwargs) -> AsyncMockResult:
+        """ Rows are streamed, with any latency per row awaited as they are
+        fetched """
+        key, num_columns = statement_key(statement)
+        query = self._query(key)
+        rows = self._statement_rows(statement, key, num_columns, query)
+        model = self._latency_model(key, query)
+        await self._wait(key, model, 0)
+
+        async def row_latency(count):
+            self.clock.advance(model.per_row * count, key, new_query=False)
+            await asyncio.sleep(model.per_row * count)
+
+        per_row = model is not None and model.per_row
+        result = AsyncMockResult(rows, row_latency if per_row else None)
+        # Recorded without a proxy, which would not support 'async for'
+        self._recorded(result, statement, key)
+        return result
+
+    async def stream_scalars(self, statement, params=None, *args, **kwargs):
+        return (await self.stream(statement, params)).scalars()
+
+    async def get(self, model, ident, *args, **kwargs):
+        return super().get(model, ident)
+
+    async def merge(self, instance, load=True):
+        return super().merge(instance, load)
+
+    async def delete(self, instance):
+        super().delete(instance)
+
+    async def refresh(self, instance, *args, **kwargs):
+        pass
+
+    async def flush(self, objects=None):
+        super().flush(objects)
+
+    async def commit(self):
+        # MockDbSession.commit calls self.flush, which is a coroutine here
+        MockDbSession.flush(self)
+        self.commit_called = True
+
+    async def rollback(self):
+        super().rollback()
+
+    async def close(self):
+        pass
@@ -0,0 +1,349 @@
+import operator
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    AsBoolean, BinaryExpression, BindParameter, BooleanClauseList, ClauseList,
+    ColumnClause, False_, Grouping, Label, Null, True_, UnaryExpression
+)
+from sqlalchemy.sql.functions import FunctionElement
+
+try:
+    from sqlalchemy.sql.elements import ExpressionClauseList
+    _clause_lists = (ClauseList, ExpressionClauseList)
+except ImportError:  # SQLAlchemy < 2.0
+    _clause_lists = (ClauseList, )
+
+COMPILED_CACHE_SIZE = 512
+
+_compiled_cache = OrderedDict()
+
+
+@lru_cache(maxsize=256)
+def like_regex(pattern: str, flags: int = 0):
+    """ Regular expression equivalent to an SQL LIKE pattern """
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c)
+                    for c in pattern)
+    return re.compile(regex + r'\Z', flags | re.DOTALL)
+
+
+def _null_safe(func):
+    def null_safe(left, right):
+        if left is None or right is None:
+            return None
+        return func(left, right)
+    return null_safe
+
+
+def _negated(func):
+    def negated(left, right):
+        value = func(left, right)
+        return None if value is None else not value
+    return negated
+
+
+def _like(left, right):
+    return like_regex(right).match(left) is not None
+
+
+def _ilike(left, right):
+    return like_regex(right, re.IGNORECASE).match(left) is not None
+
+
+def _is(left, right):
+    return left is right or (right is not None and left == right)
+
+
+def _between(left, right):
+    return right[0] <= left <= right[1]
+
+
+_binary_ops = {
+    operator.eq: _null_safe(operator.eq),
+    operator.ne: _null_safe(operator.ne),
+    operator.lt: _null_safe(operator.lt),
+    operator.le: _null_safe(operator.le),
+    operator.gt: _null_safe(operator.gt),
+    operator.ge: _null_safe(operator.ge),
+    operator.add: _null_safe(operator.add),
+    operator.sub: _null_safe(operator.sub),
+    operator.mul: _null_safe(operator.mul),
+    operator.truediv: _null_safe(operator.truediv),
+    operator.mod: _null_safe(operator.mod),
+}
+# Names differ across SQLAlchemy versions, e.g. 'notin_op' before 1.4
+for _names, _func in [
+    (['concat_op'], _null_safe(operator.add)),
+    (['in_op'], _null_safe(lambda a, b: a in b)),
+    (['not_in_op', 'notin_op'], _negated(_null_safe(lambda a, b: a in b))),
+    (['like_op'], _null_safe(_like)),
+    (['not_like_op', 'notlike_op'], _negated(_null_safe(_like))),
+    (['ilike_op'], _null_safe(_ilike)),
+    (['not_ilike_op', 'notilike_op'], _negated(_null_safe(_ilike))),
+    (['contains_op'], _null_safe(lambda a, b: b in a)),
+    (['not_contains_op', 'notcontains_op'],
+     _negated(_null_safe(lambda a, b: b in a))),
+    (['startswith_op'], _null_safe(lambda a, b: a.startswith(b))),
+    (['not_startswith_op', 'notstartswith_op'],
+     _negated(_null_safe(lambda a, b: a.startswith(b)))),
+    (['endswith_op'], _null_safe(lambda a, b: a.endswith(b))),
+    (['not_endswith_op', 'notendswith_op'],
+     _negated(_null_safe(lambda a, b: a.endswith(b)))),
+    (['between_op'], _null_safe(_between)),
+    (['not_between_op', 'notbetween_op'], _negated(_null_safe(_between))),
+    (['is_'], _is),
+    (['is_not', 'isnot'], lambda a, b: not _is(a, b)),
+]:
+    for _name in _names:
+        if hasattr(operators, _name):
+            _binary_ops[getattr(operators, _name)] = _func
+
+_sql_functions = {
+    'lower': lambda v: None if v is None else v.lower(),
+    'upper': lambda v: None if v is None else v.upper(),
+    'length': lambda v: None if v is None else len(v),
+    'abs': lambda v: None if v is None else abs(v),
+    'coalesce': lambda *vals: next((v for v in vals if v is not None), None),
+}
+
+
+def clause_element(expression):
+    """ e.g. Foo.bar InstrumentedAttribute to its annotated Column """
+    if hasattr(expression, '__clause_element__'):
+        return expression.__clause_element__()
+    return expression
+
+
+def attribute_key(column: ColumnClause) -> str:
+    """ Name of the model attribute which a mapped column is accessed by """
+    annotations = getattr(column, '_annotations', None) or {}
+    return annotations.get('proxy_key', column.key)
+
+
+def param_value(bindparam: BindParameter):
+    value = bindparam.effective_value
+    if bindparam.expanding:
+        try:
+            return frozenset(value)
+        except TypeError:
+            return tuple(value)
+    return value
+
+
+class _Compiler:
+    """ Compiles a SQLAlchemy expression into nested Python functions, each
+    taking a row and a list of bound parameter values """
+
+    def __init__(self):
+        self.bindparams = []
+        # Tables of the columns in the expression
+        self.tables = set()
+
+    def compile(self, element):
+        element = clause_element(element)
+        if isinstance(element, (Grouping, Label)):
+            return self.compile(element.element)
+        if isinstance(element, BindParameter):
+            return self._bindparam(element)
+        if isinstance(element, Null):
+            return lambda row, params: None
+        if isinstance(element, True_):
+            return lambda row, params: True
+        if isinstance(element, False_):
+            return lambda row, params: False
+        if isinstance(element, ColumnClause) and element.table is not None:
+            self.tables.add(element.table)
+            getter = operator.attrgetter(attribute_key(element))
+            return lambda row, params: getter(row)
+        if isinstance(element, BinaryExpression):
+            return self._binary(element)
+        if isinstance(element, BooleanClauseList):
+            return self._boolean(element)
+        if isinstance(element, _clause_lists):
+            clauses = [self.compile(c) for c in element.clauses]
+            return lambda row, params: tuple(c(row, params) for c in clauses)
+        if isinstance(element, AsBoolean):
+            return self._unary(element.element, element.operator)
+        if isinstance(element, UnaryExpression) and element.operator:
+            return self._unary(element.element, element.operator)
+        if isinstance(element, FunctionElement):
+            return self._function(element)
+        raise NotImplementedError(
+            'Evaluation of {} is not supported'.format(type(element).__name__))
+
+    def _bindparam(self, bindparam):
+        index = len(self.bindparams)
+        self.bindparams.append(bindparam)
+        return lambda row, params: params[index]
+
+    def _binary(self, element):
+        try:
+            func = _binary_ops[element.operator]
+        except KeyError:
+            raise NotImplementedError('Evaluation of operator {} is not '
+                                      'supported'.format(element.operator))
+        left = self.compile(element.left)
+        right = self.compile(element.right)
+        return lambda row, params: func(left(row, params), right(row, params))
+
+    def _boolean(self, element):
+        clauses = [self.compile(c) for c in element.clauses]
+        if element.operator is operators.or_:
+            def or_(row, params):
+                result = False
+                for clause in clauses:
+                    value = clause(row, params)
+                    if value:
+                        return True
+                    if value is None:
+                        result = None
+                return result
+            return or_
+
+        def and_(row, params):
+            result = True
+            for clause in clauses:
+                value = clause(row, params)
+                if value is None:
+                    result = None
+                elif not value:
+                    return False
+            return result
+        return and_
+
+    def _unary(self, element, op):
+        inner = self.compile(element)
+        if op in (operators.inv, operators.is_false):
+            def negate(row, params):
+                value = inner(row, params)
+                return None if value is None else not value
+            return negate
+        if op is operators.is_true:
+            return lambda row, params: inner(row, params)
+        if op is operators.neg:
+            def neg(row, params):
+                value = inner(row, params)
+                return None if value is None else -value
+            return neg
+        raise NotImplementedError(
+            'Evaluation of operator {} is not supported'.format(op))
+
+    def _function(self, element):
+        try:
+            func = _sql_functions[element.name.lower()]
+        except KeyError:
+            raise NotImplementedError(
+                'Evaluation of function {} is not supported'.format(
+                    element.name))
+        args = [self.compile(c) for c in element.clauses.clauses]
+        return lambda row, params: func(*[a(row, params) for a in args])
+
+
+def _cache_key(element):
+    try:
+        cache_key = element._generate_cache_key()
+        hash(cache_key.key)
+    except (AttributeError, TypeError):
+        return None
+    return cache_key
+
+
+def compile_expression(expression, tables: frozenset = None):
+    """ Compiles 'expression' into a function which evaluates it against the
+    attributes of a row object, e.g. a MockModel instance.
+
+    Compiled forms are cached by the SQLAlchemy cache key of the expression,
+    which is the same for expressions of the same shape regardless of bound
+    values, so Foo.id == 1 and Foo.id == 2 are only compiled once.
+
+    If 'tables' are given, the tables of the rows' mapped class, columns of
+    other tables, such as those of a joined entity, raise NotImplementedError
+    rather than being evaluated against the row attribute of the same name
+    """
+    element = clause_element(expression)
+    cache_key = _cache_key(element)
+    cached = None
+    if cache_key is not None:
+        cached = _compiled_cache.get(cache_key.key)
+    if cached is not None:
+        try:
+            _compiled_cache.move_to_end(cache_key.key)
+        except KeyError:
+            # Evicted by another thread since the lookup
+            pass
+        func, positions, column_tables = cached
+        params = [param_value(cache_key.bindparams[i]) for i in positions]
+    else:
+        compiler = _Compiler()
+        func = compiler.compile(element)
+        column_tables = frozenset(compiler.tables)
+        params = [param_value(bp) for bp in compiler.bindparams]
+        if cache_key is not None:
+            index = {id(bp): i for i, bp in enumerate(cache_key.bindparams)}
+            positions = [index.get(id(bp)) for bp in compiler.bindparams]
+            if None not in positions:
+                _compiled_cache[cache_key.key] = (func, positions,
+                                                  column_tables)
+                if len(_compiled_cache) > COMPILED_CACHE_SIZE:
+                    _compiled_cache.popitem(last=False)
+    if tables is not None and not column_tables <= tables:
+        raise NotImplementedError(
+            'Evaluation of columns of {} is not supported'.format(', '.join(
+                sorted(str(table) for table in column_tables - tables))))
+    return lambda row: func(row, params)
+
+
+def equality_lookups(expression):
+    """ Yields (attribute key, values) tuples for the equality and IN
+    conditions which 'expression' requires to be true of every matching row,
+    for which a hash index may be used to find candidate rows """
+    element = clause_element(expression)
+    if isinstance(element, BooleanClauseList):
+        if element.operator is operators.and_:
+            for clause in element.clauses:
+                yield from equality_lookups(clause)
+        return
+    if not isinstance(element, BinaryExpression):
+        return
+    left, right = element.left, element.right
+    if not isinstance(left, ColumnClause) or left.table is None:
+        return
+    if not isinstance(right, BindParameter):
+        return
+    if element.operator is operator.eq:
+        yield attribute_key(left), (right.effective_value, )
+    elif element.operator is operators.in_op:
+        yield attribute_key(left), tuple(right.effective_value)
+
+
+def sort_key(expression, tables: frozenset = None):
+    """ Returns a tuple of a function giving the sort value of a row and
+    whether to sort descending, for an order_by argument. As with
+    PostgreSQL, NULL values sort as larger than any other value. 'tables'
+    are as for compile_expression """
+    descending = False
+    if isinstance(expression, str):
+        evaluate = operator.attrgetter(expression)
+    else:
+        element = clause_element(expression)
+        if isinstance(element, UnaryExpression) and element.modifier in (
+                operators.desc_op, operators.asc_op):
+            descending = element.modifier is operators.desc_op
+            element = element.element
+        evaluate = compile_expression(element, tables)
+
+    def key(row):
+        value = evaluate(row)
+        return value is None, value
+    return key, descending
+
+
+def sort_rows(rows, order_by, tables: frozenset = None):
+    """ Sorts by each order_by argument in turn, relying on sort stability """
+    rows = list(rows)
+    for expression in reversed(order_by):
+        key, descending = sort_key(expression, tables)
+        rows.sort(key=key, reverse=descending)
+    return rows
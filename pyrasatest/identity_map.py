@@ -0,0 +1,129 @@
+from functools import lru_cache
+
+from sqlalchemy import exc, inspect
+from sqlalchemy.orm import Mapper
+
+
+@lru_cache(maxsize=None)
+def mapper_attrs(model) -> tuple:
+    """ (primary key attribute names, column attribute names) of a mapped
+    class, or None if 'model' is not mapped """
+    try:
+        mapper = inspect(model)
+    except exc.NoInspectionAvailable:
+        return None
+    if not isinstance(mapper, Mapper):
+        return None
+    primary_key = tuple(mapper.get_property_by_column(col).key
+                        for col in mapper.primary_key)
+    return primary_key, tuple(attr.key for attr in mapper.column_attrs)
+
+
+@lru_cache(maxsize=None)
+def mapper_tables(model) -> frozenset:
+    """ Tables which the columns of a mapped class are of, or None if 'model'
+    is not mapped """
+    if mapper_attrs(model) is None:
+        return None
+    return frozenset(inspect(model).tables)
+
+
+class IdentityMap:
+    """ Objects by (mapped class, primary key value tuple), as for the
+    identity map of an SQLAlchemy session. If 'parent' is given, objects in
+    it are included unless discarded, without 'parent' being modified """
+
+    def __init__(self, parent=None) -> None:
+        self.objects = {}
+        self.parent = parent
+        # Keys of objects in 'parent' which are discarded from this map
+        self._discarded = set()
+        self._next_pk = dict(parent._next_pk) if parent is not None else {}
+
+    def _lookup(self, key):
+        record = self.objects.get(key)
+        if record is None and self.parent is not None and \
+                key not in self._discarded:
+            return self.parent._lookup(key)
+        return record
+
+    def keys(self) -> set:
+        keys = set(self.objects)
+        if self.parent is not None:
+            keys |= self.parent.keys() - self._discarded
+        return keys
+
+    def owns(self, record, model=None) -> bool:
+        """ Whether 'record' was added to this map rather than to 'parent' """
+        key = self.key(record, model)
+        return key is not None and self.objects.get(key) is record
+
+    def key(self, record, model=None) -> tuple:
+        """ Identity key of 'record', or None if it has no primary key value.
+        'model' defaults to the class of 'record', and is given for objects
+        such as MockModel instances which represent instances of 'model' """
+        model = model or type(record)
+        attrs = mapper_attrs(model)
+        if attrs is None:
+            return None
+        ident = tuple(getattr(record, attr, None) for attr in attrs[0])
+        if None in ident:
+            return None
+        return model, ident
+
+    def add(self, record, model=None) -> bool:
+        """ Returns False if 'record' has no identity key """
+        key = self.key(record, model)
+        if key is None:
+            return False
+        self.objects[key] = record
+        self._discarded.discard(key)
+        model, ident = key
+        if model in self._next_pk and isinstance(ident[0], int):
+            self._next_pk[model] = max(self._next_pk[model], ident[0] + 1)
+        return True
+
+    def get(self, model, ident):
+        """ 'ident' is a primary key value, or a tuple or dict of values for
+        a composite primary key """
+        if isinstance(ident, dict):
+            ident = tuple(ident[attr] for attr in mapper_attrs(model)[0])
+        elif not isinstance(ident, tuple):
+            ident = (ident, )
+        return self._lookup((model, ident))
+
+    def get_for(self, record, model=None):
+        """ Object with the same identity as 'record' """
+        key = self.key(record, model)
+        return self._lookup(key) if key is not None else None
+
+    def discard(self, record, model=None) -> None:
+        key = self.key(record, model)
+        if key is not None and self._lookup(key) is record:
+            self.objects.pop(key, None)
+            if self.parent is not None:
+                self._discarded.add(key)
+
+    def assign_primary_key(self, record, model=None) -> bool:
+        """ Sets an integer primary key value on 'record' if it is unset,
+        as for an autoincrement column on flush. Returns False if it could
+        not be assigned, e.g. for a composite primary key """
+        model = model or type(record)
+        attrs = mapper_attrs(model)
+        if attrs is None or len(attrs[0]) != 1:
+            return False
+        attr = attrs[0][0]
+        if getattr(record, attr, None) is None:
+            if model not in self._next_pk:
+                self._next_pk[model] = max(
+                    [ident[0] for m, ident in self.keys()
+                     if m is model and isinstance(ident[0], int)],
+                    default=0) + 1
+            setattr(record, attr, self._next_pk[model])
+            self._next_pk[model] += 1
+        return self.add(record, model)
+
+    def __len__(self):
+        if self.parent is None:
+            return len(self.objects)
+        return len(self.keys())
@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+from typing import Callable
+
+
+class LatencyModel:
+    """ Simulated duration in seconds of executing a query, which is the sum
+    of a fixed duration, a duration per row returned and optionally a value
+    drawn from a distribution
+
+    :param fixed: seconds per query
+    :param per_row: seconds per row returned by the query
+    :param distribution: callable without arguments returning seconds
+    """
+
+    def __init__(self, fixed: float = 0.0, per_row: float = 0.0,
+                 distribution: Callable[[], float] = None) -> None:
+        self.fixed = fixed
+        self.per_row = per_row
+        self.distribution = distribution
+
+    @classmethod
+    def normal(cls, mean: float, stdev: float, per_row: float = 0.0,
+               seed=None):
+        rng = random.Random(seed)
+        return cls(per_row=per_row,
+                   distribution=lambda: max(0.0, rng.gauss(mean, stdev)))
+
+    @classmethod
+    def uniform(cls, low: float, high: float, per_row: float = 0.0,
+                seed=None):
+        rng = random.Random(seed)
+        return cls(per_row=per_row,
+                   distribution=lambda: rng.uniform(low, high))
+
+    def latency(self, rows: int = 0) -> float:
+        seconds = self.fixed + self.per_row * rows
+        if self.distribution is not None:
+            seconds += self.distribution()
+        return seconds
+
+
+def latency_model(value) -> LatencyModel:
+    """ A number of seconds is taken as a fixed latency """
+    if value is None or isinstance(value, LatencyModel):
+        return value
+    return LatencyModel(fixed=value)
+
+
+class DbClock:
+    """ Accumulates simulated database time, by query key. If 'sleep' is
+    True, time.sleep is also called for each simulated duration, otherwise
+    the clock is only virtual, e.g. 'time' can be patched in place of
+    time.monotonic to test timeout or caching behavior. If 'thread_safe' is
+    True, time may be added from multiple threads """
+
+    def __init__(self, sleep: bool = False, thread_safe: bool = False) -> None:
+        self.sleep = sleep
+        self._lock = threading.Lock() if thread_safe else None
+        self.start = time.monotonic()
+        self.elapsed = 0.0
+        self.by_key = {}
+
+    def advance(self, seconds: float, key=None, new_query=True) -> None:
+        """ 'by_key' values are tuples of query count and total seconds """
+        if self._lock is None:
+            self._add(seconds, key, new_query)
+        else:
+            with self._lock:
+                self._add(seconds, key, new_query)
+        if self.sleep and seconds > 0:
+            time.sleep(seconds)
+
+    def _add(self, seconds: float, key, new_query: bool) -> None:
+        self.elapsed += seconds
+        count, total = self.by_key.get(key, (0, 0.0))
+        self.by_key[key] = (count + new_query, total + seconds)
+
+    def time(self) -> float:
+        return self.start + self.elapsed
+
+    def reset(self) -> None:
+        self.elapsed = 0.0
+        self.by_key = {}
+
+
+def _row_count(method_name: str, result) -> int:
+    if method_name == 'all':
+        try:
+            return len(result)
+        except TypeError:
+            return 1
+    if method_name == 'count':
+        return 1
+    return 0 if result is None else 1
+
+
+class TimedQuery:
+    """ Proxy for a query returned by MockDbSession.query, which advances a
+    DbClock when the query is executed, i.e. by a method such as all() or
+    by iteration, including for queries it returns """
+    execute_methods = {'all', 'first', 'one', 'one_or_none', 'scalar',
+                       'count'}
+
+    def __init__(self, query, model: LatencyModel, clock: DbClock,
+                 key=None) -> None:
+        self._query = query
+        self._model = model
+        self._clock = clock
+        self._key = key
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            if name not in self.execute_methods:
+                result = attr(*args, **kwargs)
+                if type(result) is type(self._query):
+                    return TimedQuery(result, self._model, self._clock,
+                                      self._key)
+                return result
+            rows = 0
+            try:
+                result = attr(*args, **kwargs)
+                rows = _row_count(name, result)
+                return result
+            finally:
+                self._clock.advance(self._model.latency(rows), self._key)
+        return method
+
+    def __iter__(self):
+        self._clock.advance(self._model.latency(0), self._key)
+        per_row = self._model.per_row
+        for row in self._query:
+            if per_row:
+                self._clock.advance(per_row, self._key, new_query=False)
+            yield row
@@ -0,0 +1,295 @@
+import gc
+import itertools
+import os
+import sys
+import tracemalloc
+from array import array
+from collections import defaultdict
+
+from .query_recorder import _PACKAGE_DIR
+
+_FILE = os.path.abspath(__file__)
+
+# Containers referenced by a pyrasatest object which are counted in its
+# size, e.g. 'side_effect' lists, 'added_records' and 'init_kwargs'
+_CONTAINERS = (list, tuple, dict, set, frozenset, array)
+
+
+def _is_package_file(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    return os.path.dirname(path) == _PACKAGE_DIR
+
+
+def _is_pyrasatest_class(cls: type) -> bool:
+    if issubclass(cls, type):
+        return False
+    module = getattr(cls, '__module__', None) or ''
+    return module.startswith('pyrasatest.') and \
+        not module.startswith('pyrasatest.tests')
+
+
+def is_pyrasatest_object(obj) -> bool:
+    """ Whether 'obj' is an instance of a pyrasatest class, such as
+    MockRequest or a MockModel.schema row class, other than a test class """
+    return _is_pyrasatest_class(type(obj))
+
+
+def _attribute_values(obj) -> list:
+    values = list(vars(obj).values()) if hasattr(obj, '__dict__') else []
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            values.append(getattr(obj, name, None))
+    return values
+
+
+def _traceback(obj):
+    """ tracemalloc traceback of 'obj', or else of its instance dict or a
+    container attribute, as in Python 3.11 there is none for objects whose
+    __dict__ is stored inline, and those are allocated as it is created """
+    traceback = tracemalloc.get_object_traceback(obj)
+    if traceback is not None or not hasattr(obj, '__dict__'):
+        return traceback
+    for value in [obj.__dict__] + _attribute_values(obj):
+        if not isinstance(value, _CONTAINERS):
+            continue
+        traceback = tracemalloc.get_object_traceback(value)
+        # Not an instance dict which was only created by accessing it here
+        if traceback is not None and \
+                os.path.abspath(traceback[-1].filename) != _FILE:
+            return traceback
+    return None
+
+
+def creation_site(obj) -> tuple:
+    """ (filename, line number) of the code which called into pyrasatest to
+    create 'obj', or None if it was created while tracemalloc was not
+    tracing, or if it is unknown, as for some objects with an instance dict
+    in Python 3.11, whose dict and attributes reused freed memory """
+    traceback = _traceback(obj)
+    if traceback is None:
+        return None
+    # Frames are from the oldest to the most recent
+    frames = [frame for frame in traceback
+              if not frame.filename.startswith('<')] or list(traceback)
+    site = frames[-1]
+    for caller, frame in zip(frames, frames[1:]):
+        if _is_package_file(frame.filename) and \
+                not _is_package_file(caller.filename):
+            site = caller
+            break
+    return site.filename, site.lineno
+
+
+def object_size(obj, seen: set) -> int:
+    """ Bytes of 'obj', its instance dict and the containers which its
+    attributes directly refer to, other than those in 'seen' """
+    size = 0
+    for value in [obj, getattr(obj, '__dict__', None)]:
+        if value is not None and id(value) not in seen:
+            seen.add(id(value))
+            size += sys.getsizeof(value)
+    for value in _attribute_values(obj):
+        if isinstance(value, _CONTAINERS) and id(value) not in seen:
+            seen.add(id(value))
+            size += sys.getsizeof(value)
+    return size
+
+
+def _owner_attrs(owner, depth: int = 8) -> dict:
+    """ Sets of the names of attributes of 'owner' which refer to an object,
+    directly or through up to 'depth' pyrasatest objects and containers,
+    e.g. 'request' for request.dbsession, by object id """
+    attrs = defaultdict(set)
+    for attr, value in vars(owner).items():
+        level = [value]
+        visited = set()
+        for _ in range(depth):
+            referents = []
+            for obj in level:
+                if id(obj) in visited:
+                    continue
+                visited.add(id(obj))
+                attrs[id(obj)].add(attr)
+                if is_pyrasatest_object(obj) or isinstance(obj, _CONTAINERS):
+                    referents.extend(gc.get_referents(obj))
+            level = referents
+    return attrs
+
+
+def _pyrasatest_objects() -> list:
+    # Each class is only checked once, and the objects are filtered by
+    # their class without calling Python code for each of them
+    objects = gc.get_objects()
+    classes = {cls for cls in set(map(type, objects))
+               if _is_pyrasatest_class(cls)}
+    return list(itertools.compress(
+        objects, map(classes.__contains__, map(type, objects))))
+
+
+class SurvivorGroup:
+    """ Instances of a pyrasatest class created at the same line of a test,
+    which were still referenced after it finished """
+
+    def __init__(self, type_name: str, site: tuple) -> None:
+        self.type_name = type_name
+        self.site = site
+        self.count = 0
+        self.size = 0
+        # Attributes of the test case which refer to the instances, directly
+        # or through other objects
+        self.held_by = set()
+
+    def __repr__(self):
+        site = '{}:{}'.format(os.path.basename(self.site[0]),
+                              self.site[1]) if self.site else 'unknown'
+        held_by = ' held by {}'.format(', '.join(
+            sorted(self.held_by))) if self.held_by else ''
+        return '<SurvivorGroup {} x{} from {}, {} bytes{}>'.format(
+            self.type_name, self.count, site, self.size, held_by)
+
+
+class MemoryReport:
+    """ Memory allocated during a test and retained after it """
+
+    def __init__(self, name: str, allocated: int, retained: int,
+                 survivors: list, retained_sites: list) -> None:
+        self.name = name
+        # Peak and retained traced bytes, relative to the start of the test
+        self.allocated = allocated
+        self.retained = retained
+        # SurvivorGroup instances, largest first
+        self.survivors = survivors
+        # (filename, line number, bytes, number of blocks) of lines of
+        # pyrasatest code which allocated retained memory, largest first
+        self.retained_sites = retained_sites
+
+    def __str__(self):
+        lines = ['{}: {} bytes allocated, {} bytes retained'.format(
+            self.name, self.allocated, self.retained)]
+        lines.extend('  {!r}'.format(group) for group in self.survivors)
+        lines.extend('  {}:{}: {} bytes in {} blocks'.format(
+            os.path.basename(filename), lineno, size, count)
+            for filename, lineno, size, count in self.retained_sites)
+        return '\n'.join(lines)
+
+    def assert_no_survivors(self) -> None:
+        if self.survivors:
+            raise AssertionError('pyrasatest objects referenced after the '
+                                 'test:\n{}'.format(self))
+
+    def assert_max_retained(self, size: int) -> None:
+        if self.retained > size:
+            raise AssertionError('{} bytes retained, expected at most {}:\n'
+                                 '{}'.format(self.retained, size, self))
+
+
+class MemoryTracker:
+    """ Measures the memory allocated and retained by each test with
+    tracemalloc, and finds pyrasatest objects which a test created that are
+    still referenced after it, for example by an attribute of the test case,
+    which unittest keeps until the end of the run. This is opt-in, as it
+    scans all objects tracked by the garbage collector twice per test """
+
+    def __init__(self, frames: int = 25, top_sites: int = 10) -> None:
+        self.frames = frames
+        self.top_sites = top_sites
+        self.reports = []
+        self._started_tracing = False
+        self._existing = None
+        self._snapshot = None
+        self._start_size = 0
+
+    def start(self) -> None:
+        if tracemalloc.is_tracing():
+            # Garbage which was traced before the test is freed now rather
+            # than during it. Otherwise its memory is not traced, and the
+            # collection in 'stop' is enough
+            gc.collect()
+        else:
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        # Referenced until 'stop', so that the ids of objects which the test
+        # frees are not reused by objects it creates
+        self._existing = {id(obj): obj for obj in _pyrasatest_objects()}
+        self._snapshot = tracemalloc.take_snapshot()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self._start_size = tracemalloc.get_traced_memory()[0]
+
+    def stop(self, name: str = None, owner=None) -> MemoryReport:
+        """ Report of the test since 'start', where 'owner' is the test case,
+        whose attributes referring to surviving objects are reported """
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - self._start_size
+        snapshot = tracemalloc.take_snapshot()
+        survivors = self._survivors(owner)
+        report = MemoryReport(name or 'test', max(peak - self._start_size, 0),
+                              retained, survivors,
+                              self._retained_sites(snapshot))
+        self._existing = self._snapshot = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.reports.append(report)
+        return report
+
+    def _survivors(self, owner) -> list:
+        attrs = _owner_attrs(owner) if owner is not None else {}
+        groups = {}
+        seen = set()
+        for obj in _pyrasatest_objects():
+            if id(obj) in self._existing:
+                continue
+            key = type(obj).__name__, creation_site(obj)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = SurvivorGroup(*key)
+            group.count += 1
+            group.size += object_size(obj, seen)
+            group.held_by.update(attrs.get(id(obj), ()))
+        return sorted(groups.values(), key=lambda g: g.size, reverse=True)
+
+    def _retained_sites(self, snapshot) -> list:
+        filters = [
+            tracemalloc.Filter(True, os.path.join(_PACKAGE_DIR, '*.py')),
+            tracemalloc.Filter(False, _FILE)]
+        differences = snapshot.filter_traces(filters).compare_to(
+            self._snapshot.filter_traces(filters), 'lineno')
+        sites = [(diff.traceback[0].filename, diff.traceback[0].lineno,
+                  diff.size_diff, diff.count_diff)
+                 for diff in differences if diff.size_diff > 0]
+        return sites[:self.top_sites]
+
+    def summary(self) -> str:
+        """ Reports of tests which retained pyrasatest objects, largest
+        first """
+        reports = sorted((r for r in self.reports if r.survivors),
+                         key=lambda r: r.retained, reverse=True)
+        return '\n'.join(str(report) for report in reports)
+
+
+def track_memory(testcase, tracker: MemoryTracker = None,
+                 max_retained: int = None,
+                 allow_survivors: bool = True) -> MemoryTracker:
+    """ Tracks the memory of a unittest test, when called from setUp. Its
+    report is made after tearDown and any other cleanups, and is stored as
+    'testcase.memory_report' and in 'tracker.reports', so that one tracker
+    can collect the reports of a whole run. The test fails if it retains
+    more than 'max_retained' bytes, or unless 'allow_survivors', any
+    pyrasatest objects """
+    tracker = tracker or MemoryTracker()
+
+    def finish():
+        report = tracker.stop(testcase.id(), testcase)
+        testcase.memory_report = report
+        if not allow_survivors:
+            report.assert_no_survivors()
+        if max_retained is not None:
+            report.assert_max_retained(max_retained)
+
+    tracker.start()
+    # Cleanups run in reverse order, so this runs after cleanups added
+    # later in setUp or by the test
+    testcase.addCleanup(finish)
+    return tracker
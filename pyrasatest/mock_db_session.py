@@ -1,17 +1,46 @@
+import copy
+import threading
+from functools import partial, wraps
+
 from sqlalchemy import exc
-from sqlalchemy.ext.declarative import DeclarativeMeta
-from sqlalchemy.orm.attributes import InstrumentedAttribute
-from sqlalchemy.sql.elements import Label
 
+from .identity_map import IdentityMap, mapper_attrs, mapper_tables
+from .latency import DbClock, TimedQuery, latency_model
+from .mock_model import MockModel
 from .mock_query import MockQuery
+from .mock_result import MockResult
+from .mock_result_set import MockResultSet
+from .overlay import Overlay, OverlayDict, OverlayQueryReturnValues
+from .query_fixture import RecordingSession, ReplaySession
+from .query_keys import QueryReturnValues, normalize_key, statement_key
+from .query_recorder import QueryRecorder
+from .scenario import load_scenario
+
+
+def synchronized(method):
+    """ Holds the lock of a thread-safe session while 'method', which
+    changes the session, runs. Raises if the session is frozen """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._frozen:
+            raise RuntimeError('{} is frozen, as it is the base of forks, '
+                               'make changes to a fork'.format(
+                                   type(self).__name__))
+        if self._lock is None:
+            return method(self, *args, **kwargs)
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class MockDbSession:
+    # Session which a fork overlays, and whether the session is frozen as
+    # the base of forks, see 'fork'
+    _base = None
+    _frozen = False
+
     def __init__(self, query_return_values: dict = None, **kwargs) -> None:
-        self.query_return_values = {
-            '{}.{}'.format(k, k.key) if isinstance(k, Label) else k: v for k, v
-            in query_return_values.items()
-        } if query_return_values else {}
+        self.query_return_values = query_return_values
         self.raise_exception = kwargs.get('raise_exception')
         self.return_value = None
         self.side_effect = None
@@ -19,23 +48,346 @@ class MockDbSession:
         self.rollback_called = False
         self.query_call_count = 0
         self.added_records = []
+        self.deleted_records = []
+        self.flush_called = False
+        # If 'thread_safe' is True, changes to the session are made under a
+        # lock, and each thread consumes 'side_effect' independently
+        self._lock = threading.RLock() if kwargs.get('thread_safe') else None
+        self._thread_call_counts = {}
+        # If True, 'side_effect' starts again from the first item after the
+        # last, rather than raising IndexError
+        self.cycle_side_effect = kwargs.get('cycle_side_effect', False)
+        # (statement, params) tuples of statements other than selects which
+        # are passed to 'execute', e.g. insert, update and delete statements
+        self.executed_statements = []
+        # Evaluating MockQuery instances by model, which queries on the model
+        # fall back to, see 'register_table'
+        self.tables = {}
+        self.identity_map = IdentityMap()
+        # (model, record) tuples to be assigned primary keys on flush
+        self._pending = []
+        self.recorder = QueryRecorder() if kwargs.get('record_queries') \
+            else None
+        # Simulated query latency, enabled by any of these keyword arguments.
+        # 'latency' is a dict of query keys, as for 'query_return_values',
+        # to LatencyModel instances or numbers of seconds
+        self.clock = None
+        self.latency = {}
+        self.default_latency = latency_model(kwargs.get('default_latency'))
+        if {'latency', 'default_latency', 'clock'} & set(kwargs):
+            self.clock = kwargs.get('clock') or DbClock(
+                sleep=kwargs.get('sleep', False),
+                thread_safe=self._lock is not None)
+            self.latency = {normalize_key(k): latency_model(v) for k, v
+                            in (kwargs.get('latency') or {}).items()}
+
+    @classmethod
+    def from_scenario(cls, path: str, cache_dir: str = None, **kwargs):
+        """ Session with the query_return_values of a scenario file, see
+        scenario.load_scenario. The compiled scenario is shared by sessions,
+        which each have an overlay over it as for 'fork', so that changes
+        made by a session, e.g. to its MockModel values, are its own """
+        table = load_scenario(path, cache_dir)
+        session = cls(table, **kwargs)
+        session._query_return_values = OverlayQueryReturnValues(table,
+                                                                Overlay())
+        return session
+
+    @property
+    def query_return_values(self) -> QueryReturnValues:
+        return self._query_return_values
+
+    @query_return_values.setter
+    def query_return_values(self, value: dict) -> None:
+        if self._frozen:
+            raise RuntimeError('query_return_values are frozen, as the '
+                               'session is the base of forks')
+        self._query_return_values = QueryReturnValues(value or {})
 
+    @synchronized
     def add(self, record):
         self.added_records.append(record)
+        self._add_batch(type(record), [record])
 
-    def commit(self):
+    @synchronized
+    def add_all(self, records):
+        records = list(records)
+        self.added_records.extend(records)
+        batches = {}
+        for record in records:
+            batches.setdefault(type(record), []).append(record)
+        for model, batch in batches.items():
+            self._add_batch(model, batch)
+
+    def bulk_save_objects(self, objects, *args, **kwargs):
+        self.add_all(objects)
+
+    @synchronized
+    def bulk_insert_mappings(self, mapper, mappings, *args, **kwargs):
+        """ Rows are added as MockModel instances representing instances of
+        the mapped class """
+        model = getattr(mapper, 'class_', mapper)
+        records = [MockModel(**mapping) for mapping in mappings]
+        self.added_records.extend(records)
+        self._add_batch(model, records)
+
+    def _add_batch(self, model, records):
+        """ Adds instances of 'model' to the identity map, and to the rows of
+        an evaluating MockQuery for 'model' if it is a mapped class """
+        if mapper_attrs(model) is None:
+            return
+        table = self.tables.get(model)
+        if table is None:
+            table = self.tables[model] = MockQuery(
+                evaluate=True, entity_tables=mapper_tables(model))
+        table.add_rows(records)
+        for record in records:
+            if not self.identity_map.add(record, model):
+                self._pending.append((model, record))
+
+    def get(self, model, ident):
+        """ Object added to the session, or in the rows of a registered
+        table, with the primary key value 'ident' """
+        return self.identity_map.get(model, ident)
+
+    @synchronized
+    def merge(self, instance, load=True):
+        model = type(instance)
+        existing = self.identity_map.get_for(instance, model)
+        if existing is None:
+            self.add(instance)
+            return instance
+        if existing is not instance and self._base is not None and \
+                not self.identity_map.owns(existing, model):
+            # Objects of the base session of a fork are replaced in the fork
+            # rather than changed
+            self._remove(existing, model)
+            self.add(instance)
+            return instance
+        if existing is not instance:
+            for attr in mapper_attrs(model)[1]:
+                setattr(existing, attr, getattr(instance, attr))
+            if model in self.tables:
+                self.tables[model].reset_indexes()
+        return existing
+
+    @synchronized
+    def delete(self, instance):
+        self.deleted_records.append(instance)
+        self._remove(instance, type(instance))
+
+    def _remove(self, instance, model) -> None:
+        self.identity_map.discard(instance, model)
+        if model in self.tables and instance in self.tables[model].all_:
+            self.tables[model].remove_row(instance)
+
+    @synchronized
+    def register_table(self, model, rows=None, indexes=()) -> MockQuery:
+        """ Mocks queries on 'model' with an evaluating MockQuery whose rows
+        are 'rows' plus any instances of 'model' which are added to the
+        session. Attributes named in 'indexes' are hash indexed for equality
+        and IN filters. Filters on columns of other models, e.g. after a
+        join, raise NotImplementedError. As the MockQuery is set in
+        'query_return_values', call this after any assignment to that
+        attribute
+        """
+        rows = list(rows or [])
+        query = MockQuery(all_=rows, evaluate=True, indexes=indexes,
+                          entity_tables=mapper_tables(model))
+        self.tables[model] = query
+        self.query_return_values[model] = query
+        for row in rows:
+            self.identity_map.add(row, model)
+        return query
+
+    @synchronized
+    def flush(self, objects=None):
+        """ Assigns integer primary key values to added objects which have
+        none, as for autoincrement columns """
         if self.raise_exception:
             raise exc.SQLAlchemyError
+        models = set()
+        for model, record in self._pending:
+            if self.identity_map.assign_primary_key(record, model):
+                models.add(model)
+        self._pending = []
+        for model in models & set(self.tables):
+            self.tables[model].reset_indexes()
+        self.flush_called = True
+
+    @synchronized
+    def commit(self):
+        self.flush()
         self.commit_called = True
 
+    @synchronized
     def rollback(self):
         self.rollback_called = True
 
+    def snapshot(self):
+        """ Freezes the session, including its query_return_values, so that
+        it can be shared as the base of forks. Returns the session """
+        self._frozen = True
+        self.query_return_values.freeze()
+        return self
+
+    def fork(self):
+        """ Session whose changes are made to an overlay over this session,
+        which is frozen by 'snapshot'. Objects of this session, such as
+        MockQuery and MockModel values, are copied on first access from the
+        fork, and tables on first change, so a fork is cheap to create. Per
+        test state, such as 'added_records', starts empty in the fork """
+        self.snapshot()
+        fork = copy.copy(self)
+        fork._base = self
+        fork._reset_overlay()
+        return fork
+
+    def discard(self) -> None:
+        """ Drops the changes made to a fork, in constant time """
+        if self._base is None:
+            raise RuntimeError('Only a fork can be discarded')
+        self._reset_overlay()
+
+    def _reset_overlay(self) -> None:
+        base = self._base
+        overlay = Overlay()
+        self._frozen = False
+        self._query_return_values = OverlayQueryReturnValues(
+            base.query_return_values, overlay)
+        self.tables = OverlayDict(base.tables, overlay)
+        self.identity_map = IdentityMap(base.identity_map)
+        self.return_value = overlay.value(base.return_value)
+        self.side_effect = overlay.value(base.side_effect)
+        self.commit_called = False
+        self.rollback_called = False
+        self.flush_called = False
+        self.query_call_count = 0
+        self.added_records = []
+        self.deleted_records = []
+        self.executed_statements = []
+        self._pending = []
+        self._thread_call_counts = {}
+        if base._lock is not None:
+            self._lock = threading.RLock()
+        if base.recorder is not None:
+            self.recorder = QueryRecorder()
+        if base.clock is not None:
+            self.clock = DbClock(base.clock.sleep,
+                                 thread_safe=base._lock is not None)
+
     def query(self, *args):
+        if self.recorder is None and self.clock is None:
+            return self._query(*args)
+        key = normalize_key(args[0]) if args else None
+        query_func = self._query
+        if self.clock is not None:
+            query_func = partial(self._timed_query, key)
+        if self.recorder is not None:
+            return self.recorder.record(query_func, args, key)
+        return query_func(*args)
+
+    def execute(self, statement, params=None, *args, **kwargs) -> MockResult:
+        """ Mocks execution of a select statement, with rows as for a query
+        on the first selected entity or column, e.g. for select(Foo.id) as
+        for query(Foo.id). If the rows are from an evaluating MockQuery, the
+        where clause, order by, limit and offset of the statement are applied.
+        Other statements are appended to 'executed_statements'.
+        """
+        if not getattr(statement, 'is_select', False):
+            self.executed_statements.append((statement, params))
+            return MockResult(rowcount=0)
+        if self.recorder is None and self.clock is None:
+            return self._execute(statement)
+        key, _ = statement_key(statement)
+        execute_func = self._execute
+        if self.clock is not None:
+            execute_func = partial(self._timed_execute, key)
+        if self.recorder is not None:
+            return self.recorder.record(execute_func, (statement, ), key)
+        return execute_func(statement)
+
+    def scalars(self, statement, params=None, *args, **kwargs):
+        return self.execute(statement, params).scalars()
+
+    def scalar(self, statement, params=None, *args, **kwargs):
+        return self.execute(statement, params).scalar()
+
+    def _execute(self, statement) -> MockResult:
+        key, num_columns = statement_key(statement)
+        return MockResult(self._statement_rows(statement, key, num_columns))
+
+    def _timed_execute(self, key, statement) -> MockResult:
+        query = self._query(key)
+        rows = list(self._statement_rows(statement, *statement_key(statement),
+                                         query=query))
+        model = self._latency_model(key, query)
+        if model is not None:
+            self.clock.advance(model.latency(len(rows)), key)
+        return MockResult(rows)
+
+    def _statement_rows(self, statement, key, num_columns: int, query=None):
+        if query is None:
+            query = self._query(key)
+        if getattr(query, 'evaluate', False):
+            if statement.whereclause is not None:
+                query = query.filter(statement.whereclause)
+            if statement._order_by_clauses:
+                query = query.order_by(*statement._order_by_clauses)
+            if statement._offset:
+                query = query.offset(statement._offset)
+            if statement._limit is not None:
+                query = query.limit(statement._limit)
+            rows = iter(query)
+        else:
+            rows = query.all()
+            if rows is None:
+                rows = []
+            elif not isinstance(rows, (list, tuple, MockResultSet)):
+                rows = [rows]
+        if num_columns == 1:
+            # Rows of a single entity or column are tuples of one value
+            return ((row, ) for row in rows)
+        return rows
+
+    def _latency_model(self, key, query):
+        """ Latency model for the query key, else that of the MockQuery, else
+        the default, if latency is simulated """
+        if self.clock is None:
+            return None
+        return self.latency.get(key) or latency_model(
+            getattr(query, 'latency', None)) or self.default_latency
+
+    def _timed_query(self, key, *args):
+        query = self._query(*args)
+        model = self._latency_model(key, query)
+        if model is None:
+            return query
+        return TimedQuery(query, model, self.clock, key)
+
+    @property
+    def db_time(self) -> float:
+        """ Seconds of simulated query latency accumulated by the session """
+        return self.clock.elapsed if self.clock is not None else 0.0
+
+    def _checked_recorder(self) -> QueryRecorder:
+        if self.recorder is None:
+            raise RuntimeError('Queries are not recorded, create the session '
+                               'with record_queries=True')
+        return self.recorder
+
+    def assert_max_queries(self, count: int) -> None:
+        """ Requires the session to be created with record_queries=True """
+        self._checked_recorder().assert_max_queries(count)
+
+    def assert_no_n_plus_one(self, threshold: int = 3) -> None:
+        """ Requires the session to be created with record_queries=True """
+        self._checked_recorder().assert_no_n_plus_one(threshold)
+
+    def _query(self, *args):
         first_param = None
         if args:
-            first_param = '{}.{}'.format(args[0], args[0].key) if isinstance(
-                args[0], Label) else args[0]
+            first_param = normalize_key(args[0])
 
         if self.query_return_values:
             if isinstance(self.query_return_values.get(first_param), MockQuery):
@@ -44,28 +396,38 @@ class MockDbSession:
 
         if self.side_effect:
             # Expected to be an instance of MockQuery
-            query_result = self.side_effect[self.query_call_count]
-            self.query_call_count += 1
-            return query_result
+            return self._next_side_effect()
 
         if self.return_value:
             return self.return_value
 
+        if self.tables and first_param in self.tables and \
+                first_param not in self.query_return_values:
+            # Objects added to the session
+            return self.tables[first_param]
+
         return MockQuery(query_select=first_param,
                          query_return_values=self.query_return_values)
 
+    def _next_side_effect(self):
+        if self._lock is None:
+            index = self.query_call_count
+            self.query_call_count += 1
+        else:
+            thread = threading.get_ident()
+            with self._lock:
+                self.query_call_count += 1
+                index = self._thread_call_counts.get(thread, 0)
+                self._thread_call_counts[thread] = index + 1
+        if self.cycle_side_effect:
+            index %= len(self.side_effect)
+        return self.side_effect[index]
+
     def check_for_raise_condition(self, first_arg):
         """ Check 'query_return_values' whether Exception should be raised """
-        for key, val in self.query_return_values.items():
-            for sa_class, attr in [(DeclarativeMeta, '__table__'),
-                                   (InstrumentedAttribute, 'property')]:
-                if isinstance(key, sa_class):
-                    attr_eq = getattr(key, attr) == getattr(first_arg, attr, '')
-                    try:
-                        if attr_eq and issubclass(val, Exception):
-                            raise val
-                    except TypeError:
-                        pass
+        exc_class = self.query_return_values.raise_value(first_arg)
+        if exc_class is not None:
+            raise exc_class
 
 
 class PartialMockDbSession(MockDbSession):
@@ -79,20 +441,55 @@ class PartialMockDbSession(MockDbSession):
         dbession.query call, then the query will be mocked and the value will
         be used as the return value from any chained .one(), .first() or .all()
         calls, or an Exception raised if the value is an Exception class.
+        :param record_fixture: path of a fixture file, which 'save_fixture'
+        saves the results of queries and select statements made with
+        'dbsession' to
+        :param replay_fixture: path of a fixture file recorded as above, which
+        the results of queries which are not mocked are read from instead,
+        in which case 'dbsession' and 'query_return_values' are optional
         :return: MockDbSession instance
         """
-        assert query_return_values, 'query_return_values truthiness test failed'
-        assert dbsession, 'dbsession truthiness test failed'
+        replay_fixture = kwargs.get('replay_fixture')
+        if replay_fixture is None:
+            assert query_return_values, \
+                'query_return_values truthiness test failed'
+            assert dbsession, 'dbsession truthiness test failed'
         super().__init__(query_return_values=query_return_values, **kwargs)
+        if replay_fixture is not None:
+            dbsession = ReplaySession(replay_fixture)
+        elif kwargs.get('record_fixture'):
+            dbsession = RecordingSession(dbsession, kwargs['record_fixture'])
         self.dbsession = dbsession
 
-    def query(self, *args):
+    def save_fixture(self) -> None:
+        """ Saves recorded results to the 'record_fixture' file, merged with
+        any results already in it """
+        self.dbsession.save()
+
+    def close_fixture(self) -> None:
+        """ Closes the 'replay_fixture' file, which is also closed on leaving
+        the session as a context manager """
+        if isinstance(self.dbsession, ReplaySession):
+            self.dbsession.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close_fixture()
+
+    def _query(self, *args):
         first_param = None
         if args:
-            first_param = '{}.{}'.format(args[0], args[0].key) if isinstance(
-                args[0], Label) else args[0]
+            first_param = normalize_key(args[0])
 
         if first_param not in self.query_return_values:
             return self.dbsession.query(*args)
 
-        return super().query(*args)
+        return super()._query(*args)
+
+    def execute(self, statement, params=None, *args, **kwargs):
+        if getattr(statement, 'is_select', False) and \
+                statement_key(statement)[0] in self.query_return_values:
+            return super().execute(statement, params, *args, **kwargs)
+        return self.dbsession.execute(statement, params, *args, **kwargs)
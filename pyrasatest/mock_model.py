@@ -1,3 +1,6 @@
+import keyword
+from functools import lru_cache
+
 
 class MockModel:
     def __init__(self, **kwargs):
@@ -36,8 +39,131 @@ class MockModel:
             return self._result_items[item]
         return list(self.init_kwargs.values())[item]
 
+    @classmethod
+    def schema(cls, *fields: str) -> type:
+        """ Creates a compact row class with the attributes 'fields', which
+        are stored in __slots__ rather than an instance __dict__. Instances
+        support the same methods as MockModel, with indexing by the order of
+        'fields', and are constructed with positional or keyword arguments:
+
+        >>> Row = MockModel.schema('id', 'name')
+        >>> Row(1, name='Abc')[1]
+        'Abc'
+
+        Unlike MockModel instances, attributes other than 'fields' and
+        'len_value' cannot be set, and fields must be identifiers other than
+        the names of methods or attributes of rows, such as 'save' or
+        'save_called'. A field named with a keyword, such as 'from', is got
+        with getattr(row, 'from')
+        """
+        invalid = [f for f in fields if not f.isidentifier() or (
+            f != 'len_value' and hasattr(MockRow, f))]
+        if invalid:
+            raise ValueError('Row fields cannot be named {}'.format(
+                ', '.join(invalid)))
+        return _schema_row_class(tuple(fields),
+                                 issubclass(cls, LazyAttrMockModel))
+
 
 class LazyAttrMockModel(MockModel):
     def __getattr__(self, item):
+        if item.startswith('__'):
+            # e.g. '__setstate__', which copy and pickle look up
+            raise AttributeError(item)
         if not self.__dict__.get(item):
             return None
+
+
+class MockRow:
+    """ Base class of row classes created by MockModel.schema """
+    __slots__ = ('save_called', 'delete_called', '_result_items',
+                 'len_value')
+    _fields = ()
+    _lazy = False
+
+    def __init__(self, *args, **kwargs):
+        self.save_called = False
+        self.delete_called = False
+        self._result_items = None
+        for field, value in zip(self._fields, args):
+            setattr(self, field, value)
+        for field, value in kwargs.items():
+            setattr(self, field, value)
+
+    def __getattr__(self, item):
+        # Only called if normal lookup fails, e.g. for an unset slot
+        if self._lazy and not item.startswith('__'):
+            return None
+        raise AttributeError('{!r} object has no attribute {!r}'.format(
+            type(self).__name__, item))
+
+    def __len__(self):
+        len_value = getattr(self, 'len_value', None)
+        if len_value is not None:
+            return len_value
+        return len(self._fields)
+
+    @property
+    def init_kwargs(self) -> dict:
+        dct = {}
+        for field in self._fields:
+            try:
+                dct[field] = object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+        return dct
+
+    def to_dict(self, exclude=None):
+        if exclude is None:
+            exclude = []
+        return {k: v for k, v in self.init_kwargs.items()
+                if not k.startswith('_') and k not in exclude}
+
+    def save(self):
+        self.save_called = True
+
+    def delete(self):
+        self.delete_called = True
+
+    def set_result_items(self, items):
+        self._result_items = items
+
+    def __getitem__(self, item):
+        if self._result_items:
+            return self._result_items[item]
+        if isinstance(item, slice):
+            return [getattr(self, field) for field in self._fields[item]]
+        return getattr(self, self._fields[item])
+
+
+def _make_function(fields: tuple):
+    """ Function creating a row from a value for each of 'fields', which is
+    compiled for the fields, as for namedtuple, as it is much faster than
+    MockRow.__init__ when creating rows in bulk """
+    args = ''.join(', v{}'.format(i) for i in range(len(fields)))
+    lines = ['def _make(cls{}):'.format(args),
+             '    self = new(cls)',
+             '    self.save_called = False',
+             '    self.delete_called = False',
+             '    self._result_items = None']
+    # Keywords such as 'from', e.g. of .label('from'), are set with setattr
+    lines.extend('    setattr(self, {!r}, v{})'.format(field, i)
+                 if keyword.iskeyword(field) else
+                 '    self.{} = v{}'.format(field, i)
+                 for i, field in enumerate(fields))
+    lines.append('    return self')
+    namespace = {'new': object.__new__}
+    exec('\n'.join(lines), namespace)
+    return namespace['_make']
+
+
+@lru_cache(maxsize=None)
+def _schema_row_class(fields: tuple, lazy: bool) -> type:
+    return type('LazyAttrMockRow' if lazy else 'MockRow', (MockRow, ), {
+        # 'len_value' may also be a field, which uses the MockRow slot
+        '__slots__': tuple(f for f in fields if f not in MockRow.__slots__),
+        '_fields': fields,
+        '_lazy': lazy,
+        # Called with one value for each field, e.g. Row._make(1, 'Abc')
+        '_make': classmethod(_make_function(fields)),
+    })
@@ -1,3 +1,6 @@
+import copy
+from contextlib import contextmanager
+
 from pyramid import testing
 
 from .mock_db_session import MockDbSession
@@ -10,16 +13,74 @@ class DummyTmplContext:
 
 
 class MockRequest(testing.DummyRequest):
+    """ 'reset' restores the request to its state after construction, or
+    when 'set_template' was last called. Mutable attributes such as 'params'
+    are copied from the template state on first access after either, and
+    'dbsession' is created on first access, so that nothing leaks between
+    uses of the request and unused attributes cost nothing """
     url = 'http://testurl.com'
+    copied_attrs = ('environ', 'headers', 'params', 'GET', 'POST', 'cookies',
+                    'matchdict', 'marshalled', 'session', 'tmpl_context',
+                    'dbsession')
 
     def __init__(self, config=None, **kwargs):
         super().__init__(**kwargs)
-        self.dbsession = MockDbSession()
+        # None for a new MockDbSession, see '_copy_attr'
+        self.dbsession = None
         self.tmpl_context = DummyTmplContext()
         self.mock_route_url = 'foo'
         self.mock_static_url = 'bar'
         self.mock_route_path = '/foo/bar'
         self.method = kwargs.get('method', 'GET')
+        self.set_template()
+
+    def set_template(self) -> None:
+        """ Makes the current state the one which 'reset' restores """
+        attrs = self.__dict__
+        copied = dict(attrs.get('_template_copied', ()))
+        for attr in self.copied_attrs:
+            if attr in attrs:
+                copied[attr] = attrs.pop(attr)
+        attrs['_template_copied'] = copied
+        attrs['_template_class'] = type(self)
+        attrs['_template'] = dict(attrs)
+
+    def reset(self) -> None:
+        template = self._template
+        self.__dict__.clear()
+        self.__dict__.update(template)
+        self.__dict__['_template'] = template
+        if type(self) is not template['_template_class']:
+            # e.g. after set_property, which changes the class of the request
+            self.__class__ = template['_template_class']
+
+    def __getattr__(self, name):
+        # Only called for attributes not found in the instance __dict__
+        template = self.__dict__.get('_template_copied')
+        if template is None or name not in template:
+            raise AttributeError('{!r} object has no attribute {!r}'.format(
+                type(self).__name__, name))
+        return self._copy_attr(name, template)
+
+    def _copy_attr(self, name: str, template: dict):
+        value = template[name]
+        if name == 'dbsession':
+            if value is None:
+                value_copy = MockDbSession()
+            elif isinstance(value, MockDbSession):
+                # Of the same class, with the same settings, e.g. the
+                # session of a PartialMockDbSession, and its own changes
+                value_copy = value.fork()
+            else:
+                value_copy = value
+        else:
+            value_copy = copy.copy(value)
+        # Attributes which are the same object in the template, such as
+        # 'params' and 'GET', are the same copy
+        for attr, val in template.items():
+            if val is value and attr not in self.__dict__:
+                self.__dict__[attr] = value_copy
+        return value_copy
 
     def route_url(self, view_path, **kwargs):
         return self.mock_route_url
@@ -31,6 +92,38 @@ class MockRequest(testing.DummyRequest):
         return self.mock_route_path
 
 
+class MockRequestPool:
+    """ Hands out recycled MockRequest instances, which are reset when they
+    are released, to avoid the cost of constructing a request for each test.
+    Keyword arguments are passed to MockRequest for new instances """
+
+    def __init__(self, request_class=MockRequest, **kwargs) -> None:
+        self.request_class = request_class
+        self.kwargs = kwargs
+        self._free = []
+
+    def acquire(self) -> MockRequest:
+        try:
+            return self._free.pop()
+        except IndexError:
+            return self.request_class(**self.kwargs)
+
+    def release(self, request: MockRequest) -> None:
+        request.reset()
+        self._free.append(request)
+
+    @contextmanager
+    def request(self):
+        request = self.acquire()
+        try:
+            yield request
+        finally:
+            self.release(request)
+
+    def __len__(self):
+        return len(self._free)
+
+
 class MockSession(testing.DummySession):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
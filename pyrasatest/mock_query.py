@@ -1,10 +1,50 @@
-from typing import Iterable, Hashable
+import copy
+import itertools
+import threading
+from typing import Hashable, Iterable, Iterator
 
-from sqlalchemy.sql.elements import Label
+from sqlalchemy.orm import exc
+
+from .evaluate import compile_expression, equality_lookups, sort_rows
+from .mock_result_set import MockResultSet
+from .query_keys import QueryReturnValues, normalize_key
+
+
+def is_lazy_source(source) -> bool:
+    """ Whether 'source' is a callable returning an iterable, an iterator or
+    a chain of sources, rather than a sequence of rows """
+    return callable(source) or isinstance(source, (Iterator, ChainedSource))
+
+
+def iter_source(source) -> Iterator:
+    """ New iterator over 'source', which is restarted if 'source' is a
+    callable or a sequence, whereas iterators such as generators are
+    consumed once """
+    if callable(source):
+        return iter(source())
+    return iter(source)
+
+
+class ChainedSource:
+    """ Lazily chains sources of rows, e.g. for MockQuery.union """
+
+    def __init__(self, *sources) -> None:
+        self.sources = []
+        for source in sources:
+            if isinstance(source, ChainedSource):
+                self.sources.extend(source.sources)
+            else:
+                self.sources.append(source)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(
+            iter_source(source) for source in self.sources)
 
 
 class MockQuery:
     filter_args = None
+    # True for a fork which shares rows and indexes with another query
+    _shared_rows = False
 
     def __init__(self, all_: Iterable = None,
                  iter_vals: Iterable = None,
@@ -14,15 +54,12 @@ class MockQuery:
                  **kwargs) -> None:
         self.exception_class = raise_exc
         self.all_ = all_ or []
-        self.query_return_values = {
-            '{}.{}'.format(k, k.key) if isinstance(k, Label) else k: v for k, v
-            in query_return_values.items()
-        } if query_return_values else {}
-        self.query_select = query_select
-        # Since hash(Foo.bar.label('abc')) gives unique value
-        if isinstance(self.query_select, Label):
-            self.query_select = '{}.{}'.format(self.query_select,
-                                               self.query_select.key)
+        # Shared with the MockDbSession which created this instance, rather
+        # than copied, as its keys are already normalized
+        if not isinstance(query_return_values, QueryReturnValues):
+            query_return_values = QueryReturnValues(query_return_values or {})
+        self.query_return_values = query_return_values
+        self.query_select = normalize_key(query_select)
         self.first_ = kwargs.get('first_')
         self.one_ = kwargs.get('one_')
         self.scalar_ = kwargs.get('scalar_')
@@ -31,15 +68,47 @@ class MockQuery:
         self.count_return_val = kwargs.get('count_return_val')
         self.iter_vals = iter_vals or []
         self.filter_by_kwargs = {}
-        self.iter_count = 0
+        # Positions of __next__ calls by thread, see 'iter_count'
+        self._iter_counts = {}
         self.call_count = 0
+        # If True, 'all_' is used as a table of rows which filter, order_by,
+        # limit and offset calls are evaluated against
+        self.evaluate = kwargs.get('evaluate', False)
+        self.criteria = ()
+        self.order_by_args = ()
+        self.limit_arg = None
+        self.offset_arg = None
+        self.yield_per_arg = None
+        # Hash indexes of rows positions in 'all_' by attribute value, which
+        # are built on first use by an equality or IN filter
+        self.indexes = {key: None for key in kwargs.get('indexes', ())}
+        self.lookups = ()
+        # Tables of the mapped class of the rows, if known, which evaluated
+        # columns must be of
+        self.entity_tables = kwargs.get('entity_tables')
+        # Simulated latency, if enabled for the MockDbSession
+        self.latency = kwargs.get('latency')
         # for attr in ['like_args', 'filter_args', 'order_by_args']:
         #     setattr(self, attr, [])
 
     def __iter__(self):
+        """ Each call returns an independent iterator, so that nested
+        iteration over the same query works as expected """
         if self.iter_vals:
-            return iter(self.iter_vals)
-        return self
+            return iter_source(self.iter_vals)
+        if self.evaluate:
+            return self._evaluated_iter()
+        return self._sliced(iter_source(self.all_))
+
+    @property
+    def iter_count(self) -> int:
+        """ Number of __next__ calls made by the current thread, so that
+        threads sharing the query do not consume each other's rows """
+        return self._iter_counts.get(threading.get_ident(), 0)
+
+    @iter_count.setter
+    def iter_count(self, value: int) -> None:
+        self._iter_counts[threading.get_ident()] = value
 
     def __next__(self):
         self.iter_count += 1
@@ -49,14 +118,134 @@ class MockQuery:
             self.iter_count = 0
             raise StopIteration
 
+    def _derive(self, **kwargs):
+        """ Copy of the instance with updated attributes, for methods which
+        are generative in the same way as for an SQLAlchemy Query """
+        query = copy.copy(self)
+        query._iter_counts = dict(self._iter_counts)
+        query.__dict__.update(kwargs)
+        return query
+
+    def index(self, key: str) -> dict:
+        """ Hash index for the attribute 'key' of rows in 'all_', or None if
+        there is no usable index for it """
+        if is_lazy_source(self.all_):
+            return None
+        if self.indexes.get(key) is None and key in self.indexes:
+            index = {}
+            if isinstance(self.all_, MockResultSet):
+                values = self.all_.column(key)
+            else:
+                values = (getattr(row, key) for row in self.all_)
+            try:
+                for pos, value in enumerate(values):
+                    index.setdefault(value, []).append(pos)
+            except TypeError:
+                # Unhashable attribute values
+                index = False
+            self.indexes[key] = index
+        return self.indexes.get(key) or None
+
+    def add_row(self, row) -> None:
+        """ Appends to the rows of an evaluating query, keeping any indexes
+        which have been built up to date """
+        self.add_rows([row])
+
+    def add_rows(self, rows: list) -> None:
+        self._own_rows()
+        start = len(self.all_)
+        self.all_.extend(rows)
+        for key, index in self.indexes.items():
+            # Not an index which is not built, or of unhashable values, but
+            # including one built while there were no rows
+            if index is not None and index is not False:
+                try:
+                    for pos, row in enumerate(rows, start):
+                        index.setdefault(getattr(row, key), []).append(pos)
+                except TypeError:
+                    self.indexes[key] = False
+
+    def remove_row(self, row) -> None:
+        self._own_rows()
+        self.all_.remove(row)
+        self.reset_indexes()
+
+    def reset_indexes(self) -> None:
+        """ Indexes are rebuilt on next use, e.g. after rows are modified """
+        self._own_rows()
+        for key in self.indexes:
+            self.indexes[key] = None
+
+    def fork(self):
+        """ Copy which shares the rows and indexes of this query until rows
+        are added to or removed from it """
+        return self._derive(_shared_rows=True)
+
+    def _own_rows(self) -> None:
+        if self._shared_rows:
+            self.all_ = self.all_[:]
+            self.indexes = dict.fromkeys(self.indexes)
+            self._shared_rows = False
+
+    def _indexed_rows(self):
+        """ Rows which may satisfy the query criteria, from an index lookup,
+        or None if no index applies """
+        for key, values in self.lookups:
+            index = self.index(key)
+            if index is None:
+                continue
+            try:
+                if len(values) == 1:
+                    positions = index.get(values[0], [])
+                else:
+                    positions = sorted({pos for val in set(values)
+                                        for pos in index.get(val, [])})
+            except TypeError:
+                continue
+            return [self.all_[pos] for pos in positions]
+        return None
+
+    def _sliced(self, rows: Iterator) -> Iterator:
+        if self.offset_arg or self.limit_arg is not None:
+            start = self.offset_arg or 0
+            stop = None if self.limit_arg is None else start + self.limit_arg
+            return itertools.islice(rows, start, stop)
+        return rows
+
+    def _evaluated_iter(self) -> Iterator:
+        """ Rows are streamed from the source unless ordering is needed """
+        rows = None
+        if self.lookups and self.indexes:
+            rows = self._indexed_rows()
+        if rows is None:
+            rows = iter_source(self.all_)
+        for predicate in self.criteria:
+            rows = filter(predicate, rows)
+        if self.order_by_args:
+            rows = iter(sort_rows(rows, self.order_by_args,
+                                  self.entity_tables))
+        return self._sliced(rows)
+
+    def evaluated_rows(self) -> list:
+        return list(self._evaluated_iter())
+
     def first(self):
         if self.query_return_values.get(self.query_select):
             return self.query_return_values[self.query_select]
+        if self.evaluate:
+            limit = 1 if self.limit_arg is None else min(1, self.limit_arg)
+            rows = self._derive(limit_arg=limit).evaluated_rows()
+            return rows[0] if rows else None
         return self.first_
 
     def all(self):
         if self.query_return_values.get(self.query_select):
             return self.query_return_values[self.query_select]
+        if self.evaluate:
+            return self.evaluated_rows()
+        if is_lazy_source(self.all_) or self.offset_arg or \
+                self.limit_arg is not None:
+            return list(self)
         return self.all_
 
     def one(self):
@@ -64,19 +253,42 @@ class MockQuery:
             return self.query_return_values[self.query_select]
         if self.exception_class:
             raise self.exception_class()
+        if self.evaluate:
+            rows = self.evaluated_rows()
+            if not rows:
+                raise exc.NoResultFound('No row was found for one()')
+            if len(rows) > 1:
+                raise exc.MultipleResultsFound(
+                    'Multiple rows were found for one()')
+            return rows[0]
         return self.one_
 
     def scalar(self):
         return self.scalar_
 
     def count(self):
+        if self.evaluate:
+            return len(self.evaluated_rows())
         return self.count_return_val
 
     def order_by(self, *args):
+        if self.evaluate:
+            if len(args) == 1 and args[0] is None:
+                return self._derive(order_by_args=())
+            return self._derive(order_by_args=self.order_by_args + args)
         setattr(self, 'order_by_args', args)
         return self
 
     def filter(self, *args):
+        if self.evaluate:
+            return self._derive(
+                filter_args=args,
+                criteria=self.criteria + tuple(
+                    compile_expression(arg, self.entity_tables)
+                    for arg in args),
+                lookups=self.lookups + tuple(
+                    lookup for arg in args for lookup in equality_lookups(arg))
+            )
         setattr(self, 'filter_args', args)
         return self
 
@@ -103,19 +315,56 @@ class MockQuery:
         return self
 
     def union(self, *args):
-        for mock_q in args:
-            self.all_.extend(mock_q.all_)
-        return self
+        return self._derive(all_=ChainedSource(
+            self.all_, *[mock_q.all_ for mock_q in args]))
 
     def filter_by(self, **kwargs):
+        if self.evaluate:
+            return self._derive(
+                filter_by_kwargs=kwargs,
+                criteria=self.criteria + tuple(
+                    _attr_equals(k, v) for k, v in kwargs.items()),
+                lookups=self.lookups + tuple(
+                    (k, (v, )) for k, v in kwargs.items())
+            )
         setattr(self, 'filter_by_kwargs', kwargs)
         return self
 
     def limit(self, *args):
+        if self.evaluate:
+            return self._derive(limit_arg=args[0])
         return self.limit_val or self
 
+    def offset(self, *args):
+        return self._derive(offset_arg=args[0])
+
+    def slice(self, start: int, stop: int):
+        offset = (self.offset_arg or 0) + start
+        limit = stop - start
+        if self.limit_arg is not None:
+            limit = min(limit, self.limit_arg - start)
+        return self._derive(offset_arg=offset, limit_arg=max(limit, 0))
+
+    def yield_per(self, count: int):
+        return self._derive(yield_per_arg=count)
+
+    def partitions(self, size: int = None) -> Iterator[list]:
+        """ Iterates over results in lists of up to 'size' rows, which
+        defaults to any 'yield_per' value, otherwise all rows """
+        size = size or self.yield_per_arg
+        rows = iter(self)
+        while True:
+            chunk = list(itertools.islice(rows, size) if size else rows)
+            if not chunk:
+                return
+            yield chunk
+
     def subquery(self):
         return self
 
     def as_scalar(self):
         return self
+
+
+def _attr_equals(key, value):
+    return lambda row: getattr(row, key) == value
@@ -0,0 +1,92 @@
+import itertools
+from typing import Iterable, Iterator
+
+from sqlalchemy import exc
+
+
+class MockScalarResult:
+    """ Mock of sqlalchemy.engine.ScalarResult. As with a real result, rows
+    are consumed as they are fetched """
+
+    def __init__(self, rows: Iterable = None) -> None:
+        self._rows = iter(rows or [])
+        self._yield_per = None
+
+    def __iter__(self) -> Iterator:
+        return self._rows
+
+    def __next__(self):
+        return next(self._rows)
+
+    def yield_per(self, num: int):
+        self._yield_per = num
+        return self
+
+    def all(self) -> list:
+        return list(self._rows)
+
+    def fetchall(self) -> list:
+        return self.all()
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size: int = None) -> list:
+        return list(itertools.islice(self._rows, size or self._yield_per or 1))
+
+    def partitions(self, size: int = None) -> Iterator[list]:
+        size = size or self._yield_per
+        while True:
+            partition = list(itertools.islice(self._rows, size) if size
+                             else self._rows)
+            if not partition:
+                return
+            yield partition
+
+    def first(self):
+        return next(self._rows, None)
+
+    def _at_most_one(self) -> list:
+        """ The only row as a list, which is empty if there are none, as a
+        row of a scalar result may be None """
+        rows = list(itertools.islice(self._rows, 2))
+        if len(rows) > 1:
+            raise exc.MultipleResultsFound(
+                'Multiple rows were found when one or none was required')
+        return rows
+
+    def one_or_none(self):
+        rows = self._at_most_one()
+        return rows[0] if rows else None
+
+    def one(self):
+        rows = self._at_most_one()
+        if not rows:
+            raise exc.NoResultFound(
+                'No row was found when one was required')
+        return rows[0]
+
+
+class MockResult(MockScalarResult):
+    """ Mock of sqlalchemy.engine.Result, as returned by session.execute.
+    Rows are tuples, or objects supporting indexing such as MockModel """
+
+    def __init__(self, rows: Iterable = None, rowcount: int = None) -> None:
+        super().__init__(rows)
+        self.rowcount = rowcount
+
+    def scalars(self, index: int = 0) -> MockScalarResult:
+        result = MockScalarResult(row[index] for row in self._rows)
+        result._yield_per = self._yield_per
+        return result
+
+    def scalar(self):
+        row = self.first()
+        return row[0] if row is not None else None
+
+    def scalar_one(self):
+        return self.one()[0]
+
+    def scalar_one_or_none(self):
+        row = self.one_or_none()
+        return row[0] if row is not None else None
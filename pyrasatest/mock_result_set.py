@@ -0,0 +1,140 @@
+from array import array
+from typing import Iterable, Mapping
+
+
+def _column_array(values):
+    """ Stores a column of ints or floats compactly in an array.array.
+    Other sequences such as NumPy arrays are used as they are """
+    if not isinstance(values, (list, tuple)):
+        return values
+    if values and all(type(v) is int for v in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return list(values)
+    if values and all(type(v) is float for v in values):
+        return array('d', values)
+    return list(values)
+
+
+def _concat(first, second):
+    if isinstance(first, array) and isinstance(second, array) \
+            and first.typecode == second.typecode:
+        return first + second
+    if hasattr(first, 'dtype') and hasattr(second, 'dtype'):
+        import numpy
+        return numpy.concatenate([first, second])
+    return list(first) + list(second)
+
+
+class ResultRow:
+    """ Lightweight view of a row of a MockResultSet, supporting attribute
+    and positional access as for MockModel instances """
+    __slots__ = ('_result_set', '_index')
+
+    def __init__(self, result_set, index: int) -> None:
+        self._result_set = result_set
+        self._index = index
+
+    def __getattr__(self, item):
+        # Not self._result_set, which calls __getattr__ again if it is not
+        # set yet, as while copy and pickle create the row
+        result_set = object.__getattribute__(self, '_result_set')
+        try:
+            column = result_set.columns[item]
+        except KeyError:
+            raise AttributeError('{!r} object has no attribute {!r}'.format(
+                type(self).__name__, item))
+        return column[self._index]
+
+    def __getitem__(self, item):
+        fields = self._result_set.fields
+        if isinstance(item, slice):
+            return [getattr(self, field) for field in fields[item]]
+        return getattr(self, fields[item])
+
+    def __len__(self):
+        return len(self._result_set.fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, ResultRow):
+            return NotImplemented
+        same_columns = self._result_set.columns is other._result_set.columns
+        return same_columns and self._index == other._index
+
+    def __hash__(self):
+        return hash((id(self._result_set.columns), self._index))
+
+    def to_dict(self, exclude=None):
+        if exclude is None:
+            exclude = []
+        return {k: getattr(self, k) for k in self._result_set.fields
+                if not k.startswith('_') and k not in exclude}
+
+
+class MockResultSet:
+    """ Query results stored by column, for large numbers of rows. Row
+    objects are only created when the result set is iterated or indexed.
+    Can be used as the 'all_' value of MockQuery
+
+    :param columns: mapping of attribute name to a sequence of values, e.g.
+    a list, array.array or NumPy array, each of the same length
+    """
+
+    def __init__(self, columns: Mapping = None) -> None:
+        self.columns = {k: _column_array(v)
+                        for k, v in (columns or {}).items()}
+        self.fields = tuple(self.columns)
+        lengths = {len(v) for v in self.columns.values()}
+        assert len(lengths) <= 1, 'columns must be of equal length'
+        self._len = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, fields: Iterable[str]):
+        """ Creates a result set from objects such as MockModel instances """
+        fields = list(fields)
+        rows = list(rows)
+        return cls({f: [getattr(row, f) for row in rows] for f in fields})
+
+    def column(self, name: str):
+        return self.columns[name]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for index in range(self._len):
+            yield ResultRow(self, index)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return MockResultSet({k: v[item] for k, v in self.columns.items()})
+        if item < 0:
+            item += self._len
+        if not 0 <= item < self._len:
+            raise IndexError('result set index out of range')
+        return ResultRow(self, item)
+
+    def append(self, row) -> None:
+        for field in self.fields:
+            column = self.columns[field]
+            value = getattr(row, field)
+            if hasattr(column, 'dtype'):
+                self.columns[field] = _concat(column, [value])
+            else:
+                try:
+                    column.append(value)
+                except TypeError:
+                    # e.g. a float appended to an array of ints
+                    self.columns[field] = list(column) + [value]
+        self._len += 1
+
+    def extend(self, rows: Iterable) -> None:
+        if isinstance(rows, MockResultSet) and rows.fields == self.fields:
+            for field in self.fields:
+                self.columns[field] = _concat(self.columns[field],
+                                              rows.columns[field])
+            self._len += len(rows)
+            return
+        for row in rows:
+            self.append(row)
@@ -0,0 +1,312 @@
+import datetime
+import enum
+import gc
+import itertools
+import random
+import uuid
+from array import array
+from decimal import Decimal
+from contextlib import contextmanager
+from functools import lru_cache
+
+from sqlalchemy import Enum, inspect
+from sqlalchemy.orm import ONETOMANY
+
+from .mock_model import MockModel, MockRow
+from .mock_result_set import MockResultSet
+
+_EPOCH = datetime.datetime(2020, 1, 1)
+_INT_RANGE = 10 ** 6
+
+
+def _serial(rng, attr, count, start):
+    return array('q', range(start, start + count))
+
+
+# Random integers are int(random() * n), which is several times faster than
+# randrange for large batches
+
+def _ints(rng, attr, count, start):
+    rand = rng.random
+    return array('q', [int(rand() * _INT_RANGE) for _ in range(count)])
+
+
+def _floats(rng, attr, count, start):
+    rand = rng.random
+    return array('d', [rand() * _INT_RANGE for _ in range(count)])
+
+
+def _bools(rng, attr, count, start):
+    return rng.choices((True, False), k=count)
+
+
+def _datetimes(rng, attr, count, start):
+    rand = rng.random
+    delta = datetime.timedelta
+    # About 10 years of seconds
+    return [_EPOCH + delta(seconds=int(rand() * 315360000))
+            for _ in range(count)]
+
+
+def _dates(rng, attr, count, start):
+    rand = rng.random
+    fromordinal = datetime.date.fromordinal
+    epoch = _EPOCH.toordinal()
+    return [fromordinal(epoch + int(rand() * 3650)) for _ in range(count)]
+
+
+def _times(rng, attr, count, start):
+    rand = rng.random
+    return [datetime.time(*divmod(divmod(int(rand() * 86400), 60)[0], 60),
+                          int(rand() * 60)) for _ in range(count)]
+
+
+def _uuids(rng, attr, count, start):
+    getrandbits = rng.getrandbits
+    return [uuid.UUID(int=getrandbits(128), version=4) for _ in range(count)]
+
+
+def _bytes(rng, attr, count, start):
+    getrandbits = rng.getrandbits
+    return [getrandbits(64).to_bytes(8, 'little') for _ in range(count)]
+
+
+def _strings(length: int = None):
+    def strings(rng, attr, count, start):
+        # Unique values derived from the row number, e.g. 'name 12'
+        values = ['{} {}'.format(attr, i) for i in range(start, start + count)]
+        if length:
+            values = [value[-length:] for value in values]
+        return values
+    return strings
+
+
+def _choices(values: list):
+    def choices(rng, attr, count, start):
+        return rng.choices(values, k=count)
+    return choices
+
+
+def _decimals(scale: int):
+    def decimals(rng, attr, count, start):
+        rand = rng.random
+        return [Decimal(int(rand() * _INT_RANGE)).scaleb(-scale)
+                for _ in range(count)]
+    return decimals
+
+
+def _nulls(rng, attr, count, start):
+    return [None] * count
+
+
+_GENERATORS = {
+    int: _ints,
+    float: _floats,
+    bool: _bools,
+    datetime.datetime: _datetimes,
+    datetime.date: _dates,
+    datetime.time: _times,
+    uuid.UUID: _uuids,
+    bytes: _bytes,
+}
+
+
+def _column_generator(column):
+    """ Function generating a batch of values for 'column', which is called
+    with (random.Random, attribute name, count, number of the first row) """
+    column_type = column.type
+    if isinstance(column_type, Enum):
+        if column_type.enum_class is not None:
+            return _choices(list(column_type.enum_class))
+        return _choices(list(column_type.enums))
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return _nulls
+    if python_type is int and column.primary_key and \
+            column.autoincrement in (True, 'auto') and \
+            not column.foreign_keys:
+        return _serial
+    if python_type is str:
+        return _strings(getattr(column_type, 'length', None))
+    if python_type is Decimal:
+        return _decimals(getattr(column_type, 'scale', None) or 2)
+    if issubclass(python_type, enum.Enum):
+        return _choices(list(python_type))
+    return _GENERATORS.get(python_type, _nulls)
+
+
+@contextmanager
+def _gc_paused():
+    """ Garbage collections triggered by allocating many objects, which are
+    all still referenced, otherwise take as long as creating them """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@lru_cache(maxsize=None)
+def generation_plan(model) -> tuple:
+    """ (attribute name, generator function) of each column attribute of a
+    mapped class, in mapper order """
+    mapper = inspect(model)
+    return tuple((attr.key, _column_generator(attr.columns[0]))
+                 for attr in mapper.column_attrs)
+
+
+def _column(value, count: int):
+    if isinstance(value, (list, tuple, range, array)) or \
+            hasattr(value, 'dtype'):
+        if len(value) != count:
+            raise ValueError('A sequence of values must have one value per '
+                             'row')
+        return value
+    return [value] * count
+
+
+def generate_columns(model, count: int, seed=0, start: int = 1,
+                     rng: random.Random = None, **values) -> dict:
+    """ Columns of generated values for 'count' rows of a mapped class, by
+    attribute name, generated a column at a time. Integer primary keys are
+    numbered from 'start', strings are unique, e.g. 'name 1', and other
+    values are random, from a random.Random seeded with 'seed' unless 'rng'
+    is given. 'values' sets columns to a constant or a sequence of values
+    """
+    rng = rng or random.Random(seed)
+    columns = {}
+    with _gc_paused():
+        for attr, generator in generation_plan(model):
+            if attr in values:
+                columns[attr] = _column(values[attr], count)
+            else:
+                columns[attr] = generator(rng, attr, count, start)
+    for attr, value in values.items():
+        if attr not in columns:
+            columns[attr] = _column(value, count)
+    return columns
+
+
+def _child_specs(model, children: dict) -> list:
+    """ (relationship name, child class, children per row, nested
+    children, [(parent attribute, child attribute)], child attribute of the
+    parent row or None) for one-to-many 'children' of 'model' """
+    relationships = inspect(model).relationships
+    specs = []
+    for name, spec in (children or {}).items():
+        per_row, nested = spec if isinstance(spec, tuple) else (spec, None)
+        rel = relationships[name]
+        if rel.direction is not ONETOMANY:
+            raise ValueError('{} is not a one-to-many relationship'.format(
+                name))
+        child_mapper = rel.mapper
+        keys = [(inspect(model).get_property_by_column(parent_col).key,
+                 child_mapper.get_property_by_column(child_col).key)
+                for parent_col, child_col in rel.local_remote_pairs]
+        specs.append((name, child_mapper.class_, per_row, nested, keys,
+                      rel.back_populates))
+    return specs
+
+
+class ChildCollections:
+    """ Column of the child rows of each row of a MockResultSet, as slices
+    of a result set of all of the children, which are created on access """
+
+    def __init__(self, result_set: MockResultSet, per_row: int,
+                 count: int) -> None:
+        self.result_set = result_set
+        self.per_row = per_row
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return ChildCollections(self.result_set[
+                start * self.per_row:stop * self.per_row], self.per_row,
+                max(stop - start, 0))
+        if item < 0:
+            item += self.count
+        if not 0 <= item < self.count:
+            raise IndexError('child collections index out of range')
+        start = item * self.per_row
+        return self.result_set[start:start + self.per_row]
+
+
+def _repeat(column, per_row: int) -> list:
+    return [value for value in column for _ in range(per_row)]
+
+
+def generate_result_set(model, count: int, seed=0, children: dict = None,
+                        start: int = 1, rng: random.Random = None,
+                        **values) -> MockResultSet:
+    """ MockResultSet of generated rows, see 'generate_columns'. 'children'
+    maps names of one-to-many relationships to a number of children of each
+    row, or a (number, children) tuple for children of the children, which
+    are result sets whose foreign keys match the primary keys of the rows.
+    Row objects are only created when accessed, so this is faster and much
+    more compact than 'generate_rows' for large numbers of rows """
+    rng = rng or random.Random(seed)
+    columns = generate_columns(model, count, rng=rng, start=start, **values)
+    for name, child_model, per_row, nested, keys, _ in _child_specs(
+            model, children):
+        child_values = {child_attr: _repeat(columns[attr], per_row)
+                        for attr, child_attr in keys}
+        child_rows = generate_result_set(
+            child_model, count * per_row, children=nested, rng=rng,
+            **child_values)
+        columns[name] = ChildCollections(child_rows, per_row, count)
+    return MockResultSet(columns)
+
+
+def _row_factory(row_class, fields: tuple):
+    if issubclass(row_class, MockRow):
+        return getattr(row_class, '_make', row_class)
+    return lambda *values: row_class(**dict(zip(fields, values)))
+
+
+def generate_rows(model, count: int, seed=0, children: dict = None,
+                  row_class: type = None, start: int = 1,
+                  rng: random.Random = None, **values) -> list:
+    """ List of generated rows, see 'generate_columns', which are instances
+    of a MockModel.schema row class with fields for the columns and child
+    relationships of 'model', or of 'row_class', e.g. MockModel, if given.
+    'children' is as for 'generate_result_set', and sets lists of child
+    rows, with any 'back_populates' attribute of the children set to the
+    parent row """
+    rng = rng or random.Random(seed)
+    with _gc_paused():
+        return _generate_rows(model, count, rng, children, row_class, start,
+                              values)
+
+
+def _generate_rows(model, count, rng, children, row_class, start,
+                   values) -> list:
+    columns = generate_columns(model, count, rng=rng, start=start, **values)
+    specs = _child_specs(model, children)
+    if row_class is None:
+        row_class = MockModel.schema(*columns, *[spec[0] for spec in specs])
+    # Relationship attributes are set after the children are generated
+    rows = list(map(_row_factory(row_class, tuple(columns)),
+                    *columns.values(), *[itertools.repeat(None)] * len(specs)))
+    # Children are also MockModel instances, for example
+    child_class = None if issubclass(row_class, MockRow) else row_class
+    for name, child_model, per_row, nested, keys, back_attr in specs:
+        child_values = {child_attr: _repeat(columns[attr], per_row)
+                        for attr, child_attr in keys}
+        if back_attr is not None:
+            child_values[back_attr] = _repeat(rows, per_row)
+        child_rows = _generate_rows(child_model, count * per_row, rng,
+                                    nested, child_class, 1, child_values)
+        collections = zip(*[iter(child_rows)] * per_row) if per_row \
+            else itertools.repeat(())
+        for row, collection in zip(rows, collections):
+            setattr(row, name, list(collection))
+    return rows
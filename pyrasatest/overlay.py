@@ -0,0 +1,165 @@
+import copy
+
+from .mock_model import MockModel, MockRow
+from .mock_query import MockQuery
+from .query_keys import QueryReturnValues, normalize_key
+
+
+class Overlay:
+    """ Copies of objects of the frozen base of a forked MockDbSession,
+    which are made on first access from the fork, so that changes to them,
+    e.g. 'save_called' flags or rows added to a MockQuery, are only visible
+    to the fork. Copies are shallow, and other objects, including the rows
+    of a MockQuery, are shared """
+
+    def __init__(self) -> None:
+        self.copies = {}
+
+    def value(self, value):
+        copied = self.copies.get(id(value))
+        if copied is None:
+            copied = self.copies[id(value)] = self._copy(value)
+        return copied
+
+    def _copy(self, value):
+        if isinstance(value, MockQuery):
+            query = value.fork()
+            # Rows in 'all_' are shared, as copying them would make forking
+            # a populated table O(n)
+            for attr in ['first_', 'one_', 'scalar_']:
+                setattr(query, attr, self.value(getattr(value, attr)))
+            return query
+        if isinstance(value, (MockModel, MockRow)):
+            return copy.copy(value)
+        if isinstance(value, list) or type(value) is tuple:
+            return type(value)(self.value(item) for item in value)
+        if isinstance(value, tuple) and hasattr(value, '_make'):
+            # A namedtuple, whose constructor takes a value per field
+            return value._make(self.value(item) for item in value)
+        # Including other tuple subclasses, as their constructors vary
+        return value
+
+
+class OverlayMapping:
+    """ Mixin for a dict of the items which are set on a fork, over the
+    items of 'base', whose values are copied by 'overlay' on access """
+
+    def __init__(self, base: dict, overlay: Overlay) -> None:
+        super().__init__()
+        self.base = base
+        self.overlay = overlay
+        # Keys of 'base' which are deleted from this mapping
+        self._deleted = set()
+
+    def _in_base(self, key) -> bool:
+        return key not in self._deleted and key in self.base
+
+    def __getitem__(self, key):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        if self._in_base(key):
+            return self.overlay.value(self.base[key])
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or self._in_base(key)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        in_base = self._in_base(key)
+        if dict.__contains__(self, key):
+            super().__delitem__(key)
+        elif not in_base:
+            raise KeyError(key)
+        if in_base:
+            self._deleted.add(key)
+
+    def pop(self, key, *args):
+        try:
+            value = self[key]
+        except KeyError:
+            if args:
+                return args[0]
+            raise
+        del self[key]
+        return value
+
+    def popitem(self):
+        for key in self:
+            return key, self.pop(key)
+        raise KeyError('popitem(): dictionary is empty')
+
+    def clear(self):
+        super().clear()
+        self._deleted.update(self.base)
+
+    def keys(self):
+        return list(self)
+
+    def __iter__(self):
+        yield from dict.__iter__(self)
+        for key in self.base:
+            if key not in self._deleted and not dict.__contains__(self, key):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        for _ in self:
+            return True
+        return False
+
+    def _raw_items(self):
+        """ Items without values of 'base' being copied """
+        yield from dict.items(self)
+        for key, value in getattr(self.base, '_raw_items',
+                                  self.base.items)():
+            if key not in self._deleted and not dict.__contains__(self, key):
+                yield key, value
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self.items()))
+
+
+class OverlayDict(OverlayMapping, dict):
+    pass
+
+
+class OverlayQueryReturnValues(OverlayMapping, QueryReturnValues):
+    """ Keys are normalized as for QueryReturnValues """
+
+    def __setitem__(self, key, value):
+        OverlayMapping.__setitem__(self, normalize_key(key), value)
+
+    def __delitem__(self, key):
+        self._check_frozen()
+        OverlayMapping.__delitem__(self, normalize_key(key))
+        self._raise_index = None
+
+    def pop(self, key, *args):
+        self._check_frozen()
+        return OverlayMapping.pop(self, normalize_key(key), *args)
@@ -0,0 +1,366 @@
+import datetime
+import hashlib
+import importlib
+import json
+import mmap
+import os
+import struct
+import uuid
+import zlib
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+from functools import lru_cache, partial
+
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import MultipleResultsFound, NoResultFound
+from sqlalchemy.orm import Query, class_mapper
+
+from .identity_map import mapper_attrs
+from .mock_result import MockResult
+from .query_keys import _lru_set
+
+# File layout: MAGIC, the offset of the index as an unsigned 64-bit little
+# endian integer, zlib compressed JSON records, then the zlib compressed
+# JSON index of query key to [offset, length] of its record
+MAGIC = b'PRTFIX1\n'
+_HEADER = struct.Struct('<Q')
+
+# Query methods which execute the query, and whose results are recorded
+TERMINAL_METHODS = ('all', 'first', 'one', 'one_or_none', 'scalar', 'count')
+
+_RAISED = {cls.__name__: cls for cls in [NoResultFound, MultipleResultsFound]}
+_sql_cache = OrderedDict()
+
+
+def fixture_key(statement, method: str, params=None) -> tuple:
+    """ (key, SQL) of a statement executed by 'method', where the key is a
+    digest of the SQL, the values of its bound parameters and 'params', so
+    that it is equal across processes for queries of the same shape """
+    cache_key = statement._generate_cache_key()
+    if cache_key is None:
+        compiled = statement.compile()
+        sql = str(compiled)
+        values = [_param_json(value, compiled.binds[name].expanding)
+                  for name, value in sorted(compiled.params.items())]
+    else:
+        # Compiling a statement is slow, and its SQL is the same for
+        # statements which only differ in the values of bound parameters
+        sql = _sql_cache.get(cache_key.key)
+        if sql is None:
+            sql = str(statement.compile())
+            _lru_set(_sql_cache, cache_key.key, sql)
+        values = [_param_json(bind.effective_value, bind.expanding)
+                  for bind in cache_key.bindparams]
+    digest = hashlib.sha1('\0'.join(
+        [method, sql] + values + [_param_json(params)]).encode()).hexdigest()
+    return digest, sql
+
+
+def _param_json(value, expanding: bool = False) -> str:
+    """ Canonical JSON of a bound parameter value, or its repr if it cannot
+    be encoded. The values of an expanding IN parameter are sorted, as e.g.
+    those of in_() of a set can be in a different order in each process """
+    if expanding and value is not None:
+        return '[{}]'.format(','.join(sorted(
+            _param_json(item) for item in value)))
+    try:
+        return json.dumps(encode(value), sort_keys=True)
+    except TypeError:
+        return repr(value)
+
+
+def _class_path(cls) -> str:
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
+
+
+def _import_class(path: str) -> type:
+    module, qualname = path.split(':')
+    value = importlib.import_module(module)
+    for name in qualname.split('.'):
+        value = getattr(value, name)
+    return value
+
+
+def encode(value):
+    """ JSON compatible form of a query result value. Values other than JSON
+    types are tagged dicts, as are dicts, so that they are unambiguous """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, Row):
+        return {'$': 'row', 'f': list(value._fields),
+                'v': [encode(item) for item in value]}
+    if isinstance(value, dict):
+        return {'$': 'dict', 'v': {k: encode(v) for k, v in value.items()}}
+    if isinstance(value, datetime.datetime):
+        return {'$': 'datetime', 'v': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$': 'date', 'v': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'$': 'time', 'v': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$': 'decimal', 'v': str(value)}
+    if isinstance(value, uuid.UUID):
+        return {'$': 'uuid', 'v': str(value)}
+    if isinstance(value, bytes):
+        return {'$': 'bytes', 'v': value.hex()}
+    attrs = mapper_attrs(type(value))
+    if attrs is not None:
+        return {'$': 'model', 'c': _class_path(type(value)),
+                'v': {attr: encode(getattr(value, attr)) for attr in attrs[1]}}
+    raise TypeError('Cannot record a query result value of type {!r}'.format(
+        type(value).__name__))
+
+
+# fromisoformat is looked up on use, as it requires Python 3.7
+_DECODERS = {
+    'datetime': lambda v: datetime.datetime.fromisoformat(v),
+    'date': lambda v: datetime.date.fromisoformat(v),
+    'time': lambda v: datetime.time.fromisoformat(v),
+    'decimal': Decimal,
+    'uuid': uuid.UUID,
+    'bytes': bytes.fromhex,
+}
+
+
+@lru_cache(maxsize=None)
+def _row_class(fields: tuple) -> type:
+    """ namedtuple class of rows with 'fields', which compare and hash as
+    tuples as SQLAlchemy Rows do. Fields which cannot be namedtuple fields,
+    such as keywords or duplicates, are renamed by position, and are got with
+    getattr, e.g. getattr(row, 'from') """
+    row_class = namedtuple('Row', fields, rename=True)
+    renamed = {field: i for i, (field, name) in enumerate(
+        zip(fields, row_class._fields)) if field != name}
+    if not renamed:
+        return row_class
+
+    def __getattr__(self, name):
+        try:
+            return self[renamed[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+    # The original fields, as for the _fields of a Row and for _asdict
+    return type('Row', (row_class, ), {'__slots__': (), '_fields': fields,
+                                       '__getattr__': __getattr__})
+
+
+def decode(value, classes: dict):
+    """ Inverse of 'encode', where mapped class instances are created
+    without calling __init__, as when loaded by a session. 'classes' caches
+    the class managers of mapped classes by their path """
+    if isinstance(value, list):
+        return [decode(item, classes) for item in value]
+    if not isinstance(value, dict):
+        return value
+    tag = value['$']
+    if tag == 'row':
+        items = [decode(item, classes) for item in value['v']]
+        return _row_class(tuple(value['f']))._make(items)
+    if tag == 'dict':
+        return {k: decode(v, classes) for k, v in value['v'].items()}
+    if tag == 'model':
+        manager = classes.get(value['c'])
+        if manager is None:
+            manager = classes[value['c']] = class_mapper(
+                _import_class(value['c'])).class_manager
+        instance = manager.new_instance()
+        # Set in the instance dict, as for loaded attributes, which unlike
+        # setattr does not fire attribute events
+        instance.__dict__.update(
+            (attr, decode(attr_value, classes) if isinstance(
+                attr_value, (list, dict)) else attr_value)
+            for attr, attr_value in value['v'].items())
+        return instance
+    return _DECODERS[tag](value['v'])
+
+
+class FixtureReader:
+    """ Records of a fixture file, which is memory-mapped so that only the
+    index is read on opening, and each record is decoded on first access """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError('{} is not a fixture file'.format(path))
+        index_offset, = _HEADER.unpack_from(self._mmap, len(MAGIC))
+        self.index = json.loads(zlib.decompress(self._mmap[index_offset:]))
+        self._records = {}
+
+    def raw(self, key: str) -> bytes:
+        offset, length = self.index[key]
+        return self._mmap[offset:offset + length]
+
+    def get(self, key: str) -> dict:
+        """ {'sql': SQL, 'results': [encoded results in order]} or None """
+        record = self._records.get(key)
+        if record is None and key in self.index:
+            record = self._records[key] = json.loads(
+                zlib.decompress(self.raw(key)))
+        return record
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FixtureWriter:
+    """ Records added in a recording run, which 'save' merges into the
+    fixture file, replacing any records of the same queries """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records = {}
+
+    def add(self, key: str, sql: str, result) -> None:
+        self.records.setdefault(key, {'sql': sql, 'results': []})[
+            'results'].append(result)
+
+    def save(self) -> None:
+        blobs = {}
+        if os.path.exists(self.path):
+            with FixtureReader(self.path) as reader:
+                # Copied without being decoded
+                blobs = {key: reader.raw(key) for key in reader.index
+                         if key not in self.records}
+        for key, record in self.records.items():
+            blobs[key] = zlib.compress(json.dumps(
+                record, separators=(',', ':')).encode())
+        index = {}
+        offset = len(MAGIC) + _HEADER.size
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(MAGIC + _HEADER.pack(0))
+            for key, blob in blobs.items():
+                file.write(blob)
+                index[key] = [offset, len(blob)]
+                offset += len(blob)
+            file.write(zlib.compress(json.dumps(index).encode()))
+            file.seek(len(MAGIC))
+            file.write(_HEADER.pack(offset))
+        os.replace(temp_path, self.path)
+
+
+class FixtureQuery:
+    """ Proxy for an SQLAlchemy query, whose terminal methods, such as
+    'all' and 'first', get their results from 'session.result' """
+
+    def __init__(self, query, session) -> None:
+        self._query = query
+        self._session = session
+
+    def __getattr__(self, name):
+        if name in TERMINAL_METHODS:
+            return partial(self._session.result, self._query, name)
+        attr = getattr(self._query, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if isinstance(result, Query):
+                return FixtureQuery(result, self._session)
+            return result
+        return method
+
+    def __iter__(self):
+        return iter(self._session.result(self._query, 'all'))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice) and item.step is None and \
+                (item.start or 0) >= 0 and (item.stop or 0) >= 0:
+            return self._session.result(
+                self._query.slice(item.start or 0, item.stop)
+                if item.stop is not None else
+                self._query.offset(item.start), 'all')
+        return list(self)[item]
+
+
+class RecordingSession:
+    """ Proxy for an SQLAlchemy session, which records the results of its
+    queries and select statements to a fixture file on 'save' """
+
+    def __init__(self, dbsession, path: str) -> None:
+        self.dbsession = dbsession
+        self.writer = FixtureWriter(path)
+
+    def query(self, *args, **kwargs) -> FixtureQuery:
+        return FixtureQuery(self.dbsession.query(*args, **kwargs), self)
+
+    def result(self, query, method: str):
+        key, sql = fixture_key(query.statement, method)
+        try:
+            value = getattr(query, method)()
+        except tuple(_RAISED.values()) as e:
+            self.writer.add(key, sql, {'$': 'raise',
+                                       'c': type(e).__name__})
+            raise
+        self.writer.add(key, sql, encode(value))
+        return value
+
+    def execute(self, statement, params=None, *args, **kwargs):
+        result = self.dbsession.execute(statement, params, *args, **kwargs)
+        if not getattr(statement, 'is_select', False):
+            return result
+        # The rows are fetched once, and a new result of them is returned
+        frozen = result.freeze()
+        key, sql = fixture_key(statement, 'execute', params)
+        self.writer.add(key, sql, encode(frozen().all()))
+        return frozen()
+
+    def save(self) -> None:
+        self.writer.save()
+
+    def __getattr__(self, name):
+        return getattr(self.dbsession, name)
+
+
+class ReplaySession:
+    """ Stands in for an SQLAlchemy session with the results recorded by a
+    RecordingSession, without a database. Results of a query which was
+    recorded more than once are returned in the recorded order, and the
+    last one is repeated """
+
+    def __init__(self, path: str) -> None:
+        self.reader = FixtureReader(path)
+        self.executed_statements = []
+        self._classes = {}
+        self._positions = {}
+
+    def query(self, *args, **kwargs) -> FixtureQuery:
+        return FixtureQuery(Query(args), self)
+
+    def _next_result(self, key: str, sql: str):
+        record = self.reader.get(key)
+        if record is None:
+            raise LookupError('No recorded result for the query:\n{}'.format(
+                sql))
+        results = record['results']
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        result = results[min(position, len(results) - 1)]
+        if isinstance(result, dict) and result.get('$') == 'raise':
+            raise _RAISED[result['c']]()
+        return decode(result, self._classes)
+
+    def result(self, query, method: str):
+        return self._next_result(*fixture_key(query.statement, method))
+
+    def execute(self, statement, params=None, *args, **kwargs) -> MockResult:
+        if not getattr(statement, 'is_select', False):
+            self.executed_statements.append((statement, params))
+            return MockResult(rowcount=0)
+        return MockResult(self._next_result(
+            *fixture_key(statement, 'execute', params)))
+
+    def close(self) -> None:
+        self.reader.close()
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+
+from sqlalchemy.ext.declarative import DeclarativeMeta
+from sqlalchemy.orm.attributes import InstrumentedAttribute, QueryableAttribute
+from sqlalchemy.sql.elements import ColumnClause, Label
+
+LABEL_KEY_CACHE_SIZE = 1024
+STATEMENT_KEY_CACHE_SIZE = 1024
+
+_label_key_cache = OrderedDict()
+_statement_key_cache = OrderedDict()
+_columns_key_cache = OrderedDict()
+
+
+def _element_key(element):
+    """ Structural key for the expression which a Label is applied to """
+    if isinstance(element, ColumnClause) and element.table is not None:
+        return element.table, element.key
+    try:
+        cache_key = element._generate_cache_key()
+    except AttributeError:
+        cache_key = None
+    if cache_key is not None:
+        return cache_key.key
+    # Not cacheable, so compile to SQL as a last resort
+    return str(element)
+
+
+def label_key(label: Label) -> tuple:
+    """ Hashable key derived from the label name and the identity of the
+    labelled column, or the structure of the labelled expression, which is
+    equal for equivalent labels. Memoized in a bounded LRU cache """
+    cached = _label_key_cache.get(id(label))
+    if cached is not None and cached[0] is label:
+        try:
+            _label_key_cache.move_to_end(id(label))
+        except KeyError:
+            # Evicted by another thread since the lookup
+            pass
+        return cached[1]
+    key = (Label, label.key, _element_key(label.element))
+    # The label is kept referenced so that its id is not reused while cached
+    _label_key_cache[id(label)] = (label, key)
+    if len(_label_key_cache) > LABEL_KEY_CACHE_SIZE:
+        _label_key_cache.popitem(last=False)
+    return key
+
+
+def normalize_key(key):
+    """ Since hash(Foo.bar.label('abc')) gives unique value """
+    if isinstance(key, Label):
+        return label_key(key)
+    return key
+
+
+def _lru_set(cache: OrderedDict, key, value) -> None:
+    cache[key] = value
+    if len(cache) > STATEMENT_KEY_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def statement_key(statement) -> tuple:
+    """ (dispatch key, number of selected elements) of a select statement,
+    where the key is that of the first selected entity or column, as for the
+    first argument of a query call. Memoized by statement identity, then by
+    the selected elements' part of the statement cache key, so that
+    equivalent statements built in a loop are only inspected once """
+    cached = _statement_key_cache.get(id(statement))
+    if cached is not None and cached[0] is statement:
+        return cached[1]
+    # Generating the full cache key of a new statement also traverses its
+    # where clause etc., which is several times slower than this
+    columns_key = tuple(normalize_key(column)
+                        for column in statement._raw_columns)
+    result = _columns_key_cache.get(columns_key)
+    if result is None:
+        descriptions = statement.column_descriptions
+        result = (normalize_key(descriptions[0]['expr']) if descriptions
+                  else None, len(descriptions))
+        _lru_set(_columns_key_cache, columns_key, result)
+    # As for label_key, the statement is kept referenced while cached
+    _lru_set(_statement_key_cache, id(statement), (statement, result))
+    return result
+
+
+class QueryReturnValues(dict):
+    """ dict of query_return_values with keys normalized on insertion.
+
+    Keeps an index of Exception class values by mapped table and by model
+    property, so that raise conditions are found with constant-time lookups.
+    The index is rebuilt lazily after any modification of the dict.
+    """
+    # Set by 'freeze', e.g. for the base of forked sessions
+    _frozen = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._raise_index = None
+        self.update(*args, **kwargs)
+
+    def freeze(self) -> None:
+        self._frozen = True
+
+    def _check_frozen(self) -> None:
+        if self._frozen:
+            raise RuntimeError('query_return_values are frozen, as the '
+                               'session is the base of forks')
+
+    def __setitem__(self, key, value):
+        self._check_frozen()
+        super().__setitem__(normalize_key(key), value)
+        self._raise_index = None
+
+    def __delitem__(self, key):
+        self._check_frozen()
+        super().__delitem__(normalize_key(key))
+        self._raise_index = None
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def setdefault(self, key, default=None):
+        key = normalize_key(key)
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *args):
+        self._check_frozen()
+        self._raise_index = None
+        return super().pop(normalize_key(key), *args)
+
+    def popitem(self):
+        self._check_frozen()
+        self._raise_index = None
+        return super().popitem()
+
+    def clear(self):
+        self._check_frozen()
+        self._raise_index = None
+        super().clear()
+
+    def _raw_items(self):
+        return self.items()
+
+    def raise_index(self) -> dict:
+        """ Maps '__table__' and 'property' values of keys to the first
+        Exception class which is set as a return value for them """
+        if self._raise_index is None:
+            index = {}
+            for key, val in self._raw_items():
+                if not (isinstance(val, type) and issubclass(val, Exception)):
+                    continue
+                for sa_class, attr in [(DeclarativeMeta, '__table__'),
+                                       (InstrumentedAttribute, 'property')]:
+                    if isinstance(key, sa_class):
+                        index.setdefault((attr, getattr(key, attr)), val)
+            self._raise_index = index
+        return self._raise_index
+
+    def raise_value(self, query_arg):
+        """ Exception class to be raised for a query on 'query_arg' """
+        index = self.raise_index()
+        if not index:
+            return None
+        # Failed attribute lookups on model properties are slow, and they do
+        # not have a '__table__' attribute
+        attrs = ['property'] if isinstance(query_arg, QueryableAttribute) \
+            else ['__table__', 'property']
+        for attr in attrs:
+            try:
+                exc_class = index.get((attr, getattr(query_arg, attr, None)))
+            except TypeError:
+                continue
+            if exc_class is not None:
+                return exc_class
+        return None
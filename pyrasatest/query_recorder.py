@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+from collections import Counter
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def call_site(depth: int = 1) -> tuple:
+    """ (filename, line number, function name) of the first frame outside of
+    the pyrasatest package, i.e. the code which made a query """
+    frame = sys._getframe(depth)
+    while frame.f_back is not None and os.path.dirname(
+            os.path.abspath(frame.f_code.co_filename)) == _PACKAGE_DIR:
+        frame = frame.f_back
+    return frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name
+
+
+class QueryRecord:
+    """ A dbsession.query call and the methods subsequently called on the
+    query which it returned """
+
+    def __init__(self, args: tuple, key, site: tuple) -> None:
+        self.args = args
+        self.key = key
+        self.call_site = site
+        self.timestamp = time.perf_counter()
+        self.calls = []
+
+    @property
+    def shape(self) -> tuple:
+        return self.key, tuple(name for name, args, kwargs in self.calls)
+
+    def __repr__(self):
+        return '<QueryRecord {}:{} query({}){}>'.format(
+            os.path.basename(self.call_site[0]), self.call_site[1],
+            ', '.join(repr(arg) for arg in self.args),
+            ''.join('.{}()'.format(name) for name, _, _ in self.calls))
+
+
+class RecordingQuery:
+    """ Proxy for a query returned by MockDbSession.query, which records
+    method calls on it, including those on queries it returns """
+
+    def __init__(self, query, record: QueryRecord) -> None:
+        self._query = query
+        self._record = record
+
+    def _wrap(self, result):
+        if type(result) is type(self._query):
+            return RecordingQuery(result, self._record)
+        return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            self._record.calls.append((name, args, kwargs))
+            return self._wrap(attr(*args, **kwargs))
+        return method
+
+    def __iter__(self):
+        self._record.calls.append(('__iter__', (), {}))
+        return iter(self._query)
+
+    def __getitem__(self, item):
+        self._record.calls.append(('__getitem__', (item, ), {}))
+        return self._wrap(self._query[item])
+
+
+class QueryRecorder:
+    """ Records dbsession.query calls, for assertions on the number of
+    queries made by the code being tested and detection of N+1 queries,
+    i.e. queries of the same shape repeatedly made from a loop """
+
+    def __init__(self) -> None:
+        self.records = []
+
+    def record(self, query_func, args: tuple, key):
+        record = QueryRecord(args, key, call_site())
+        self.records.append(record)
+        return RecordingQuery(query_func(*args), record)
+
+    def reset(self) -> None:
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def _format(self, records) -> str:
+        return '\n'.join('  {!r}'.format(record) for record in records)
+
+    def assert_max_queries(self, count: int) -> None:
+        if len(self.records) > count:
+            raise AssertionError('{} queries made, expected at most {}:\n{}'
+                                 .format(len(self.records), count,
+                                         self._format(self.records)))
+
+    def repeated_queries(self, threshold: int = 3) -> list:
+        """ Lists of records of queries with the same shape which were made
+        at least 'threshold' times from the same line of code """
+        counts = Counter((r.call_site, r.shape) for r in self.records)
+        return [[r for r in self.records if (r.call_site, r.shape) == group]
+                for group, count in counts.items() if count >= threshold]
+
+    def assert_no_n_plus_one(self, threshold: int = 3) -> None:
+        repeated = self.repeated_queries(threshold)
+        if repeated:
+            raise AssertionError('Possible N+1 queries:\n{}'.format(
+                '\n'.join('{} times:\n{}'.format(len(records), self._format(
+                    records[:1])) for records in repeated)))
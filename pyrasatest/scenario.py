@@ -0,0 +1,202 @@
+import hashlib
+import importlib
+import json
+import os
+import pickle
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from .mock_model import MockModel
+from .mock_query import MockQuery
+from .query_keys import QueryReturnValues
+
+# Incremented when the format of cache files changes
+CACHE_VERSION = 1
+
+# Frozen QueryReturnValues by (path, modification time, size) of scenario
+# files which are already loaded by this process
+_scenarios = {}
+
+
+def _getattr_path(value, names: list):
+    for name in names:
+        value = getattr(value, name)
+    return value
+
+
+def resolve(path: str, module: str = None) -> tuple:
+    """ (object, module name) for a dotted path such as 'app.models.Order.id',
+    or a path relative to 'module', such as 'Order.id' """
+    names = path.split('.')
+    if module is not None:
+        try:
+            return _getattr_path(importlib.import_module(module),
+                                 names), module
+        except AttributeError:
+            pass
+    for i in range(len(names) - 1, 0, -1):
+        name = '.'.join(names[:i])
+        try:
+            value = importlib.import_module(name)
+        except ModuleNotFoundError as e:
+            # Unless the module exists but fails to import another module
+            if e.name != name and not name.startswith(e.name + '.'):
+                raise
+            continue
+        return _getattr_path(value, names[i:]), name
+    raise ValueError('Cannot resolve {!r} to a module attribute'.format(path))
+
+
+class _Compiler:
+    """ Builds query_return_values items from the data of a scenario file.
+    Values are JSON values, where dicts are MockModel instances, except for
+    {"$raise": path} for an exception class and {"$query": {...}} for a
+    MockQuery with the given keyword arguments """
+
+    def __init__(self, module: str = None) -> None:
+        self.module = module
+        # Resolved objects by path, and the modules they are in
+        self.refs = {}
+        self.modules = set()
+
+    def ref(self, path: str):
+        value, module = resolve(path, self.module)
+        self.refs[path] = value
+        self.modules.add(module)
+        return value
+
+    def value(self, value):
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if '$raise' in value:
+            return self.ref(value['$raise'])
+        if '$query' in value:
+            return MockQuery(**{k: self.value(v)
+                                for k, v in value['$query'].items()})
+        return MockModel(**{k: self.value(v) for k, v in value.items()})
+
+    def items(self, values: dict) -> list:
+        return [(self.ref(key), self.value(value))
+                for key, value in values.items()]
+
+
+def _fingerprints(modules) -> list:
+    """ Versions of the modules which a scenario refers to, which cached
+    scenarios are only used with """
+    fingerprints = []
+    for name in sorted(modules):
+        module = importlib.import_module(name)
+        path = getattr(module, '__file__', None)
+        stat = os.stat(path) if path else None
+        fingerprints.append((name, getattr(module, '__version__', None),
+                             stat and (stat.st_mtime_ns, stat.st_size)))
+    return fingerprints
+
+
+class _Pickler(pickle.Pickler):
+    """ Pickles resolved objects, such as model attributes, which can not
+    be pickled, as their paths """
+
+    def __init__(self, file, paths: dict) -> None:
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.paths = paths
+
+    def persistent_id(self, obj):
+        return self.paths.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, module: str = None) -> None:
+        super().__init__(file)
+        self.module = module
+
+    def persistent_load(self, pid):
+        return resolve(pid, self.module)[0]
+
+
+def cache_path(path: str, digest: str, cache_dir: str = None) -> str:
+    """ Cache file of a scenario file with content hash 'digest', which is
+    in a __pycache__ directory next to it by default, as for bytecode """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(
+        os.path.abspath(path)), '__pycache__')
+    return os.path.join(cache_dir, '{}.{}.scenario'.format(
+        os.path.basename(path), digest[:16]))
+
+
+def _read_data(path: str, content: bytes) -> dict:
+    if path.endswith('.toml'):
+        if tomllib is None:
+            raise ImportError('TOML scenarios require Python 3.11 or tomli')
+        return tomllib.loads(content.decode())
+    return json.loads(content)
+
+
+def _load_cache(cached: str):
+    try:
+        with open(cached, 'rb') as file:
+            version, module, fingerprints = pickle.load(file)
+            if version != CACHE_VERSION or \
+                    _fingerprints(name for name, _, _ in fingerprints) != \
+                    fingerprints:
+                return None
+            return _Unpickler(file, module).load()
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, ValueError):
+        return None
+
+
+def _save_cache(cached: str, module: str, compiler: _Compiler,
+                items: list) -> None:
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    temp_path = '{}.{}.tmp'.format(cached, os.getpid())
+    with open(temp_path, 'wb') as file:
+        pickle.dump((CACHE_VERSION, module,
+                     _fingerprints(compiler.modules)), file)
+        _Pickler(file, {id(value): path for path, value
+                        in compiler.refs.items()}).dump(items)
+    os.replace(temp_path, cached)
+
+
+def load_scenario(path: str, cache_dir: str = None) -> QueryReturnValues:
+    """ Frozen query_return_values of a JSON or TOML scenario file of the
+    form {"module": "app.models", "query_return_values": {path: value}},
+    where 'module' is optional, see _Compiler for values. The compiled
+    scenario is cached on disk, keyed by the hash of the file content and
+    the versions of the modules it refers to, and by this process """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    table = _scenarios.get(memo_key)
+    if table is not None:
+        return table
+    with open(path, 'rb') as file:
+        content = file.read()
+    cached = cache_path(path, hashlib.sha256(content).hexdigest(), cache_dir)
+    items = _load_cache(cached)
+    if items is None:
+        data = _read_data(path, content)
+        module = data.get('module')
+        compiler = _Compiler(module)
+        items = compiler.items(data.get('query_return_values', {}))
+        try:
+            _save_cache(cached, module, compiler, items)
+        except OSError:
+            # e.g. a read-only checkout, where the scenario is compiled by
+            # each process instead
+            pass
+    table = QueryReturnValues(items)
+    table.freeze()
+    _scenarios[memo_key] = table
+    return table
+
+
+def clear_cache() -> None:
+    """ Clears scenarios loaded by this process, but not cache files """
+    _scenarios.clear()
@@ -0,0 +1,191 @@
+import datetime
+import enum
+import itertools
+import json
+import keyword
+import uuid
+from decimal import Decimal
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from .mock_model import MockModel, MockRow
+from .mock_query import MockQuery
+from .mock_result_set import MockResultSet, ResultRow
+
+_EMPTY = object()
+
+
+def _plan(fields: tuple, exclude: frozenset) -> tuple:
+    """ Fields of a row shape which are serialized, as for to_dict """
+    return tuple(f for f in fields
+                 if not f.startswith('_') and f not in exclude)
+
+
+def _dict_function(fields: tuple, attributes: bool):
+    """ Function returning the dict of 'fields' of a row, which is compiled
+    for the fields, as for MockRow._make, as a dict display is much faster
+    than building the dict in a loop """
+    if attributes:
+        items = ('{0!r}: getattr(row, {0!r})'.format(field)
+                 if keyword.iskeyword(field) else
+                 '{0!r}: row.{0}'.format(field) for field in fields)
+    else:
+        items = ('{0!r}: row[{0!r}]'.format(field) for field in fields)
+    namespace = {}
+    exec('def to_dict(row):\n    return {{{}}}'.format(', '.join(items)),
+         namespace)
+    return namespace['to_dict']
+
+
+@lru_cache(maxsize=1024)
+def _mock_model_plan(shape: tuple, exclude: frozenset):
+    """ Function returning the dict of init_kwargs of the given keys, or
+    None if all of the keys are included and it is copied """
+    fields = _plan(shape, exclude)
+    return None if fields == shape else _dict_function(fields, False)
+
+
+@lru_cache(maxsize=1024)
+def _mock_row_plan(row_class: type, exclude: frozenset):
+    """ Function returning the dict of a row of 'row_class' """
+    return _dict_function(_plan(row_class._fields, exclude), True)
+
+
+def _iter_mock_model_dicts(rows: Iterable, exclude: frozenset) -> Iterator:
+    shape = to_dict = None
+    for row in rows:
+        if not isinstance(row, MockModel) or \
+                type(row).to_dict is not MockModel.to_dict:
+            # Including subclasses which override to_dict
+            yield from _iter_other_dicts([row], exclude)
+            continue
+        kwargs = row.init_kwargs
+        row_shape = tuple(kwargs)
+        if row_shape != shape:
+            shape = row_shape
+            to_dict = _mock_model_plan(shape, exclude)
+        yield dict(kwargs) if to_dict is None else to_dict(kwargs)
+
+
+def _iter_mock_row_dicts(rows: Iterable, exclude: frozenset) -> Iterator:
+    row_class = to_dict = None
+    for row in rows:
+        if type(row) is not row_class:
+            row_class = type(row)
+            if not issubclass(row_class, MockRow) or row_class._lazy or \
+                    row_class.to_dict is not MockRow.to_dict:
+                # Lazy rows return None for unset fields, which to_dict
+                # leaves out, so they are serialized one at a time, as are
+                # rows of subclasses which override to_dict
+                row_class = None
+                yield from _iter_other_dicts([row], exclude)
+                continue
+            to_dict = _mock_row_plan(row_class, exclude)
+        try:
+            yield to_dict(row)
+        except AttributeError:
+            # A field which is not set
+            yield row.to_dict(exclude)
+
+
+def _iter_result_set_dicts(result_set: MockResultSet,
+                           exclude: frozenset) -> Iterator:
+    fields = _plan(result_set.fields, exclude)
+    if not fields:
+        return ({} for _ in range(len(result_set)))
+    columns = [result_set.columns[f] for f in fields]
+    return (dict(zip(fields, values)) for values in zip(*columns))
+
+
+def _iter_result_row_dicts(rows: Iterable, exclude: frozenset) -> Iterator:
+    result_set = fields = columns = None
+    for row in rows:
+        if not isinstance(row, ResultRow):
+            yield from _iter_other_dicts([row], exclude)
+            continue
+        if row._result_set is not result_set:
+            result_set = row._result_set
+            fields = _plan(result_set.fields, exclude)
+            columns = [result_set.columns[f] for f in fields]
+        index = row._index
+        yield dict(zip(fields, [column[index] for column in columns]))
+
+
+def _iter_other_dicts(rows: Iterable, exclude: frozenset) -> Iterator:
+    for row in rows:
+        if isinstance(row, dict):
+            yield {k: v for k, v in row.items()
+                   if not k.startswith('_') and k not in exclude}
+        else:
+            yield row.to_dict(exclude)
+
+
+def iter_dicts(rows, exclude: Iterable[str] = None) -> Iterator[dict]:
+    """ Yields the to_dict() result of each row, without building a list of
+    them. 'rows' is an iterable of MockModel, MockModel.schema or
+    MockResultSet rows, dicts or objects with a to_dict method, a
+    MockResultSet or a MockQuery, whose 'all' result is serialized. The
+    fields of rows of the same shape are only computed once, rather than
+    for each row as for to_dict """
+    exclude = frozenset(exclude or ())
+    if isinstance(rows, MockQuery):
+        rows = rows.all()
+    if isinstance(rows, MockResultSet):
+        return _iter_result_set_dicts(rows, exclude)
+    iterator = iter(rows)
+    first = next(iterator, _EMPTY)
+    if first is _EMPTY:
+        return iter(())
+    rows = itertools.chain([first], iterator)
+    if isinstance(first, MockModel):
+        return _iter_mock_model_dicts(rows, exclude)
+    if isinstance(first, MockRow):
+        return _iter_mock_row_dicts(rows, exclude)
+    if isinstance(first, ResultRow):
+        return _iter_result_row_dicts(rows, exclude)
+    return _iter_other_dicts(rows, exclude)
+
+
+def to_dicts(rows, exclude: Iterable[str] = None) -> list:
+    """ List of the to_dict() result of each row, see 'iter_dicts' """
+    return list(iter_dicts(rows, exclude))
+
+
+def json_default(value):
+    """ JSON value of types which query results commonly have """
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if hasattr(value, 'dtype') and hasattr(value, 'item'):
+        # A NumPy scalar, from a NumPy column of a MockResultSet
+        return value.item()
+    raise TypeError('Object of type {} is not JSON serializable'.format(
+        type(value).__name__))
+
+
+def iter_json(rows, exclude: Iterable[str] = None, chunk_size: int = 1000,
+              default=json_default) -> Iterator[bytes]:
+    """ Yields the UTF-8 JSON array of the to_dict() results of the rows in
+    chunks of 'chunk_size' rows, e.g. for a streamed response body """
+    encoder = json.JSONEncoder(separators=(',', ':'), default=default)
+    dicts = iter_dicts(rows, exclude)
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(itertools.islice(dicts, chunk_size))
+        if not chunk:
+            break
+        # The chunk is encoded as a list in one call, without its brackets
+        yield separator + encoder.encode(chunk)[1:-1].encode()
+        separator = b','
+    yield b']'
+
+
+def to_json(rows, exclude: Iterable[str] = None,
+            default=json_default) -> bytes:
+    """ UTF-8 JSON array of the to_dict() results of the rows """
+    return json.dumps(to_dicts(rows, exclude), separators=(',', ':'),
+                      default=default).encode()
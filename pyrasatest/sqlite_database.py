@@ -0,0 +1,118 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from .mock_db_session import PartialMockDbSession
+
+# (process id, SharedDatabase) by (metadata, image path)
+_databases = {}
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    # The sqlite3 module otherwise begins and commits transactions itself,
+    # which breaks SAVEPOINT handling
+    dbapi_connection.isolation_level = None
+
+
+def _begin(connection):
+    connection.exec_driver_sql('BEGIN')
+
+
+class SharedDatabase:
+    """ In-memory SQLite database whose schema is created once, for tests
+    which each make changes in a transaction which is rolled back at the end
+    of the test, rather than creating the database for each test case.
+
+    Sessions from 'begin' are bound to a connection in a transaction, and
+    their own commits and rollbacks are made with savepoints, so 'rollback'
+    discards everything done with the session in one step. All sessions use
+    the same connection, so tests must not run concurrently in threads.
+
+    :param metadata: MetaData of the tables to create
+    :param image_path: SQLite database file, e.g. saved by 'save_image', which
+    is loaded instead of creating the tables. Requires Python 3.7
+    :param setup: function called with a session after the tables are
+    created, to add data shared by all tests, which is then committed
+    """
+
+    def __init__(self, metadata, image_path: str = None, setup=None) -> None:
+        self.engine = create_engine(
+            'sqlite://', poolclass=StaticPool,
+            connect_args={'check_same_thread': False})
+        event.listen(self.engine, 'connect', _disable_driver_transactions)
+        event.listen(self.engine, 'begin', _begin)
+        if image_path is not None:
+            source = sqlite3.connect(image_path)
+            try:
+                with self.engine.connect() as connection:
+                    source.backup(connection.connection.driver_connection)
+            finally:
+                source.close()
+            return
+        metadata.create_all(self.engine)
+        if setup is not None:
+            with Session(self.engine) as session:
+                setup(session)
+                session.commit()
+
+    def save_image(self, path: str) -> None:
+        """ Saves the database to a file, which can be passed as
+        'image_path' to skip creating the tables and adding shared data """
+        target = sqlite3.connect(path)
+        try:
+            with self.engine.connect() as connection:
+                connection.connection.driver_connection.backup(target)
+        finally:
+            target.close()
+
+    def begin(self) -> Session:
+        """ Session whose changes, including commits, are discarded by
+        'rollback' """
+        connection = self.engine.connect()
+        session = Session(bind=connection,
+                          join_transaction_mode='create_savepoint')
+        session.info['shared_database_transaction'] = connection.begin()
+        return session
+
+    def rollback(self, session) -> None:
+        """ Discards the changes made with a session from 'begin', or with
+        the 'dbsession' of a PartialMockDbSession from 'partial_session' """
+        session = getattr(session, 'dbsession', session)
+        session.close()
+        transaction = session.info.pop('shared_database_transaction')
+        transaction.rollback()
+        transaction.connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """ Yields a session from 'begin', which is rolled back on exit """
+        session = self.begin()
+        try:
+            yield session
+        finally:
+            self.rollback(session)
+
+    def partial_session(self, query_return_values: dict,
+                        **kwargs) -> PartialMockDbSession:
+        """ PartialMockDbSession whose unmocked queries are made with a
+        session from 'begin', to be passed to 'rollback' at teardown """
+        return PartialMockDbSession(query_return_values, self.begin(),
+                                    **kwargs)
+
+
+def shared_database(metadata, image_path: str = None,
+                    setup=None) -> SharedDatabase:
+    """ SharedDatabase for 'metadata' which is created once per process,
+    e.g. once per pytest-xdist worker, and reused by later calls. 'setup' is
+    only called when the database is created """
+    key = (metadata, image_path)
+    pid, database = _databases.get(key, (None, None))
+    # A forked process can not share the SQLite connection of its parent
+    if pid != os.getpid():
+        database = SharedDatabase(metadata, image_path, setup)
+        _databases[key] = (os.getpid(), database)
+    return database
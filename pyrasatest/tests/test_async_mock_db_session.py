@@ -0,0 +1,162 @@
+import asyncio
+import unittest
+
+from sqlalchemy import Column, Integer, select, update
+from sqlalchemy.exc import MultipleResultsFound
+from sqlalchemy.ext.declarative import declarative_base
+
+from pyrasatest.async_mock_db_session import (
+    AsyncMockDbSession, AsyncMockResult
+)
+from pyrasatest.latency import LatencyModel
+from pyrasatest.mock_db_session import MockDbSession
+from pyrasatest.mock_query import MockQuery
+
+Base = declarative_base()
+
+
+class Foo(Base):
+    __tablename__ = 'foo'
+    id = Column(Integer, primary_key=True)
+    number = Column(Integer)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def collect(async_iterable) -> list:
+    return [item async for item in async_iterable]
+
+
+class AsyncMockResultTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rows = [(i, i * 2) for i in range(10)]
+
+    def test_fetch_methods(self):
+        result = AsyncMockResult(self.rows)
+        self.assertEqual(self.rows[0], run(result.first()))
+        self.assertEqual(self.rows[1:3], run(result.fetchmany(2)))
+        self.assertEqual(self.rows[3:], run(result.all()))
+
+    def test_scalars_and_partitions(self):
+        partitions = run(collect(
+            AsyncMockResult(self.rows).scalars(1).partitions(4)))
+        self.assertEqual([[0, 2, 4, 6], [8, 10, 12, 14], [16, 18]],
+                         partitions)
+
+    def test_async_for(self):
+        self.assertEqual(self.rows, run(collect(AsyncMockResult(self.rows))))
+
+    def test_one(self):
+        self.assertEqual(3, run(AsyncMockResult([(3, )]).scalar_one()))
+        with self.assertRaises(MultipleResultsFound):
+            run(AsyncMockResult(self.rows).one())
+
+    def test_on_fetch_called_with_row_counts(self):
+        counts = []
+
+        async def on_fetch(count):
+            counts.append(count)
+
+        run(collect(AsyncMockResult(self.rows, on_fetch).partitions(4)))
+        self.assertEqual([4, 4, 2], counts)
+
+
+class AsyncMockDbSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.records = [Foo(id=i, number=i % 3) for i in range(1, 11)]
+
+    def test_execute_query_return_values(self):
+        session = AsyncMockDbSession({Foo.number: [1, 2], Foo: ValueError})
+        self.assertEqual([1, 2], run(session.scalars(
+            select(Foo.number))).all())
+        self.assertEqual(1, run(session.scalar(select(Foo.number))))
+        with self.assertRaises(ValueError):
+            run(session.execute(select(Foo)))
+
+    def test_execute_registered_table(self):
+        session = AsyncMockDbSession()
+        session.register_table(Foo, self.records)
+        result = run(session.execute(
+            select(Foo).where(Foo.number == 0).order_by(Foo.id.desc())))
+        self.assertEqual([9, 6, 3], [foo.id for foo in result.scalars()])
+
+    def test_execute_other_statement(self):
+        session = AsyncMockDbSession()
+        stmt = update(Foo).values(number=1)
+        self.assertEqual(0, run(session.execute(stmt)).rowcount)
+        self.assertEqual([(stmt, None)], session.executed_statements)
+
+    def test_stream(self):
+        session = AsyncMockDbSession(
+            latency={Foo: LatencyModel(fixed=0.001, per_row=0.0001)})
+        session.register_table(Foo, self.records)
+
+        async def stream_ids():
+            result = await session.stream_scalars(select(Foo).limit(5))
+            return [foo.id async for foo in result]
+
+        self.assertEqual([1, 2, 3, 4, 5], run(stream_ids()))
+        self.assertAlmostEqual(0.0015, session.db_time)
+
+    def test_mock_query_latency_as_for_sync_session(self):
+        def query_return_values():
+            return {Foo.id: MockQuery(all_=[1], latency=0.01)}
+
+        session = AsyncMockDbSession(query_return_values(),
+                                     default_latency=0.001)
+        self.assertEqual([1], run(session.scalars(select(Foo.id))).all())
+        self.assertEqual([1], run(collect(run(
+            session.stream_scalars(select(Foo.id))))))
+        sync_session = MockDbSession(query_return_values(), sleep=False,
+                                     default_latency=0.001)
+        sync_session.scalars(select(Foo.id)).all()
+        sync_session.query(Foo.id).all()
+        self.assertAlmostEqual(0.02, session.db_time)
+        self.assertAlmostEqual(0.02, sync_session.db_time)
+
+    def test_concurrent_queries_overlap(self):
+        session = AsyncMockDbSession({Foo.id: [1], Foo.number: [2]},
+                                     default_latency=0.05)
+
+        async def fan_out():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            results = await asyncio.gather(
+                session.scalars(select(Foo.id)),
+                session.scalars(select(Foo.number)),
+                session.scalar(select(Foo.id)))
+            return [r.all() for r in results[:2]], loop.time() - start
+
+        values, elapsed = run(fan_out())
+        self.assertEqual([[1], [2]], values)
+        self.assertEqual(3, session.max_in_flight)
+        self.assertAlmostEqual(0.15, session.db_time)
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(3, len(session.intervals))
+
+    def test_queries_recorded(self):
+        session = AsyncMockDbSession(record_queries=True)
+
+        async def loop_queries():
+            for i in range(3):
+                await session.execute(select(Foo).where(Foo.id == i))
+
+        run(loop_queries())
+        with self.assertRaises(AssertionError):
+            session.assert_no_n_plus_one()
+
+    def test_add_get_and_commit(self):
+        session = AsyncMockDbSession()
+        record = Foo(number=1)
+        session.add(record)
+        run(session.commit())
+        self.assertTrue(session.commit_called)
+        self.assertIs(record, run(session.get(Foo, 1)))
+        run(session.delete(record))
+        self.assertIsNone(run(session.get(Foo, 1)))
@@ -0,0 +1,102 @@
+import unittest
+
+from sqlalchemy import Column, Integer, String, and_, func, not_, or_
+from sqlalchemy.ext.declarative import declarative_base
+
+from pyrasatest import evaluate
+from pyrasatest.evaluate import compile_expression, like_regex, sort_rows
+from pyrasatest.mock_model import MockModel
+
+Base = declarative_base()
+
+
+class Foo(Base):
+    __tablename__ = 'foo'
+    id = Column(Integer, primary_key=True)
+    number = Column('num', Integer)
+    name = Column(String)
+
+
+class Bar(Base):
+    __tablename__ = 'bar'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class EvaluateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.row = MockModel(id=3, number=10, name='Abc')
+
+    def assert_evaluates(self, expected, expression, row=None):
+        self.assertEqual(expected, compile_expression(expression)(
+            row or self.row))
+
+    def test_comparison_operators(self):
+        self.assert_evaluates(True, Foo.id == 3)
+        self.assert_evaluates(False, Foo.id != 3)
+        self.assert_evaluates(True, Foo.number > 5)
+        self.assert_evaluates(False, Foo.number <= 5)
+        self.assert_evaluates(True, Foo.number + 1 == 11)
+        self.assert_evaluates(True, Foo.id.between(1, 3))
+
+    def test_null_comparisons(self):
+        row = MockModel(id=None, number=None, name=None)
+        self.assert_evaluates(None, Foo.id == 3, row)
+        self.assert_evaluates(True, Foo.id.is_(None), row)
+        self.assert_evaluates(True, Foo.id == None, row)  # noqa: E711
+        self.assert_evaluates(False, Foo.id.isnot(None), row)
+
+    def test_in_and_like_operators(self):
+        self.assert_evaluates(True, Foo.id.in_([1, 2, 3]))
+        self.assert_evaluates(True, Foo.id.notin_([1, 2]))
+        self.assert_evaluates(True, Foo.name.like('A%'))
+        self.assert_evaluates(False, Foo.name.like('a%'))
+        self.assert_evaluates(True, Foo.name.ilike('a_c'))
+        self.assert_evaluates(True, Foo.name.contains('b'))
+        self.assert_evaluates(True, Foo.name.startswith('Ab'))
+
+    def test_boolean_clauses(self):
+        self.assert_evaluates(True, and_(Foo.id == 3, Foo.number == 10))
+        self.assert_evaluates(False, and_(Foo.id == 3, Foo.number == 1))
+        self.assert_evaluates(True, or_(Foo.id == 1, Foo.number == 10))
+        self.assert_evaluates(False, not_(Foo.name.like('A%')))
+        self.assert_evaluates(True, ~and_(Foo.id == 3, Foo.number == 1))
+
+    def test_functions(self):
+        self.assert_evaluates(True, func.lower(Foo.name) == 'abc')
+        self.assert_evaluates(5, func.coalesce(None, 5))
+
+    def test_unsupported_expression_raises(self):
+        with self.assertRaises(NotImplementedError):
+            compile_expression(func.some_db_function(Foo.id) == 1)
+
+    def test_columns_of_other_tables_raise(self):
+        tables = frozenset([Foo.__table__])
+        self.assertTrue(compile_expression(Foo.name == 'Abc', tables)(
+            self.row))
+        for expression in [Bar.name == 'Abc', Foo.id == Bar.id]:
+            with self.assertRaises(NotImplementedError):
+                compile_expression(expression, tables)
+            compile_expression(expression)
+        with self.assertRaises(NotImplementedError):
+            sort_rows([self.row], [Bar.name], tables)
+
+    def test_compiled_expression_cached_by_shape(self):
+        evaluate._compiled_cache.clear()
+        self.assert_evaluates(True, Foo.id == 3)
+        self.assert_evaluates(False, Foo.id == 4)
+        self.assert_evaluates(True, Foo.id.in_([3]))
+        self.assert_evaluates(False, Foo.id.in_([1, 2]))
+        self.assertEqual(2, len(evaluate._compiled_cache))
+
+    def test_like_regex(self):
+        self.assertTrue(like_regex('a.%').match('a.bc'))
+        self.assertFalse(like_regex('a.%').match('abc'))
+
+    def test_sort_rows(self):
+        rows = [MockModel(id=1, number=2), MockModel(id=2, number=None),
+                MockModel(id=3, number=1), MockModel(id=4, number=2)]
+        self.assertEqual([3, 1, 4, 2], [
+            r.id for r in sort_rows(rows, [Foo.number, Foo.id])])
+        self.assertEqual([2, 1, 4, 3], [
+            r.id for r in sort_rows(rows, [Foo.number.desc(), 'id'])])
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import pyrasatest
+
+
+class PackageInitTestCase(unittest.TestCase):
+    def test_public_names_are_importable(self):
+        for name in pyrasatest.__all__:
+            self.assertEqual(name, getattr(pyrasatest, name).__name__)
+        self.assertTrue(set(pyrasatest.__all__) <= set(dir(pyrasatest)))
+
+    def test_unknown_attribute_raises_attribute_error(self):
+        with self.assertRaises(AttributeError):
+            getattr(pyrasatest, 'NotMockModel')
+
+    def test_mock_model_import_does_not_import_sqlalchemy_or_pyramid(self):
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys; from pyrasatest import MockModel; '
+            'print(sorted({"sqlalchemy", "pyramid"} & set(sys.modules)))'
+        ], cwd=os.path.dirname(os.path.dirname(pyrasatest.__file__)),
+            universal_newlines=True)
+        self.assertEqual('[]', output.strip())
@@ -0,0 +1,87 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from pyrasatest.latency import DbClock, LatencyModel, TimedQuery
+from pyrasatest.mock_db_session import MockDbSession
+from pyrasatest.mock_query import MockQuery
+
+
+class LatencyModelTestCase(unittest.TestCase):
+    def test_latency_fixed_and_per_row(self):
+        model = LatencyModel(fixed=0.01, per_row=0.001)
+        self.assertAlmostEqual(0.01, model.latency())
+        self.assertAlmostEqual(0.02, model.latency(10))
+
+    def test_latency_distributions_seeded(self):
+        for factory, args in [(LatencyModel.normal, (0.01, 0.002)),
+                              (LatencyModel.uniform, (0.01, 0.02))]:
+            model_1, model_2 = [factory(*args, seed=1) for _ in range(2)]
+            values = [model_1.latency() for _ in range(5)]
+            self.assertEqual(values, [model_2.latency() for _ in range(5)])
+            self.assertTrue(all(v >= 0 for v in values))
+
+
+class DbClockTestCase(unittest.TestCase):
+    def test_advance_and_reset(self):
+        clock = DbClock()
+        start = clock.time()
+        clock.advance(0.5, 'foo')
+        clock.advance(0.25, 'foo', new_query=False)
+        self.assertEqual(0.75, clock.elapsed)
+        self.assertEqual(start + 0.75, clock.time())
+        self.assertEqual({'foo': (1, 0.75)}, clock.by_key)
+        clock.reset()
+        self.assertEqual((0.0, {}), (clock.elapsed, clock.by_key))
+
+    def test_advance_from_threads(self):
+        clock = DbClock(thread_safe=True)
+        threads = [threading.Thread(target=lambda: [
+            clock.advance(1, 'foo') for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4000, clock.elapsed)
+        self.assertEqual({'foo': (4000, 4000)}, clock.by_key)
+
+    @patch('pyrasatest.latency.time.sleep')
+    def test_advance_sleeps_when_set(self, sleep_patch):
+        DbClock(sleep=True).advance(0.5)
+        sleep_patch.assert_called_with(0.5)
+
+
+class MockDbSessionLatencyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock_query = MockQuery(all_=[1, 2, 3], first_=1)
+        self.mock_db_session = MockDbSession(
+            query_return_values={'foo': self.mock_query, 'bar': 'baz'},
+            latency={'foo': LatencyModel(fixed=1.0, per_row=0.5)},
+            default_latency=0.25
+        )
+
+    def test_latency_charged_on_query_execution(self):
+        query = self.mock_db_session.query('foo').filter('x')
+        self.assertIsInstance(query, TimedQuery)
+        self.assertEqual(0.0, self.mock_db_session.db_time)
+        self.assertEqual([1, 2, 3], query.all())
+        self.assertEqual(2.5, self.mock_db_session.db_time)
+        self.assertEqual(1, self.mock_db_session.query('foo').first())
+        self.assertEqual(4.0, self.mock_db_session.db_time)
+
+    def test_latency_charged_on_iteration(self):
+        self.assertEqual([1, 2, 3], list(self.mock_db_session.query('foo')))
+        self.assertEqual({'foo': (1, 2.5)}, self.mock_db_session.clock.by_key)
+
+    def test_default_and_mock_query_latency(self):
+        self.mock_db_session.query('bar').one()
+        self.assertEqual(0.25, self.mock_db_session.db_time)
+        self.mock_db_session.query_return_values['qux'] = MockQuery(
+            latency=2.0)
+        self.mock_db_session.query('qux').count()
+        self.assertEqual(2.25, self.mock_db_session.db_time)
+
+    def test_latency_disabled_by_default(self):
+        mock_db_session = MockDbSession()
+        self.assertIsNone(mock_db_session.clock)
+        self.assertEqual(0.0, mock_db_session.db_time)
@@ -0,0 +1,91 @@
+import os
+import tracemalloc
+import unittest
+
+from pyrasatest.memory_report import (
+    MemoryTracker, creation_site, object_size, track_memory
+)
+from pyrasatest.mock_model import MockModel
+from pyrasatest.mock_pyramid_objects import MockRequest
+
+
+def _run(test_class) -> unittest.TestResult:
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(test_class)
+    result = unittest.TestResult()
+    suite.run(result)
+    return result
+
+
+class MemoryTrackerTestCase(unittest.TestCase):
+
+    def test_survivors_held_by_test_case(self):
+        tracker = MemoryTracker()
+
+        class Tests(unittest.TestCase):
+            def setUp(self):
+                track_memory(self, tracker)
+
+            def test_leak(self):
+                self.request = MockRequest()
+                self.request.dbsession.add(MockModel(id=1, data=[0] * 1000))
+
+            def test_no_leak(self):
+                request = MockRequest()
+                request.dbsession.add(MockModel(id=1))
+
+        self.assertTrue(_run(Tests).wasSuccessful())
+        leak, no_leak = tracker.reports
+        self.assertEqual([], no_leak.survivors)
+        groups = {group.type_name: group for group in leak.survivors}
+        self.assertEqual({'request'}, groups['MockModel'].held_by)
+        self.assertEqual({'request'}, groups['MockRequest'].held_by)
+        self.assertEqual(os.path.abspath(__file__),
+                         os.path.abspath(groups['MockRequest'].site[0]))
+        self.assertGreater(groups['MockModel'].size, 8000)
+        self.assertGreater(leak.retained, 8000)
+        self.assertGreaterEqual(leak.allocated, leak.retained)
+        self.assertIn('test_leak', tracker.summary())
+        self.assertNotIn('test_no_leak', tracker.summary())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_guards_fail_test(self):
+        class Tests(unittest.TestCase):
+            def tearDown(self):
+                self.__dict__.pop('request', None)
+
+            def test_leak(self):
+                track_memory(self, allow_survivors=False)
+                self.row = MockModel.schema('id')(1)
+
+            def test_max_retained(self):
+                track_memory(self, max_retained=1000)
+                self.data = [MockModel(id=1)] * 10000
+
+            def test_cleaned_up_before_report(self):
+                track_memory(self, allow_survivors=False)
+                self.request = MockRequest()
+                self.request.dbsession.add(MockModel(id=1))
+
+        result = _run(Tests)
+        failures = {test.id().rsplit('.', 1)[1]: traceback
+                    for test, traceback in result.failures}
+        self.assertEqual({'test_leak', 'test_max_retained'}, set(failures))
+        self.assertIn('MockRow x1', failures['test_leak'])
+
+    def test_creation_site_and_size(self):
+        row_class = MockModel.schema('id', 'data')
+        tracemalloc.start(10)
+        try:
+            row = row_class(1, [0] * 100)
+            line = creation_site(row)[1]
+        finally:
+            tracemalloc.stop()
+        with open(__file__) as f:
+            self.assertIn('row_class(1, [0] * 100)', f.readlines()[line - 1])
+        self.assertIsNone(creation_site(row))
+        seen = set()
+        self.assertGreater(object_size(row, seen), 800)
+        # Objects and containers are only counted once
+        self.assertEqual(0, object_size(row, seen))
+        model = MockModel(id=1, data=[0] * 100)
+        self.assertGreater(object_size(model, set()), 800)
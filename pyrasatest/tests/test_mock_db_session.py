@@ -1,13 +1,18 @@
+import threading
 import unittest
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from unittest.mock import patch
 
-from sqlalchemy import Column, Integer
+from sqlalchemy import Column, Integer, select, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import as_declarative
 
 from pyrasatest.mock_db_session import MockDbSession, PartialMockDbSession
+from pyrasatest.mock_model import MockModel
 from pyrasatest.mock_query import MockQuery
+from pyrasatest import query_keys
 
 
 @as_declarative()
@@ -20,6 +25,11 @@ class TestModel(Base):
     number = Column(Integer)
 
 
+class OtherModel(Base):
+    __tablename__ = 'other'
+    number = Column(Integer)
+
+
 class MockDbSessionTestCase(unittest.TestCase):
     def setUp(self):
         self.mock_db_session = MockDbSession()
@@ -83,6 +93,112 @@ class MockDbSessionTestCase(unittest.TestCase):
             self.mock_db_session.check_for_raise_condition(TestModel.number)
         )
 
+    def test_query_raises_after_query_return_values_reassigned(self):
+        mock_db_session = MockDbSession(query_return_values={'a': 1})
+        mock_db_session.query(TestModel)
+        mock_db_session.query_return_values = {TestModel: ValueError}
+        with self.assertRaises(ValueError):
+            mock_db_session.query(TestModel)
+
+    def test_query_raises_after_query_return_values_modified_in_place(self):
+        self.mock_db_session.query_return_values[TestModel.number] = KeyError
+        with self.assertRaises(KeyError):
+            self.mock_db_session.query(TestModel.number)
+        del self.mock_db_session.query_return_values[TestModel.number]
+        self.assertIsInstance(self.mock_db_session.query(TestModel.number),
+                              MockQuery)
+
+    def test_query_label_key_set_after_construction(self):
+        label = TestModel.number.label('num')
+        self.mock_db_session.query_return_values = {label: 5}
+        self.assertEqual(5, self.mock_db_session.query(label).one())
+
+    def test_register_table_includes_added_records(self):
+        self.mock_db_session.register_table(TestModel, [TestModel(id=1)],
+                                            indexes=['id'])
+        record = TestModel(id=2, number=5)
+        self.mock_db_session.add(record)
+        self.assertEqual(record, self.mock_db_session.query(TestModel).filter(
+            TestModel.id == 2).one())
+        self.assertEqual(2, self.mock_db_session.query(TestModel).count())
+
+    def test_table_filter_on_joined_entity_raises(self):
+        self.mock_db_session.register_table(TestModel, [TestModel(id=1)])
+        query = self.mock_db_session.query(TestModel).join(
+            OtherModel, OtherModel.id == TestModel.id)
+        self.assertEqual(1, query.filter(TestModel.id == 1).count())
+        with self.assertRaises(NotImplementedError):
+            query.filter(OtherModel.id == 1)
+        with self.assertRaises(NotImplementedError):
+            self.mock_db_session.execute(select(TestModel).join(
+                OtherModel, OtherModel.id == TestModel.id).where(
+                    OtherModel.number == 1))
+
+    def test_added_records_visible_to_queries_and_get(self):
+        record = TestModel(id=1, number=5)
+        self.mock_db_session.add(record)
+        self.assertIs(record, self.mock_db_session.get(TestModel, 1))
+        self.assertIs(record, self.mock_db_session.get(TestModel, (1, )))
+        self.assertIs(record, self.mock_db_session.get(TestModel, {'id': 1}))
+        self.assertIsNone(self.mock_db_session.get(TestModel, 2))
+        self.assertEqual([record],
+                         self.mock_db_session.query(TestModel).all())
+
+    def test_added_records_do_not_override_query_return_values(self):
+        self.mock_db_session.add(TestModel(id=1))
+        self.mock_db_session.query_return_values = {TestModel: 'foo'}
+        self.assertEqual('foo', self.mock_db_session.query(TestModel).one())
+        self.mock_db_session.query_return_values = {}
+        self.mock_db_session.return_value = MockQuery(first_='bar')
+        self.assertEqual('bar', self.mock_db_session.query(TestModel).first())
+
+    def test_add_all_and_bulk_save_objects(self):
+        records = [TestModel(id=i) for i in range(1, 4)]
+        self.mock_db_session.add_all(records[:2])
+        self.mock_db_session.bulk_save_objects(records[2:])
+        self.assertEqual(records, self.mock_db_session.added_records)
+        self.assertEqual(records, self.mock_db_session.query(TestModel).filter(
+            TestModel.id > 0).all())
+        self.assertIs(records[2], self.mock_db_session.get(TestModel, 3))
+
+    def test_bulk_insert_mappings(self):
+        self.mock_db_session.bulk_insert_mappings(
+            TestModel, [{'id': 1, 'number': 5}, {'id': 2, 'number': 6}])
+        self.assertEqual(6, self.mock_db_session.get(TestModel, 2).number)
+        self.assertEqual(1, self.mock_db_session.query(TestModel).filter_by(
+            number=5).one().id)
+
+    def test_flush_assigns_primary_keys(self):
+        self.mock_db_session.add(TestModel(id=4))
+        records = [TestModel(number=i) for i in range(2)]
+        self.mock_db_session.add_all(records)
+        self.mock_db_session.flush()
+        self.assertTrue(self.mock_db_session.flush_called)
+        self.assertEqual([5, 6], [record.id for record in records])
+        self.assertIs(records[1], self.mock_db_session.get(TestModel, 6))
+
+    def test_flush_raises_when_set(self):
+        with self.assertRaises(SQLAlchemyError):
+            MockDbSession(raise_exception=True).flush()
+
+    def test_merge(self):
+        record = TestModel(id=1, number=5)
+        self.assertIs(record, self.mock_db_session.merge(record))
+        merged = self.mock_db_session.merge(TestModel(id=1, number=6))
+        self.assertIs(record, merged)
+        self.assertEqual(6, record.number)
+
+    def test_delete(self):
+        record = TestModel(id=1)
+        self.mock_db_session.register_table(TestModel, [record],
+                                            indexes=['id'])
+        self.assertIs(record, self.mock_db_session.get(TestModel, 1))
+        self.mock_db_session.delete(record)
+        self.assertEqual([record], self.mock_db_session.deleted_records)
+        self.assertIsNone(self.mock_db_session.get(TestModel, 1))
+        self.assertEqual([], self.mock_db_session.query(TestModel).filter(
+            TestModel.id == 1).all())
+
     def test_partial_mock_db_session_returns_unmock_query_call(self):
         mock_scoped_session = namedtuple('mock_scoped_session',
                                          'query')(lambda x: 'ss_called')
@@ -96,3 +212,244 @@ class MockDbSessionTestCase(unittest.TestCase):
                                         dbsession='no query attribute')
         self.assertEqual(type(self.mock_db_session.query('y')),
                          type(instance.query('y')))
+
+
+class MockDbSessionExecuteTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock_db_session = MockDbSession()
+        self.records = [TestModel(id=i, number=i % 3) for i in range(1, 11)]
+
+    def test_execute_select_of_registered_table(self):
+        self.mock_db_session.register_table(TestModel, self.records,
+                                            indexes=['id'])
+        stmt = select(TestModel).where(TestModel.number == 1).order_by(
+            TestModel.id.desc()).offset(1).limit(2)
+        self.assertEqual([self.records[6], self.records[3]],
+                         self.mock_db_session.scalars(stmt).all())
+        self.assertIs(self.records[4], self.mock_db_session.scalar(
+            select(TestModel).where(TestModel.id == 5)))
+        self.assertEqual([(self.records[0], )], self.mock_db_session.execute(
+            select(TestModel).limit(1)).all())
+
+    def test_execute_partitions(self):
+        self.mock_db_session.add_all(self.records)
+        result = self.mock_db_session.execute(select(TestModel))
+        self.assertEqual([4, 4, 2], [len(partition) for partition
+                                     in result.scalars().partitions(4)])
+
+    def test_execute_query_return_values(self):
+        label = TestModel.number.label('num')
+        self.mock_db_session.query_return_values = {
+            TestModel.id: [1, 2], label: 5, TestModel: ValueError}
+        self.assertEqual([1, 2], self.mock_db_session.scalars(
+            select(TestModel.id)).all())
+        self.assertEqual(5, self.mock_db_session.scalar(
+            select(TestModel.number.label('num'))))
+        with self.assertRaises(ValueError):
+            self.mock_db_session.execute(select(TestModel))
+
+    def test_execute_multiple_columns(self):
+        self.mock_db_session.query_return_values = {
+            TestModel.id: [(1, 5), (2, 6)]}
+        result = self.mock_db_session.execute(
+            select(TestModel.id, TestModel.number))
+        self.assertEqual([(1, 5), (2, 6)], result.all())
+
+    def test_execute_no_return_value(self):
+        self.assertEqual([], self.mock_db_session.scalars(
+            select(TestModel)).all())
+
+    def test_execute_other_statement(self):
+        stmt = update(TestModel).values(number=1)
+        self.assertEqual(0, self.mock_db_session.execute(stmt).rowcount)
+        self.assertEqual([(stmt, None)],
+                         self.mock_db_session.executed_statements)
+
+    def test_statement_key_cached(self):
+        query_keys._statement_key_cache.clear()
+        query_keys._columns_key_cache.clear()
+        stmt = select(TestModel.id)
+        for i in range(3):
+            self.mock_db_session.execute(stmt)
+            self.mock_db_session.execute(
+                select(TestModel.id).where(TestModel.id == i))
+        # Statements selecting the same elements share a cache entry
+        self.assertEqual(1, len(query_keys._columns_key_cache))
+        self.assertEqual(4, len(query_keys._statement_key_cache))
+
+    def test_execute_recorded(self):
+        mock_db_session = MockDbSession(record_queries=True)
+        for i in range(3):
+            mock_db_session.execute(
+                select(TestModel).where(TestModel.id == i)).all()
+        with self.assertRaises(AssertionError):
+            mock_db_session.assert_no_n_plus_one()
+
+    def test_query_assertions_require_recording(self):
+        for assertion in [partial(self.mock_db_session.assert_max_queries, 1),
+                          self.mock_db_session.assert_no_n_plus_one]:
+            with self.assertRaisesRegex(RuntimeError, 'record_queries'):
+                assertion()
+
+    def test_partial_mock_db_session_execute(self):
+        dbsession = namedtuple('dbsession', 'execute')(
+            lambda *args: 'executed')
+        instance = PartialMockDbSession(
+            query_return_values={TestModel.id: [1]}, dbsession=dbsession)
+        self.assertEqual([1], instance.scalars(select(TestModel.id)).all())
+        self.assertEqual('executed', instance.execute(select(TestModel)))
+
+
+class ThreadSafeMockDbSessionTestCase(unittest.TestCase):
+    def test_concurrent_adds(self):
+        session = MockDbSession(thread_safe=True)
+
+        def add_records(start):
+            for i in range(start, start + 100):
+                session.add(TestModel(number=i))
+            session.flush()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(add_records, range(0, 800, 100)))
+        self.assertEqual(800, len(session.added_records))
+        self.assertEqual(800, session.query(TestModel).count())
+        self.assertEqual(set(range(1, 801)), {
+            record.id for record in session.added_records})
+
+    def test_side_effect_consumed_per_thread(self):
+        session = MockDbSession(thread_safe=True, cycle_side_effect=True)
+        session.side_effect = [MockQuery(first_=1), MockQuery(first_=2)]
+        barrier = threading.Barrier(4)
+
+        def view():
+            barrier.wait()
+            return [session.query(TestModel).first() for _ in range(4)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = [executor.submit(view) for _ in range(4)]
+        self.assertEqual([[1, 2, 1, 2]] * 4, [r.result() for r in results])
+        self.assertEqual(16, session.query_call_count)
+
+    def test_side_effect_exhausted_per_thread(self):
+        for thread_safe in [False, True]:
+            session = MockDbSession(thread_safe=thread_safe)
+            session.side_effect = [MockQuery(first_=1)]
+            session.query(TestModel).first()
+            with self.assertRaises(IndexError):
+                session.query(TestModel)
+
+        session = MockDbSession(cycle_side_effect=True)
+        session.side_effect = [MockQuery(first_=1), MockQuery(first_=2)]
+        self.assertEqual([1, 2, 1], [session.query(TestModel).first()
+                                     for _ in range(3)])
+
+    def test_latency_accumulated_from_threads(self):
+        session = MockDbSession({TestModel: MockQuery(first_=1)},
+                                thread_safe=True, default_latency=0.001)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: session.query(TestModel).first(),
+                              range(1000)))
+        self.assertAlmostEqual(1.0, session.db_time)
+        self.assertEqual(1000, session.clock.by_key[TestModel][0])
+
+
+class ForkMockDbSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.model = MockModel(name='a')
+        self.records = [TestModel(id=i, number=i) for i in range(1, 4)]
+        self.base = MockDbSession({'model': self.model,
+                                   'query': MockQuery(first_=self.model)})
+        self.base.register_table(TestModel, self.records, indexes=['id'])
+        self.fork = self.base.fork()
+
+    def test_base_frozen(self):
+        with self.assertRaises(RuntimeError):
+            self.base.add(TestModel(id=9))
+        with self.assertRaises(RuntimeError):
+            self.base.query_return_values['x'] = 1
+        with self.assertRaises(RuntimeError):
+            self.base.query_return_values = {}
+        self.assertEqual(3, self.base.query(TestModel).count())
+
+    def test_query_return_values_copied_on_access(self):
+        model = self.fork.query('model').one()
+        self.assertIsNot(self.model, model)
+        model.save()
+        self.assertFalse(self.model.save_called)
+        self.assertIs(model, self.fork.query('query').first())
+        self.assertIs(model, self.fork.query('model').one())
+
+    def test_tuple_rows_copied_on_access(self):
+        Row = namedtuple('Row', ['id', 'model'])
+        base = MockDbSession({'rows': [Row(1, self.model)],
+                              'pair': (self.model, 2)})
+        fork = base.fork()
+        row, = fork.query('rows').all()
+        self.assertEqual(Row, type(row))
+        self.assertEqual(1, row.id)
+        self.assertIsNot(self.model, row.model)
+        self.assertIsNot(self.model, fork.query('pair').all()[0])
+
+    def test_query_return_values_set_and_deleted(self):
+        self.fork.query_return_values['x'] = 1
+        del self.fork.query_return_values['model']
+        self.assertEqual(1, self.fork.query('x').one())
+        self.assertNotIn('model', self.fork.query_return_values)
+        self.assertNotIn('x', self.base.query_return_values)
+        self.assertIs(self.model, self.base.query('model').one())
+
+    def test_add_delete_and_merge(self):
+        record = TestModel(id=4)
+        self.fork.add(record)
+        self.fork.delete(self.records[0])
+        merged = self.fork.merge(TestModel(id=2, number=20))
+        self.assertEqual([2, 3, 4], sorted(
+            r.id for r in self.fork.query(TestModel).all()))
+        self.assertEqual(20, self.fork.get(TestModel, 2).number)
+        self.assertIs(merged, self.fork.query(TestModel).filter(
+            TestModel.number == 20).one())
+        self.assertIsNone(self.fork.get(TestModel, 1))
+        self.assertEqual([record, merged], self.fork.added_records)
+        # The base session and its rows are unchanged
+        self.assertEqual(2, self.records[1].number)
+        self.assertEqual(self.records, self.base.query(TestModel).all())
+        self.assertIs(self.records[0], self.base.get(TestModel, 1))
+        self.assertIsNone(self.base.get(TestModel, 4))
+        self.assertEqual([], self.base.added_records)
+
+    def test_flush_continues_base_primary_keys(self):
+        record = TestModel(number=5)
+        self.fork.add(record)
+        self.fork.flush()
+        self.assertEqual(4, record.id)
+        self.assertIs(record, self.fork.get(TestModel, 4))
+
+    def test_discard(self):
+        self.fork.add(TestModel(id=4))
+        self.fork.query('model').one().save()
+        self.fork.commit()
+        self.fork.discard()
+        self.assertEqual(3, self.fork.query(TestModel).count())
+        self.assertFalse(self.fork.query('model').one().save_called)
+        self.assertFalse(self.fork.commit_called)
+        self.assertEqual([], self.fork.added_records)
+
+    def test_forks_are_independent(self):
+        other = self.base.fork()
+        self.fork.add(TestModel(id=4))
+        self.assertEqual(3, other.query(TestModel).count())
+        self.assertIsNot(self.fork.query('model').one(),
+                         other.query('model').one())
+
+    def test_fork_of_fork(self):
+        self.fork.add(TestModel(id=4))
+        child = self.fork.fork()
+        child.delete(child.get(TestModel, 4))
+        self.assertEqual(3, child.query(TestModel).count())
+        self.assertEqual(4, self.fork.query(TestModel).count())
+        with self.assertRaises(RuntimeError):
+            self.fork.add(TestModel(id=5))
+
+    def test_discard_requires_fork(self):
+        with self.assertRaises(RuntimeError):
+            self.base.discard()
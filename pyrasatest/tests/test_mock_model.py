@@ -1,6 +1,7 @@
+import copy
 import unittest
 
-from pyrasatest.mock_model import LazyAttrMockModel, MockModel
+from pyrasatest.mock_model import LazyAttrMockModel, MockModel, MockRow
 
 
 class MockModelTestCase(unittest.TestCase):
@@ -44,3 +45,92 @@ class MockModelTestCase(unittest.TestCase):
 
     def test_lazy_attr_mock_model_not_raises_attribute_error(self):
         self.assertIsNone(LazyAttrMockModel().attr_not_exist)
+
+    def test_lazy_attr_mock_model_copy(self):
+        model = LazyAttrMockModel(name='a')
+        copied = copy.copy(model)
+        copied.save()
+        self.assertEqual('a', copied.name)
+        self.assertFalse(model.save_called)
+        self.assertIsNone(copy.deepcopy(model).attr_not_exist)
+
+
+class MockModelSchemaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.row_class = MockModel.schema('id', 'name', 'len_value')
+
+    def test_schema_row_class_is_cached(self):
+        self.assertIs(self.row_class,
+                      MockModel.schema('id', 'name', 'len_value'))
+        self.assertTrue(issubclass(self.row_class, MockRow))
+
+    def test_schema_row_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.row_class(1), '__dict__'))
+
+    def test_schema_row_attribute_and_positional_access(self):
+        row = self.row_class(1, name='Abc')
+        self.assertEqual(1, row.id)
+        self.assertEqual('Abc', row[1])
+        self.assertEqual([1, 'Abc'], row[:2])
+        with self.assertRaises(AttributeError):
+            getattr(row, 'foo')
+
+    def test_schema_row_make(self):
+        row = self.row_class._make(1, 'Abc', 3)
+        self.assertEqual({'id': 1, 'name': 'Abc', 'len_value': 3},
+                         row.to_dict())
+        self.assertEqual(3, len(row))
+        self.assertFalse(row.save_called)
+        self.assertIsNone(row._result_items)
+
+    def test_schema_row_set_result_items(self):
+        row = self.row_class(1)
+        row.set_result_items(['foo', 'bar'])
+        self.assertEqual('bar', row[1])
+
+    def test_schema_row_len(self):
+        self.assertEqual(3, len(self.row_class(1)))
+        self.assertEqual(5, len(self.row_class(1, len_value=5)))
+
+    def test_schema_row_to_dict(self):
+        row = self.row_class(1, name='Abc')
+        self.assertEqual({'id': 1, 'name': 'Abc'}, row.to_dict())
+        self.assertEqual({'id': 1}, row.to_dict(exclude=['name']))
+
+    def test_schema_row_save_and_delete_methods(self):
+        row = self.row_class()
+        for mtd in ['save', 'delete']:
+            self.assertFalse(getattr(row, f'{mtd}_called'))
+            getattr(row, mtd)()
+            self.assertTrue(getattr(row, f'{mtd}_called'))
+
+    def test_schema_row_len_value_not_a_field(self):
+        row = MockModel.schema('id')(1)
+        row.len_value = 3
+        self.assertEqual(3, len(row))
+        self.assertEqual({'id': 1}, row.to_dict())
+        with self.assertRaises(AttributeError):
+            row.other = 1
+
+    def test_schema_fields_cannot_shadow_row_attributes(self):
+        for field in ['save', 'delete', 'to_dict', 'save_called',
+                      'init_kwargs']:
+            with self.assertRaises(ValueError):
+                MockModel.schema('id', field)
+
+    def test_schema_keyword_fields(self):
+        row_class = MockModel.schema('id', 'from')
+        for row in [row_class._make(1, 'a'), row_class(1, 'a'),
+                    row_class(id=1, **{'from': 'a'})]:
+            self.assertEqual('a', getattr(row, 'from'))
+            self.assertEqual({'id': 1, 'from': 'a'}, row.to_dict())
+        with self.assertRaises(TypeError):
+            row_class._make(1)
+        with self.assertRaises(ValueError):
+            MockModel.schema('id', 'count(*)')
+
+    def test_lazy_attr_schema_row_not_raises_attribute_error(self):
+        row = LazyAttrMockModel.schema('id')()
+        self.assertIsNone(row.id)
+        self.assertIsNone(row.attr_not_exist)
+        self.assertIsNone(copy.copy(row).attr_not_exist)
@@ -1,8 +1,10 @@
 import unittest
 
-from pyrasatest.mock_db_session import MockDbSession
+from pyrasatest.async_mock_db_session import AsyncMockDbSession
+from pyrasatest.mock_db_session import MockDbSession, PartialMockDbSession
+from pyrasatest.mock_query import MockQuery
 from pyrasatest.mock_pyramid_objects import (
-    DummyTmplContext, MockRequest, MockSession
+    DummyTmplContext, MockRequest, MockRequestPool, MockSession
 )
 
 
@@ -24,6 +26,89 @@ class MockPyramidObjectsTestCase(unittest.TestCase):
             self.assertEqual(getattr(mock_req, f'mock_{mtd}'),
                              getattr(mock_req, mtd)('', foo='bar'))
 
+    def test_mock_request_reset(self):
+        mock_req = MockRequest(params={'a': 1}, headers={'X-Foo': 'bar'})
+        mock_req.params['b'] = 2
+        mock_req.headers['X-Foo'] = 'baz'
+        mock_req.session['user'] = 'abc'
+        mock_req.dbsession.add('record')
+        mock_req.tmpl_context.set_data({'foo': 'bar'})
+        mock_req.user = 'abc'
+        mock_req.reset()
+        self.assertEqual({'a': 1}, mock_req.params)
+        self.assertIs(mock_req.params, mock_req.GET)
+        self.assertEqual({'X-Foo': 'bar'}, mock_req.headers)
+        self.assertNotIn('user', mock_req.session)
+        self.assertEqual([], mock_req.dbsession.added_records)
+        self.assertFalse(hasattr(mock_req.tmpl_context, 'foo'))
+        self.assertFalse(hasattr(mock_req, 'user'))
+        mock_req.reset()
+        self.assertEqual({'a': 1}, mock_req.params)
+
+    def test_mock_request_reset_restores_class(self):
+        mock_req = MockRequest()
+        mock_req.set_property(lambda r: 'abc', 'user', reify=True)
+        self.assertEqual('abc', mock_req.user)
+        mock_req.reset()
+        self.assertIs(MockRequest, type(mock_req))
+        self.assertFalse(hasattr(mock_req, 'user'))
+
+    def test_mock_request_set_template(self):
+        mock_req = MockRequest()
+        mock_req.params['a'] = 1
+        mock_req.dbsession = MockDbSession(query_return_values={'foo': 1})
+        mock_req.set_template()
+        mock_req.set_template()
+        mock_req.params['b'] = 2
+        dbsession = mock_req.dbsession
+        mock_req.reset()
+        self.assertEqual({'a': 1}, mock_req.params)
+        self.assertEqual({'a': 1}, mock_req.GET)
+        self.assertIsNot(dbsession, mock_req.dbsession)
+        self.assertEqual({'foo': 1}, mock_req.dbsession.query_return_values)
+
+    def test_mock_request_reset_keeps_session_class_and_settings(self):
+        class Session:
+            def query(self, *args):
+                return 'unmocked'
+
+        sessions = [
+            PartialMockDbSession({'foo': 1}, Session()),
+            AsyncMockDbSession({'foo': 1}, thread_safe=True,
+                               default_latency=0.01, record_queries=True),
+        ]
+        for session in sessions:
+            session.side_effect = [MockQuery(first_=1), MockQuery(first_=2)]
+            mock_req = MockRequest()
+            mock_req.dbsession = session
+            mock_req.set_template()
+            for _ in range(2):
+                dbsession = mock_req.dbsession
+                self.assertIs(type(session), type(dbsession))
+                self.assertEqual(1, dbsession.query('foo').first())
+                self.assertEqual(2, dbsession.query('foo').first())
+                mock_req.reset()
+            if isinstance(session, PartialMockDbSession):
+                self.assertEqual('unmocked', dbsession.query('bar'))
+            else:
+                self.assertIsNotNone(dbsession._lock)
+                self.assertIsNotNone(dbsession.recorder)
+                self.assertAlmostEqual(0.02, dbsession.db_time)
+
+    def test_mock_request_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            getattr(MockRequest(), 'foo')
+
+    def test_mock_request_pool(self):
+        pool = MockRequestPool(params={'a': 1})
+        with pool.request() as mock_req:
+            mock_req.params['b'] = 2
+        self.assertEqual(1, len(pool))
+        with pool.request() as recycled_req:
+            self.assertIs(mock_req, recycled_req)
+            self.assertEqual({'a': 1}, recycled_req.params)
+            self.assertIsNot(mock_req, pool.acquire())
+
     def test_mock_session_save_method(self):
         session = MockSession()
         session.save()
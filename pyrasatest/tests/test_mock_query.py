@@ -1,7 +1,21 @@
+import threading
 import unittest
 
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
+
+from pyrasatest.mock_model import MockModel
 from pyrasatest.mock_query import MockQuery
 
+Base = declarative_base()
+
+
+class Foo(Base):
+    __tablename__ = 'foo'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
 
 class MockQueryTestCase(unittest.TestCase):
     def setUp(self):
@@ -13,8 +27,18 @@ class MockQueryTestCase(unittest.TestCase):
         self.assertTrue(hasattr(iterator, '__next__'))
         self.assertEqual([1, 2], list(iterator))
 
-    def test_iter_method_not_has_iter_vals_attr_returns_self(self):
-        self.assertEqual(self.mock_query, iter(self.mock_query))
+    def test_iter_method_not_has_iter_vals_attr_returns_new_iterator(self):
+        mock_query = MockQuery(all_=[1, 2])
+        iterator = iter(mock_query)
+        self.assertIsNot(iterator, iter(mock_query))
+        self.assertEqual([(1, 1), (1, 2), (2, 1), (2, 2)],
+                         [(a, b) for a in mock_query for b in mock_query])
+
+    def test_iter_method_with_lazy_sources(self):
+        mock_query = MockQuery(all_=lambda: (i for i in range(3)))
+        self.assertEqual([0, 1, 2], list(mock_query))
+        self.assertEqual([0, 1, 2], mock_query.all())
+        self.assertEqual([4], list(MockQuery(iter_vals=iter([4]))))
 
     def test_next_method_with_len_of_all_ge_iter_count(self):
         mock_query = MockQuery(all_=[1])
@@ -28,6 +52,18 @@ class MockQueryTestCase(unittest.TestCase):
             next(self.mock_query)
         self.assertEqual(0, self.mock_query.iter_count)
 
+    def test_next_method_iter_count_per_thread(self):
+        mock_query = MockQuery(all_=[1, 2])
+        self.assertEqual(1, next(mock_query))
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.extend([next(mock_query),
+                                           mock_query.iter_count]))
+        thread.start()
+        thread.join()
+        self.assertEqual([1, 1], results)
+        self.assertEqual(2, next(mock_query))
+
     def test_first_and_all_and_one_methods_with_attr_dot_get_truthy(self):
         self.mock_query.query_return_values = {'foo': 'bar'}
         self.mock_query.query_select = 'foo'
@@ -64,9 +100,23 @@ class MockQueryTestCase(unittest.TestCase):
 
     def test_union_method(self):
         mock_query_1 = MockQuery(all_=[1, 2])
-        self.assertEqual(mock_query_1,
-                         mock_query_1.union(MockQuery(all_=[3, 4])))
-        self.assertEqual([1, 2] + [3, 4], mock_query_1.all_)
+        union = mock_query_1.union(MockQuery(all_=[3, 4]),
+                                   MockQuery(all_=lambda: iter([5])))
+        self.assertEqual([1, 2, 3, 4, 5], union.all())
+        self.assertEqual([1, 2, 3, 4, 5], list(union))
+        self.assertEqual([1, 2], mock_query_1.all_)
+
+    def test_offset_and_slice_methods(self):
+        mock_query = MockQuery(all_=lambda: iter(range(10)))
+        self.assertEqual([2, 3, 4], list(mock_query.slice(2, 5)))
+        self.assertEqual([8, 9], mock_query.offset(8).all())
+        self.assertEqual([3, 4], mock_query.slice(2, 5).slice(1, 5).all())
+
+    def test_yield_per_and_partitions(self):
+        mock_query = MockQuery(all_=range(5)).yield_per(2)
+        self.assertEqual([[0, 1], [2, 3], [4]], list(mock_query.partitions()))
+        self.assertEqual([[0, 1, 2], [3, 4]],
+                         list(mock_query.partitions(3)))
 
     def test_filter_by_method(self):
         self.mock_query.filter_by(foo='bar')
@@ -76,3 +126,76 @@ class MockQueryTestCase(unittest.TestCase):
     def test_subquery_and_as_scalar_methods(self):
         for mtd in ['subquery', 'as_scalar']:
             self.assertEqual(self.mock_query, getattr(self.mock_query, mtd)())
+
+
+class EvaluatingMockQueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rows = [MockModel(id=i, name=name) for i, name in
+                     enumerate(['a', 'b', 'c', 'b'])]
+        self.mock_query = MockQuery(all_=self.rows, evaluate=True)
+
+    def test_filter_and_filter_by(self):
+        query = self.mock_query.filter(Foo.id > 0).filter_by(name='b')
+        self.assertEqual([self.rows[1], self.rows[3]], query.all())
+        self.assertEqual(2, query.count())
+        self.assertEqual(self.rows, self.mock_query.all())
+
+    def test_order_by_limit_and_offset(self):
+        query = self.mock_query.order_by(Foo.name.desc(), Foo.id)
+        self.assertEqual([2, 1, 3, 0], [r.id for r in query])
+        self.assertEqual([1, 3], [r.id for r in query.offset(1).limit(2)])
+        self.assertEqual([0, 1], [r.id for r in query.order_by(None).limit(2)])
+
+    def test_first(self):
+        self.assertEqual(self.rows[2],
+                         self.mock_query.filter(Foo.name == 'c').first())
+        self.assertIsNone(self.mock_query.filter(Foo.name == 'x').first())
+
+    def test_one(self):
+        self.assertEqual(self.rows[0],
+                         self.mock_query.filter(Foo.name == 'a').one())
+        with self.assertRaises(NoResultFound):
+            self.mock_query.filter(Foo.name == 'x').one()
+        with self.assertRaises(MultipleResultsFound):
+            self.mock_query.filter(Foo.name.in_(['a', 'b'])).one()
+
+    def test_indexed_filters(self):
+        mock_query = MockQuery(all_=self.rows, evaluate=True,
+                               indexes=['id', 'name'])
+        self.assertIsNone(mock_query.indexes['name'])
+        self.assertEqual([self.rows[1], self.rows[3]],
+                         mock_query.filter_by(name='b').all())
+        self.assertEqual({'a': [0], 'b': [1, 3], 'c': [2]},
+                         mock_query.indexes['name'])
+        self.assertEqual([self.rows[0], self.rows[2]], mock_query.filter(
+            Foo.id.in_([2, 0, 7]), Foo.name != 'x').all())
+        self.assertEqual([], mock_query.filter(Foo.id == 1,
+                                               Foo.name == 'a').all())
+
+    def test_add_row_updates_index(self):
+        mock_query = MockQuery(all_=list(self.rows), evaluate=True,
+                               indexes=['name'])
+        mock_query.filter_by(name='b').all()
+        row = MockModel(id=4, name='b')
+        mock_query.add_row(row)
+        self.assertEqual([self.rows[1], self.rows[3], row],
+                         mock_query.filter(Foo.name == 'b').all())
+
+    def test_add_rows_updates_index_built_on_empty_table(self):
+        mock_query = MockQuery(evaluate=True, indexes=['name'])
+        self.assertEqual([], mock_query.filter(Foo.name == 'b').all())
+        self.assertEqual({}, mock_query.indexes['name'])
+        mock_query.add_rows(self.rows)
+        self.assertEqual({'a': [0], 'b': [1, 3], 'c': [2]},
+                         mock_query.indexes['name'])
+        self.assertEqual([self.rows[1], self.rows[3]],
+                         mock_query.filter(Foo.name == 'b').all())
+
+    def test_lazy_source(self):
+        mock_query = MockQuery(all_=lambda: iter(self.rows), evaluate=True,
+                               indexes=['id'])
+        query = mock_query.filter(Foo.id == 1)
+        self.assertEqual([self.rows[1]], list(query))
+        self.assertEqual([self.rows[1]], query.all())
+        self.assertEqual(['c', 'b'], [r.name for r in mock_query.filter(
+            Foo.id > 1).order_by(Foo.name.desc()).limit(2)])
@@ -0,0 +1,70 @@
+import unittest
+
+from sqlalchemy import exc
+
+from pyrasatest.mock_result import MockResult, MockScalarResult
+
+
+class MockResultTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rows = [(i, 'name_{}'.format(i)) for i in range(10)]
+
+    def test_rows_are_consumed(self):
+        result = MockResult(self.rows)
+        self.assertEqual(self.rows[0], result.first())
+        self.assertEqual(self.rows[1:], result.all())
+        self.assertEqual([], result.all())
+
+    def test_fetchone_fetchmany_fetchall(self):
+        result = MockResult(self.rows)
+        self.assertEqual(self.rows[0], result.fetchone())
+        self.assertEqual(self.rows[1:4], result.fetchmany(3))
+        self.assertEqual(self.rows[4:], result.fetchall())
+        self.assertIsNone(result.fetchone())
+
+    def test_partitions(self):
+        partitions = list(MockResult(self.rows).partitions(4))
+        self.assertEqual([4, 4, 2], [len(p) for p in partitions])
+        partitions = list(MockResult(self.rows).yield_per(5).partitions())
+        self.assertEqual([5, 5], [len(p) for p in partitions])
+        self.assertEqual([self.rows], list(MockResult(self.rows).partitions()))
+
+    def test_partitions_of_lazy_rows(self):
+        rows = ((i, ) for i in range(100000))
+        partition = next(MockResult(rows).scalars().partitions(1000))
+        self.assertEqual(list(range(1000)), partition)
+
+    def test_scalars(self):
+        self.assertEqual(list(range(10)),
+                         MockResult(self.rows).scalars().all())
+        self.assertEqual(['name_0', 'name_1'], MockResult(
+            self.rows).scalars(1).fetchmany(2))
+
+    def test_scalar(self):
+        self.assertEqual(0, MockResult(self.rows).scalar())
+        self.assertIsNone(MockResult().scalar())
+
+    def test_one(self):
+        self.assertEqual(self.rows[0], MockResult(self.rows[:1]).one())
+        self.assertEqual(0, MockResult(self.rows[:1]).scalar_one())
+        with self.assertRaises(exc.MultipleResultsFound):
+            MockResult(self.rows).one()
+        # A row whose value is None is a result
+        self.assertIsNone(MockResult([(None, )]).scalar_one())
+        self.assertIsNone(MockResult([(None, )]).scalars().one())
+        with self.assertRaises(exc.NoResultFound):
+            MockResult([]).scalars().one()
+        with self.assertRaises(exc.NoResultFound):
+            MockResult().one()
+
+    def test_one_or_none(self):
+        self.assertIsNone(MockResult().one_or_none())
+        self.assertIsNone(MockResult().scalar_one_or_none())
+        self.assertEqual(1, MockScalarResult([1]).one_or_none())
+        with self.assertRaises(exc.MultipleResultsFound):
+            MockScalarResult([1, 2]).one_or_none()
+
+    def test_iteration(self):
+        self.assertEqual(self.rows, list(MockResult(self.rows)))
+        self.assertEqual(list(range(10)),
+                         [val for val in MockResult(self.rows).scalars()])
@@ -0,0 +1,79 @@
+import copy
+import pickle
+import unittest
+from array import array
+
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+
+from pyrasatest.mock_model import MockModel
+from pyrasatest.mock_query import MockQuery
+from pyrasatest.mock_result_set import MockResultSet, ResultRow
+
+Base = declarative_base()
+
+
+class Foo(Base):
+    __tablename__ = 'foo'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class MockResultSetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.result_set = MockResultSet({'id': [1, 2, 3],
+                                         'name': ['a', 'b', 'c']})
+
+    def test_int_columns_stored_in_arrays(self):
+        self.assertIsInstance(self.result_set.column('id'), array)
+        self.assertIsInstance(self.result_set.column('name'), list)
+
+    def test_unequal_column_lengths(self):
+        with self.assertRaises(AssertionError):
+            MockResultSet({'id': [1, 2], 'name': ['a']})
+
+    def test_getitem_returns_row_view(self):
+        row = self.result_set[-1]
+        self.assertIsInstance(row, ResultRow)
+        self.assertEqual((3, 'c'), (row.id, row.name))
+        self.assertEqual([3, 'c'], row[:])
+        self.assertEqual({'id': 3}, row.to_dict(exclude=['name']))
+        self.assertEqual(row, self.result_set[2])
+        with self.assertRaises(AttributeError):
+            getattr(row, 'foo')
+        with self.assertRaises(IndexError):
+            self.result_set[3]
+
+    def test_copy_and_pickle_row(self):
+        row = self.result_set[1]
+        self.assertEqual(row, copy.copy(row))
+        for row_copy in [copy.deepcopy(row), pickle.loads(pickle.dumps(row))]:
+            self.assertEqual(('b', [2, 'b']), (row_copy.name, row_copy[:]))
+
+    def test_iteration_and_slicing(self):
+        self.assertEqual([1, 2, 3], [row.id for row in self.result_set])
+        self.assertEqual(['b', 'c'], [row.name for row in self.result_set[1:]])
+
+    def test_from_rows_and_append(self):
+        result_set = MockResultSet.from_rows(
+            [MockModel(id=1, name='a')], ['id', 'name'])
+        result_set.append(MockModel(id=2, name='b'))
+        self.assertEqual(2, len(result_set))
+        self.assertEqual('b', result_set[1].name)
+
+    def test_extend(self):
+        self.result_set.extend(MockResultSet({'id': [4], 'name': ['d']}))
+        self.result_set.extend([MockModel(id=5, name='e')])
+        self.assertEqual([1, 2, 3, 4, 5], list(self.result_set.column('id')))
+
+    def test_mock_query_iteration_and_union(self):
+        mock_query = MockQuery(all_=self.result_set).union(
+            MockQuery(all_=MockResultSet({'id': [4], 'name': ['d']})))
+        self.assertEqual([1, 2, 3, 4], [row.id for row in mock_query])
+
+    def test_evaluating_mock_query(self):
+        mock_query = MockQuery(all_=self.result_set, evaluate=True,
+                               indexes=['id'])
+        self.assertEqual('b', mock_query.filter(Foo.id == 2).one().name)
+        self.assertEqual(['c', 'b'], [r.name for r in mock_query.filter(
+            Foo.name != 'a').order_by(Foo.id.desc())])
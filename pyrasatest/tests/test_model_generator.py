@@ -0,0 +1,126 @@
+import datetime
+import enum
+import unittest
+from decimal import Decimal
+
+from sqlalchemy import (
+    Boolean, Column, Date, Enum, ForeignKey, Integer, Numeric, String
+)
+from sqlalchemy.orm import declarative_base, relationship
+
+from pyrasatest.mock_model import MockModel, MockRow
+from pyrasatest.mock_result_set import MockResultSet
+from pyrasatest.model_generator import (
+    generate_columns, generate_result_set, generate_rows, generation_plan
+)
+
+Base = declarative_base()
+
+
+class Status(enum.Enum):
+    open = 1
+    closed = 2
+
+
+class Account(Base):
+    __tablename__ = 'account'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(8))
+    active = Column(Boolean)
+    status = Column(Enum(Status))
+    orders = relationship('Order', back_populates='account')
+
+
+class Order(Base):
+    __tablename__ = 'order'
+    id = Column(Integer, primary_key=True)
+    account_id = Column(ForeignKey('account.id'))
+    total = Column(Numeric(10, 2))
+    placed = Column(Date)
+    account = relationship('Account', back_populates='orders')
+    lines = relationship('OrderLine')
+
+
+class OrderLine(Base):
+    __tablename__ = 'order_line'
+    id = Column(Integer, primary_key=True)
+    order_id = Column(ForeignKey('order.id'))
+
+
+class ModelGeneratorTestCase(unittest.TestCase):
+    def test_generation_plan_cached(self):
+        self.assertIs(generation_plan(Account), generation_plan(Account))
+        self.assertEqual(['id', 'name', 'active', 'status'],
+                         [attr for attr, _ in generation_plan(Account)])
+
+    def test_column_types(self):
+        columns = generate_columns(Order, 50, start=11)
+        self.assertEqual(list(range(11, 61)), list(columns['id']))
+        self.assertEqual({-2}, {v.as_tuple().exponent
+                                for v in columns['total']})
+        self.assertIsInstance(columns['total'][0], Decimal)
+        self.assertTrue(all(isinstance(v, datetime.date)
+                            for v in columns['placed']))
+        columns = generate_columns(Account, 1000)
+        self.assertEqual('name 1', columns['name'][0])
+        self.assertTrue(all(len(v) <= 8 for v in columns['name']))
+        self.assertEqual({True, False}, set(columns['active']))
+        self.assertEqual(set(Status), set(columns['status']))
+
+    def test_seeded(self):
+        self.assertEqual(generate_columns(Order, 10, seed=1),
+                         generate_columns(Order, 10, seed=1))
+        self.assertNotEqual(generate_columns(Order, 10, seed=1)['total'],
+                            generate_columns(Order, 10, seed=2)['total'])
+
+    def test_values(self):
+        columns = generate_columns(Account, 3, name='abc', active=[1, 0, 1],
+                                   extra=5)
+        self.assertEqual(['abc'] * 3, columns['name'])
+        self.assertEqual([1, 0, 1], columns['active'])
+        self.assertEqual([5] * 3, columns['extra'])
+        with self.assertRaises(ValueError):
+            generate_columns(Account, 3, active=[1])
+
+    def test_generate_rows(self):
+        rows = generate_rows(Account, 5, seed=3)
+        self.assertIsInstance(rows[0], MockRow)
+        self.assertEqual([1, 2, 3, 4, 5], [row.id for row in rows])
+        self.assertEqual(rows[1].name, rows[1][1])
+        rows = generate_rows(Account, 2, row_class=MockModel)
+        self.assertIsInstance(rows[1], MockModel)
+        self.assertEqual('name 2', rows[1].name)
+
+    def test_generate_rows_with_children(self):
+        accounts = generate_rows(Account, 3, children={'orders': (2, {
+            'lines': 3})})
+        orders = accounts[1].orders
+        self.assertEqual([3, 4], [order.id for order in orders])
+        self.assertEqual([2, 2], [order.account_id for order in orders])
+        self.assertIs(accounts[1], orders[0].account)
+        self.assertEqual([4, 4, 4], [line.order_id
+                                     for line in orders[1].lines])
+        self.assertEqual(18, len({line.id for account in accounts
+                                  for order in account.orders
+                                  for line in order.lines}))
+
+    def test_generate_mock_models_with_children(self):
+        accounts = generate_rows(Account, 2, children={'orders': 2},
+                                 row_class=MockModel)
+        self.assertIsInstance(accounts[0].orders[0], MockModel)
+        self.assertIs(accounts[0], accounts[0].orders[1].account)
+
+    def test_only_one_to_many_children(self):
+        with self.assertRaises(ValueError):
+            generate_rows(Order, 1, children={'account': 1})
+
+    def test_generate_result_set(self):
+        accounts = generate_result_set(Account, 4, children={'orders': 3})
+        self.assertIsInstance(accounts, MockResultSet)
+        self.assertEqual(4, len(accounts))
+        orders = accounts[2].orders
+        self.assertEqual([7, 8, 9], [order.id for order in orders])
+        self.assertEqual({3}, {order.account_id for order in orders})
+        self.assertEqual(2, len(accounts.column('orders')[1:3]))
+        with self.assertRaises(IndexError):
+            accounts.column('orders')[4]
@@ -0,0 +1,165 @@
+import datetime
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+from sqlalchemy import (
+    Column, Date, Integer, Numeric, String, create_engine, insert, select
+)
+from sqlalchemy.engine import Result
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import Session, declarative_base
+
+from pyrasatest.mock_db_session import PartialMockDbSession
+from pyrasatest.query_fixture import (
+    FixtureReader, FixtureWriter, fixture_key
+)
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'item'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    price = Column(Numeric(10, 2))
+    added = Column(Date)
+
+
+class QueryFixtureTestCase(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.db = Session(engine)
+        self.db.add_all([
+            Item(id=i, name='item{}'.format(i), price=Decimal('1.50') * i,
+                 added=datetime.date(2020, 1, i)) for i in range(1, 4)])
+        self.db.commit()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+        self.addCleanup(self.db.close)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def record(self, queries):
+        session = PartialMockDbSession({'mocked': 1}, self.db,
+                                       record_fixture=self.path)
+        results = queries(session)
+        session.save_fixture()
+        return results
+
+    def replay(self, queries):
+        session = PartialMockDbSession({'mocked': 1},
+                                       replay_fixture=self.path)
+        self.addCleanup(session.close_fixture)
+        return queries(session)
+
+    def test_record_and_replay(self):
+        def queries(session):
+            item = session.query(Item).filter(Item.id == 2).one()
+            return [
+                (item.id, item.name, item.price, item.added),
+                [i.id for i in session.query(Item).order_by(Item.id.desc())],
+                session.query(Item.id, Item.name).filter(Item.id > 1).all(),
+                session.query(Item).filter(Item.name.like('item%')).count(),
+                session.query(Item.name).filter(Item.id == 3).scalar(),
+                session.query(Item).filter(Item.id == 9).first(),
+                session.execute(select(Item.name).where(
+                    Item.id == 1)).scalars().all(),
+                session.query('mocked').one(),
+            ]
+
+        recorded = self.record(queries)
+        self.assertEqual([
+            (2, 'item2', Decimal('3.00'), datetime.date(2020, 1, 2)),
+            [3, 2, 1], [(2, 'item2'), (3, 'item3')], 3, 'item3', None,
+            ['item1'], 1], recorded)
+        self.db.close()
+        self.assertEqual(recorded, self.replay(queries))
+
+    def test_replay_rows_and_instances(self):
+        self.record(lambda s: s.query(Item.id.label('ident')).all())
+        self.record(lambda s: s.query(Item).all())
+        rows = self.replay(lambda s: s.query(Item.id.label('ident')).all())
+        self.assertEqual([1, 2, 3], [row.ident for row in rows])
+        self.assertEqual(2, rows[1][0])
+        self.record(lambda s: s.query(Item.id, Item.name.label('from')).all())
+        rows = self.replay(
+            lambda s: s.query(Item.id, Item.name.label('from')).all())
+        self.assertEqual('item1', getattr(rows[0], 'from'))
+        self.assertEqual({'id': 1, 'from': 'item1'}, rows[0]._asdict())
+        self.assertIn((2, 'item2'), set(rows))
+        items = self.replay(lambda s: s.query(Item).all())
+        self.assertIsInstance(items[0], Item)
+        self.assertEqual('item3', items[2].name)
+
+    def test_replay_raises_recorded_exception(self):
+        def query(session):
+            return session.query(Item).filter(Item.id == 9).one()
+
+        with self.assertRaises(NoResultFound):
+            self.record(query)
+        session = PartialMockDbSession({'mocked': 1}, self.db,
+                                       record_fixture=self.path)
+        with self.assertRaises(NoResultFound):
+            query(session)
+        session.save_fixture()
+        with self.assertRaises(NoResultFound):
+            self.replay(query)
+
+    def test_replay_results_in_recorded_order(self):
+        def queries(session):
+            counts = [session.query(Item).count()]
+            session.dbsession.execute(insert(Item).values(id=4))
+            counts.append(session.query(Item).count())
+            return counts
+
+        self.assertEqual([3, 4], self.record(queries))
+        self.assertEqual([3, 4], self.replay(queries))
+
+    def test_record_returns_session_result(self):
+        result = self.record(lambda s: s.execute(
+            select(Item.id, Item.name).where(Item.id < 3)))
+        self.assertIsInstance(result, Result)
+        self.assertEqual(['id', 'name'], list(result.keys()))
+        self.assertEqual([(1, 'item1'), (2, 'item2')], result.all())
+        with PartialMockDbSession(replay_fixture=self.path) as session:
+            self.assertEqual([1, 2], session.execute(select(
+                Item.id, Item.name).where(Item.id < 3)).scalars().all())
+        self.assertTrue(session.dbsession.reader._mmap.closed)
+
+    def test_key_independent_of_in_values_order(self):
+        keys = {fixture_key(select(Item).where(Item.id.in_(ids)), 'execute')
+                for ids in [[1, 2, 3], [3, 1, 2], (2, 3, 1)]}
+        self.assertEqual(1, len(keys))
+        self.assertNotEqual(keys.pop(), fixture_key(
+            select(Item).where(Item.id.in_([1, 2])), 'execute'))
+
+    def test_replay_missing_query(self):
+        self.record(lambda s: s.query(Item).all())
+        session = PartialMockDbSession(replay_fixture=self.path)
+        self.addCleanup(session.close_fixture)
+        with self.assertRaises(LookupError):
+            session.query(Item).filter(Item.id == 1).all()
+
+    def test_save_merges_records(self):
+        writer = FixtureWriter(self.path)
+        writer.add('a', 'SQL A', [1])
+        writer.save()
+        writer = FixtureWriter(self.path)
+        writer.add('b', 'SQL B', 2)
+        writer.save()
+        with FixtureReader(self.path) as reader:
+            self.assertEqual({'a', 'b'}, set(reader.index))
+            self.assertEqual({'sql': 'SQL A', 'results': [[1]]},
+                             reader.get('a'))
+
+    def test_reader_rejects_other_files(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'not a fixture file')
+        with self.assertRaises(ValueError):
+            FixtureReader(self.path)
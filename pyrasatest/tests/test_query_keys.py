@@ -0,0 +1,64 @@
+import unittest
+
+from sqlalchemy import Column, Integer, func
+from sqlalchemy.ext.declarative import declarative_base
+
+from pyrasatest import query_keys
+from pyrasatest.query_keys import QueryReturnValues, label_key, normalize_key
+
+Base = declarative_base()
+
+
+class Foo(Base):
+    __tablename__ = 'foo'
+    id = Column(Integer, primary_key=True)
+    number = Column(Integer)
+
+
+class QueryKeysTestCase(unittest.TestCase):
+    def test_normalize_key_label(self):
+        label = Foo.number.label('abc')
+        self.assertEqual(normalize_key(label),
+                         normalize_key(Foo.number.label('abc')))
+        self.assertEqual('foo', normalize_key('foo'))
+
+    def test_label_key_differs_by_name_and_column(self):
+        key = label_key(Foo.number.label('abc'))
+        self.assertNotEqual(key, label_key(Foo.number.label('xyz')))
+        self.assertNotEqual(key, label_key(Foo.id.label('abc')))
+
+    def test_label_key_for_expression(self):
+        self.assertEqual(label_key(func.count(Foo.id).label('c')),
+                         label_key(func.count(Foo.id).label('c')))
+        self.assertNotEqual(label_key(func.count(Foo.id).label('c')),
+                            label_key(func.max(Foo.id).label('c')))
+
+    def test_label_key_cache_is_bounded(self):
+        labels = [Foo.number.label('abc')
+                  for _ in range(query_keys.LABEL_KEY_CACHE_SIZE + 10)]
+        for label in labels:
+            label_key(label)
+        self.assertEqual(query_keys.LABEL_KEY_CACHE_SIZE,
+                         len(query_keys._label_key_cache))
+
+    def test_query_return_values_normalizes_keys(self):
+        label = Foo.number.label('abc')
+        qrv = QueryReturnValues({label: 1})
+        self.assertIn(normalize_key(label), qrv)
+        self.assertEqual(1, qrv[normalize_key(label)])
+
+    def test_raise_value(self):
+        qrv = QueryReturnValues({Foo: KeyError, Foo.number: ValueError,
+                                 Foo.id: 5})
+        self.assertEqual(KeyError, qrv.raise_value(Foo))
+        self.assertEqual(ValueError, qrv.raise_value(Foo.number))
+        self.assertIsNone(qrv.raise_value(Foo.id))
+        self.assertIsNone(qrv.raise_value('foo'))
+
+    def test_raise_index_rebuilt_after_modification(self):
+        qrv = QueryReturnValues()
+        self.assertIsNone(qrv.raise_value(Foo))
+        qrv.update({Foo: KeyError})
+        self.assertEqual(KeyError, qrv.raise_value(Foo))
+        qrv.pop(Foo)
+        self.assertIsNone(qrv.raise_value(Foo))
@@ -0,0 +1,60 @@
+import unittest
+
+from pyrasatest.mock_db_session import MockDbSession
+from pyrasatest.mock_query import MockQuery
+from pyrasatest.query_recorder import QueryRecorder, RecordingQuery
+
+
+class QueryRecorderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock_db_session = MockDbSession(
+            query_return_values={'foo': MockQuery(all_=[1, 2])},
+            record_queries=True
+        )
+
+    def test_records_query_and_chained_method_calls(self):
+        query = self.mock_db_session.query('foo').filter('x').order_by('y')
+        self.assertIsInstance(query, RecordingQuery)
+        self.assertEqual([1, 2], query.all())
+        record, = self.mock_db_session.recorder.records
+        self.assertEqual('foo', record.key)
+        self.assertEqual(('foo', ('filter', 'order_by', 'all')), record.shape)
+        self.assertEqual(__file__, record.call_site[0])
+        self.assertIsInstance(record.timestamp, float)
+
+    def test_records_query_which_raises(self):
+        self.mock_db_session.query_return_values = {}
+        self.mock_db_session.side_effect = ['a']
+        self.mock_db_session.query('foo')
+        with self.assertRaises(IndexError):
+            self.mock_db_session.query('foo')
+        self.assertEqual(2, len(self.mock_db_session.recorder))
+
+    def test_assert_max_queries(self):
+        for _ in range(2):
+            self.mock_db_session.query('foo').first()
+        self.mock_db_session.assert_max_queries(2)
+        with self.assertRaises(AssertionError):
+            self.mock_db_session.assert_max_queries(1)
+
+    def test_assert_no_n_plus_one(self):
+        self.mock_db_session.query('foo').all()
+        self.mock_db_session.query('foo').all()
+        self.mock_db_session.assert_no_n_plus_one(threshold=2)
+        for _ in range(3):
+            list(self.mock_db_session.query('foo'))
+        with self.assertRaises(AssertionError):
+            self.mock_db_session.assert_no_n_plus_one()
+        self.assertEqual(1, len(
+            self.mock_db_session.recorder.repeated_queries()))
+
+    def test_reset(self):
+        recorder = QueryRecorder()
+        recorder.record(MockQuery, ('foo', ), 'foo')
+        recorder.reset()
+        self.assertEqual([], recorder.records)
+
+    def test_not_recorded_by_default(self):
+        mock_db_session = MockDbSession()
+        self.assertIsNone(mock_db_session.recorder)
+        self.assertIsInstance(mock_db_session.query('foo'), MockQuery)
@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy.exc import NoResultFound
+
+from pyrasatest import scenario
+from pyrasatest.mock_db_session import MockDbSession
+from pyrasatest.mock_query import MockQuery
+from pyrasatest.tests import test_mock_db_session as models
+
+SCENARIO = {
+    'module': 'pyrasatest.tests.test_mock_db_session',
+    'query_return_values': {
+        'TestModel': {'id': 1, 'number': 5},
+        'TestModel.number': {'$query': {'all_': [{'number': 5}],
+                                        'count_return_val': 1}},
+        'TestModel.id': {'$raise': 'sqlalchemy.exc.NoResultFound'},
+        'pyrasatest.tests.test_mock_db_session.Base': [1, 2],
+    }
+}
+
+
+class ScenarioTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.addCleanup(scenario.clear_cache)
+        self.path = self.write('scenario.json', json.dumps(SCENARIO))
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_from_scenario(self):
+        session = MockDbSession.from_scenario(self.path)
+        self.assertEqual(5, session.query(models.TestModel).one().number)
+        query = session.query(models.TestModel.number)
+        self.assertIsInstance(query, MockQuery)
+        self.assertEqual([5], [row.number for row in query.all()])
+        self.assertEqual(1, query.count())
+        with self.assertRaises(NoResultFound):
+            session.query(models.TestModel.id).one()
+        self.assertEqual([1, 2], session.query(
+            scenario.resolve('pyrasatest.tests.test_mock_db_session.Base')[0]
+        ).all())
+
+    def test_sessions_do_not_share_changes(self):
+        session = MockDbSession.from_scenario(self.path)
+        session.query(models.TestModel).one().save()
+        session.query_return_values[models.TestModel.id] = 2
+        other = MockDbSession.from_scenario(self.path)
+        self.assertFalse(other.query(models.TestModel).one().save_called)
+        with self.assertRaises(NoResultFound):
+            other.query(models.TestModel.id).one()
+
+    def test_loaded_once_per_process(self):
+        self.assertIs(scenario.load_scenario(self.path),
+                      scenario.load_scenario(self.path))
+
+    def test_loaded_from_disk_cache(self):
+        table = scenario.load_scenario(self.path)
+        self.assertEqual(1, len(os.listdir(os.path.join(
+            self.dir, '__pycache__'))))
+        scenario.clear_cache()
+        with patch.object(scenario, '_Compiler') as compiler:
+            cached = scenario.load_scenario(self.path)
+        compiler.assert_not_called()
+        self.assertIsNot(table, cached)
+        self.assertEqual(set(table), set(cached))
+        self.assertEqual(5, cached[models.TestModel].number)
+
+    def test_cache_keyed_by_module_version(self):
+        scenario.load_scenario(self.path, cache_dir=self.dir)
+        scenario.clear_cache()
+        with patch.object(scenario, '_fingerprints',
+                          return_value=[('changed', None, None)]):
+            with patch.object(scenario, '_Compiler',
+                              wraps=scenario._Compiler) as compiler:
+                scenario.load_scenario(self.path, cache_dir=self.dir)
+        compiler.assert_called_once()
+
+    def test_cache_keyed_by_content(self):
+        scenario.load_scenario(self.path)
+        with open(self.path, 'w') as file:
+            json.dump({'query_return_values': {
+                'pyrasatest.tests.test_mock_db_session.TestModel': 3}}, file)
+        scenario.clear_cache()
+        self.assertEqual(3, MockDbSession.from_scenario(self.path).query(
+            models.TestModel).one())
+
+    def test_frozen(self):
+        with self.assertRaises(RuntimeError):
+            scenario.load_scenario(self.path)[models.TestModel] = 1
+
+    def test_unresolved_path(self):
+        path = self.write('bad.json', json.dumps(
+            {'query_return_values': {'NoModule': 1}}))
+        with self.assertRaises(ValueError):
+            scenario.load_scenario(path)
+
+    @unittest.skipIf(scenario.tomllib is None, 'requires tomllib or tomli')
+    def test_toml(self):
+        path = self.write('scenario.toml', '\n'.join([
+            'module = "pyrasatest.tests.test_mock_db_session"',
+            '[query_return_values]',
+            '"TestModel.id" = {"$raise" = "sqlalchemy.exc.NoResultFound"}',
+            '"TestModel" = {id = 2}',
+        ]))
+        session = MockDbSession.from_scenario(path)
+        self.assertEqual(2, session.query(models.TestModel).one().id)
+        with self.assertRaises(NoResultFound):
+            session.query(models.TestModel.id).one()
@@ -0,0 +1,101 @@
+import datetime
+import enum
+import json
+import unittest
+import uuid
+from decimal import Decimal
+
+from pyrasatest.mock_model import LazyAttrMockModel, MockModel
+from pyrasatest.mock_query import MockQuery
+from pyrasatest.mock_result_set import MockResultSet
+from pyrasatest.serialize import iter_dicts, iter_json, to_dicts, to_json
+
+
+class Color(enum.Enum):
+    red = 'r'
+
+
+class SerializeTestCase(unittest.TestCase):
+
+    def test_mock_models_match_to_dict(self):
+        rows = [MockModel(id=1, name='a', _hidden=True),
+                MockModel(id=2, name='b', _hidden=False),
+                MockModel(id=3, other=4)]
+        for exclude in [None, ['name'], ['id', 'other']]:
+            self.assertEqual([row.to_dict(exclude) for row in rows],
+                             to_dicts(rows, exclude))
+
+    def test_schema_rows_match_to_dict(self):
+        row_class = MockModel.schema('id', 'name', '_hidden')
+        rows = [row_class(1, 'a', True), row_class(id=2), row_class(3, 'c')]
+        for exclude in [None, ['name']]:
+            self.assertEqual([row.to_dict(exclude) for row in rows],
+                             to_dicts(rows, exclude))
+
+    def test_schema_rows_with_keyword_field(self):
+        rows = [MockModel.schema('id', 'from')(i, 'a') for i in range(2)]
+        self.assertEqual([{'id': 0, 'from': 'a'}, {'id': 1, 'from': 'a'}],
+                         to_dicts(rows))
+        self.assertEqual([{'id': 0}, {'id': 1}], to_dicts(rows, ['from']))
+
+    def test_overridden_to_dict(self):
+        class Model(MockModel):
+            def to_dict(self, exclude=None):
+                return {'model': super().to_dict(exclude)}
+
+        class Row(MockModel.schema('id', 'name')):
+            __slots__ = ()
+
+            def to_dict(self, exclude=None):
+                return {'row': super().to_dict(exclude)}
+
+        for rows in [[Model(id=1, name='a'), MockModel(id=2, name='b')],
+                     [Row(1, 'a'), Row(2, 'b')]]:
+            self.assertEqual([row.to_dict(['name']) for row in rows],
+                             to_dicts(rows, ['name']))
+
+    def test_lazy_schema_rows_match_to_dict(self):
+        row_class = LazyAttrMockModel.schema('id', 'name')
+        rows = [row_class(1), row_class(2, 'b')]
+        self.assertEqual([{'id': 1}, {'id': 2, 'name': 'b'}], to_dicts(rows))
+
+    def test_result_set(self):
+        result_set = MockResultSet({'id': [1, 2, 3], 'name': ['a', 'b', 'c'],
+                                    '_hidden': [0, 0, 0]})
+        expected = [row.to_dict(['name']) for row in result_set]
+        self.assertEqual(expected, to_dicts(result_set, ['name']))
+        self.assertEqual(expected, to_dicts(list(result_set), ['name']))
+        self.assertEqual(expected[1:], to_dicts(result_set[1:], ['name']))
+
+    def test_mixed_rows(self):
+        row_class = MockModel.schema('id')
+        rows = [MockModel(id=1), row_class(2), {'id': 3, '_x': 0}]
+        self.assertEqual([{'id': 1}, {'id': 2}, {'id': 3}], to_dicts(rows))
+
+    def test_mock_query(self):
+        query = MockQuery(all_=[MockModel(id=1), MockModel(id=2)])
+        self.assertEqual([{'id': 1}, {'id': 2}], to_dicts(query))
+        self.assertEqual([], to_dicts(MockQuery()))
+
+    def test_iter_dicts_is_lazy(self):
+        def rows():
+            yield MockModel(id=1)
+            raise AssertionError('consumed')
+        self.assertEqual({'id': 1}, next(iter_dicts(rows())))
+
+    def test_to_json(self):
+        rows = [MockModel(id=1, when=datetime.date(2020, 1, 2),
+                          price=Decimal('1.50'), color=Color.red,
+                          uid=uuid.UUID(int=1))]
+        self.assertEqual(
+            [{'id': 1, 'when': '2020-01-02', 'price': '1.50', 'color': 'r',
+              'uid': str(uuid.UUID(int=1))}], json.loads(to_json(rows)))
+        with self.assertRaises(TypeError):
+            to_json([MockModel(value=object())])
+
+    def test_iter_json_chunks(self):
+        rows = [MockModel(id=i) for i in range(5)]
+        chunks = list(iter_json(rows, chunk_size=2))
+        self.assertEqual(5, len(chunks))
+        self.assertEqual(to_json(rows), b''.join(chunks))
+        self.assertEqual(b'[]', b''.join(iter_json([])))
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import Column, Integer, String, select
+from sqlalchemy.orm import declarative_base
+
+from pyrasatest.mock_model import MockModel
+from pyrasatest.sqlite_database import SharedDatabase, shared_database
+
+Base = declarative_base()
+
+
+class Account(Base):
+    __tablename__ = 'account'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+def add_accounts(session):
+    session.add_all([Account(id=1, name='a'), Account(id=2, name='b')])
+
+
+class SharedDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = shared_database(Base.metadata, setup=add_accounts)
+
+    def test_created_once_per_process(self):
+        self.assertIs(self.database, shared_database(Base.metadata))
+
+    def test_changes_rolled_back(self):
+        session = self.database.begin()
+        session.add(Account(id=3, name='c'))
+        session.commit()
+        session.get(Account, 1).name = 'changed'
+        session.flush()
+        self.assertEqual(3, session.query(Account).count())
+        self.database.rollback(session)
+        with self.database.transaction() as session:
+            self.assertEqual(['a', 'b'], session.scalars(
+                select(Account.name).order_by(Account.id)).all())
+
+    def test_rollback_within_test_uses_savepoint(self):
+        with self.database.transaction() as session:
+            session.add(Account(id=3, name='c'))
+            session.commit()
+            session.add(Account(id=4, name='d'))
+            session.rollback()
+            self.assertEqual([1, 2, 3], session.scalars(
+                select(Account.id).order_by(Account.id)).all())
+
+    def test_partial_session(self):
+        dbsession = self.database.partial_session(
+            {Account.name: MockModel(name='mocked')})
+        try:
+            self.assertEqual('mocked',
+                             dbsession.query(Account.name).one().name)
+            self.assertEqual(2, dbsession.query(Account).count())
+            dbsession.dbsession.add(Account(id=3))
+            dbsession.dbsession.commit()
+        finally:
+            self.database.rollback(dbsession)
+        with self.database.transaction() as session:
+            self.assertEqual(2, session.query(Account).count())
+
+    def test_image(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.database.save_image(path)
+        database = SharedDatabase(Base.metadata, image_path=path)
+        with database.transaction() as session:
+            self.assertEqual('b', session.get(Account, 2).name)
@@ -0,0 +1,137 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from sqlalchemy import Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+from pyrasatest.mock_db_session import MockDbSession
+from pyrasatest.mock_model import MockModel
+from pyrasatest.mock_pyramid_objects import MockRequest
+from pyrasatest.view_runner import (
+    RequestFactory, ViewRunner, ViewTimings, call_view, percentile, run_view
+)
+
+Base = declarative_base()
+
+
+class Account(Base):
+    __tablename__ = 'account'
+    id = Column(Integer, primary_key=True)
+    number = Column(Integer)
+
+
+class ExampleView:
+    def __init__(self, request):
+        self.request = request
+
+    def get_account_info(self):
+        account = self.request.dbsession.query(Account).filter(
+            Account.id == self.request.params.get('account_id')).one()
+        self.request.params['seen'] = True
+        return {'account_number': account.number}
+
+    def __call__(self):
+        return 'called'
+
+
+def account_view(request):
+    return {'account_number': request.dbsession.query(Account).one().number}
+
+
+class ViewRunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.request = MockRequest(params={'account_id': 1})
+        self.query_return_values = {Account: MockModel(number=5)}
+
+    def test_call_view(self):
+        request = RequestFactory(self.request, self.query_return_values)()
+        self.assertEqual({'account_number': 5}, call_view(
+            ExampleView, request, 'get_account_info'))
+        self.assertEqual('called', call_view(ExampleView, request))
+        self.assertEqual({'account_number': 5},
+                         call_view(account_view, request))
+
+    def test_request_factory_copies_template(self):
+        factory = RequestFactory(self.request, self.query_return_values)
+        request = factory()
+        call_view(ExampleView, request, 'get_account_info')
+        self.assertNotIn('seen', self.request.params)
+        self.assertIs(request.params, request.GET)
+        self.assertIsNot(request.dbsession, factory().dbsession)
+        self.assertIsNot(request.tmpl_context, self.request.tmpl_context)
+
+    def test_request_factory_keeps_template_dbsession(self):
+        self.request.dbsession = MockDbSession(self.query_return_values)
+        factory = RequestFactory(self.request)
+        request = factory()
+        self.assertEqual({'account_number': 5}, call_view(
+            ExampleView, request, 'get_account_info'))
+        self.assertIsNot(self.request.dbsession, request.dbsession)
+        self.assertEqual({'account_number': 5},
+                         call_view(account_view, factory()))
+
+    def test_request_factory_template_unchanged(self):
+        params = self.request.params
+        factory = RequestFactory(self.request, self.query_return_values)
+        factory().params['page'] = 2
+        self.assertIs(params, self.request.params)
+        self.assertEqual({'account_id': 1}, self.request.params)
+        with self.assertRaises(TypeError):
+            RequestFactory(object())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(1, percentile(values, 0))
+        self.assertIsNone(percentile([], 50))
+
+    def test_view_timings(self):
+        timings = ViewTimings([0.3, 0.1, 0.2, 0.4], wall_time=2.0)
+        self.assertEqual(2.0, timings.throughput)
+        self.assertEqual(0.2, timings.p50)
+        self.assertEqual(0.4, timings.p99)
+        self.assertAlmostEqual(0.25, timings.mean)
+        self.assertIn('2.0/s', str(timings))
+
+    def test_run(self):
+        timings = ViewRunner(ExampleView, self.request,
+                             self.query_return_values,
+                             attr='get_account_info').run(iterations=50)
+        self.assertEqual(50, timings.calls)
+        self.assertGreater(timings.throughput, 0)
+        self.assertLessEqual(timings.p50, timings.p99)
+
+    def test_run_threads_with_shared_session(self):
+        dbsession = MockDbSession(self.query_return_values, thread_safe=True,
+                                  record_queries=True)
+        timings = run_view(account_view, iterations=101, workers=4,
+                           dbsession=dbsession)
+        self.assertEqual(101, timings.calls)
+        self.assertEqual(4, timings.workers)
+        # Including 10 warmup calls by each worker
+        self.assertEqual(141, len(dbsession.recorder))
+
+    def test_run_processes(self):
+        timings = run_view(account_view, iterations=20, workers=2,
+                           processes=True,
+                           query_return_values=self.query_return_values)
+        self.assertEqual(20, timings.calls)
+
+    def test_run_profile(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'view.prof')
+            run_view(account_view, iterations=20,
+                     query_return_values=self.query_return_values,
+                     profile_path=path)
+            stats = pstats.Stats(path)
+        self.assertIn('account_view', {
+            func for _, _, func in stats.stats})
+
+    def test_run_profile_with_workers_raises(self):
+        with self.assertRaises(ValueError):
+            run_view(account_view, processes=True, profile_path='x.prof')
+        with self.assertRaises(ValueError):
+            run_view(account_view, workers=2, profile_path='x.prof')
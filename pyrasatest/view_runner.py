@@ -0,0 +1,195 @@
+import copy
+import cProfile
+import inspect
+import math
+import pstats
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+
+from .mock_db_session import MockDbSession
+from .mock_pyramid_objects import MockRequest
+
+
+def call_view(view, request, attr: str = None):
+    """ Calls a view callable as Pyramid would, where 'view' is a function
+    or a class which is instantiated with the request and whose 'attr'
+    method, or __call__ by default, returns the response """
+    if inspect.isclass(view):
+        return getattr(view(request), attr or '__call__')()
+    return view(request)
+
+
+def percentile(sorted_values: list, pct: float):
+    """ Nearest-rank percentile of a sorted list """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RequestFactory:
+    """ Creates a request for each view call, as a reset copy of a template
+    MockRequest, see MockRequest.reset, whose dbsession is a fork of the
+    template's. If 'query_return_values' are given, it is a new
+    MockDbSession for them instead, or 'dbsession' if a shared one is
+    given """
+
+    def __init__(self, template=None, query_return_values: dict = None,
+                 dbsession=None) -> None:
+        if template is None:
+            template = MockRequest()
+        elif not isinstance(template, MockRequest):
+            raise TypeError('The template request must be a MockRequest')
+        # A copy, so that the current state of the template is the one
+        # which is restored, without changing the given request
+        self.template = copy.copy(template)
+        self.template.set_template()
+        self.query_return_values = query_return_values
+        self.dbsession = dbsession
+
+    def __call__(self):
+        request = copy.copy(self.template)
+        request.reset()
+        if self.dbsession is not None:
+            request.dbsession = self.dbsession
+        elif self.query_return_values is not None:
+            request.dbsession = MockDbSession(self.query_return_values)
+        return request
+
+
+def _time_calls(view, attr, request_factory, count: int,
+                profile: bool = False) -> tuple:
+    """ (seconds of each view call, cProfile.Profile or None). Requests are
+    created outside of the timed and profiled code """
+    durations = []
+    profiler = cProfile.Profile() if profile else None
+    for _ in range(count):
+        request = request_factory()
+        if profiler is not None:
+            profiler.enable()
+        start = perf_counter()
+        call_view(view, request, attr)
+        durations.append(perf_counter() - start)
+        if profiler is not None:
+            profiler.disable()
+    return durations, profiler
+
+
+class ViewTimings:
+    """ Durations in seconds of view calls and the wall time taken to make
+    them, which includes time spent creating requests """
+
+    def __init__(self, durations: list, wall_time: float,
+                 workers: int = 1) -> None:
+        self.durations = sorted(durations)
+        self.wall_time = wall_time
+        self.workers = workers
+
+    @property
+    def calls(self) -> int:
+        return len(self.durations)
+
+    @property
+    def throughput(self) -> float:
+        """ View calls per second """
+        return self.calls / self.wall_time if self.wall_time else 0.0
+
+    @property
+    def mean(self) -> float:
+        return sum(self.durations) / self.calls if self.calls else None
+
+    def percentile(self, pct: float) -> float:
+        return percentile(self.durations, pct)
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p95(self) -> float:
+        return self.percentile(95)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    def summary(self) -> dict:
+        return {attr: getattr(self, attr) for attr in [
+            'calls', 'workers', 'wall_time', 'throughput', 'mean', 'p50',
+            'p95', 'p99']}
+
+    def __str__(self):
+        return ('{calls} calls, {workers} workers: {throughput:,.1f}/s, '
+                'p50 {p50:.6f}s, p95 {p95:.6f}s, p99 {p99:.6f}s'
+                .format(**self.summary()))
+
+
+class ViewRunner:
+    """ Calls a view repeatedly with mocked requests, to measure the Python
+    CPU cost of the view isolated from the database.
+
+    :param view: view callable, or view class as for 'call_view'
+    :param request: template MockRequest, see RequestFactory
+    :param query_return_values: as for MockDbSession, for a new session per
+    request instead of a fork of the template request's dbsession
+    :param attr: name of the method of a view class to call
+    :param dbsession: session shared by all requests, e.g. a thread-safe
+    MockDbSession for contention tests, instead of one per request
+    :param request_factory: callable returning a request for each call,
+    instead of a RequestFactory from the above arguments. It, the view and
+    the template request must be picklable to run in processes
+    """
+
+    def __init__(self, view, request=None, query_return_values: dict = None,
+                 attr: str = None, dbsession=None,
+                 request_factory=None) -> None:
+        self.view = view
+        self.attr = attr
+        self.request_factory = request_factory or RequestFactory(
+            request, query_return_values, dbsession)
+
+    def run(self, iterations: int = 1000, workers: int = 1,
+            processes: bool = False, warmup: int = 10,
+            profile_path: str = None) -> ViewTimings:
+        """ Makes 'iterations' view calls, split between 'workers' threads,
+        or processes if 'processes' is True, after 'warmup' calls by each
+        worker which are not timed. If 'profile_path' is given, cProfile
+        stats of the timed calls are dumped to it, which requires one worker,
+        as only one profiler can be active at a time from Python 3.12 """
+        if profile_path is not None and (processes or workers > 1):
+            raise ValueError('Profiling is only supported with one worker')
+        args = (self.view, self.attr, self.request_factory)
+        counts = [iterations // workers + (i < iterations % workers)
+                  for i in range(workers)]
+        profile = profile_path is not None
+        if workers == 1 and not processes:
+            _time_calls(*args, warmup)
+            start = perf_counter()
+            results = [_time_calls(*args, iterations, profile)]
+            wall_time = perf_counter() - start
+        else:
+            executor_class = ProcessPoolExecutor if processes \
+                else ThreadPoolExecutor
+            with executor_class(max_workers=workers) as executor:
+                # Also starts the workers before timing
+                for future in [executor.submit(_time_calls, *args, warmup)
+                               for _ in range(workers)]:
+                    future.result()
+                start = perf_counter()
+                futures = [executor.submit(_time_calls, *args, count)
+                           for count in counts]
+                results = [future.result() for future in futures]
+                wall_time = perf_counter() - start
+        if profile:
+            pstats.Stats(*[profiler for _, profiler in results]).dump_stats(
+                profile_path)
+        return ViewTimings([duration for durations, _ in results
+                            for duration in durations], wall_time, workers)
+
+
+def run_view(view, iterations: int = 1000, workers: int = 1,
+             processes: bool = False, profile_path: str = None,
+             **kwargs) -> ViewTimings:
+    """ Shortcut for ViewRunner(view, **kwargs).run(...) """
+    return ViewRunner(view, **kwargs).run(
+        iterations, workers, processes, profile_path=profile_path)